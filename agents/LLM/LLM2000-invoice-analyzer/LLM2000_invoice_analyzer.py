@@ -3,12 +3,30 @@ LLM2000 - Invoice Analyzer
 Analyzes supplier invoice PDF pages using Claude Vision API.
 Extracts: company ID, invoice number, date, amounts, description.
 Handles multi-page invoices by grouping related pages.
+
+Large PDFs are split into overlapping page windows: pages are rendered in a
+process pool (grayscale JPEG at RENDER_DPI by default), each window is analysed
+in its own concurrent Claude request, and invoices seen by two windows (the
+overlap pages) are merged. A failed window only loses its own pages.
+
+Digital PDFs skip the vision model where they can: each page's text layer goes
+through PAGE_EXTRACTORS (by default the per-supplier regex templates in
+TEXT_TEMPLATES), and a page is resolved from text only if the extracted fields
+pass _text_result_confident. Only the remaining pages are rendered and sent to
+Claude. The result reports the path each page took.
 """
 
 import os
+import re
+import sys
 import json
+import site
 import base64
 import logging
+import multiprocessing
+import importlib.util
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
 
 import requests
@@ -24,6 +42,17 @@ logger = logging.getLogger("urbangroup.LLM2000")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-20250514")
 
+RENDER_DPI = int(os.getenv("LLM2000_DPI", "150"))
+IMAGE_FORMAT = os.getenv("LLM2000_IMAGE_FORMAT", "jpeg")  # jpeg (grayscale) | png (color)
+JPEG_QUALITY = int(os.getenv("LLM2000_JPEG_QUALITY", "80"))
+WINDOW_PAGES = int(os.getenv("LLM2000_WINDOW_PAGES", "6"))  # pages per Claude request
+WINDOW_OVERLAP = 1  # pages shared by consecutive windows, so invoices crossing a boundary stay whole
+MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM2000_CONCURRENCY", "4"))
+RENDER_PROCESSES = int(os.getenv("LLM2000_RENDER_PROCESSES", str(os.cpu_count() or 1)))
+RENDER_POOL_MIN_PAGES = 8  # below this, process start-up costs more than it saves
+MIN_TEXT_CHARS = 80  # pages with less text (scans) go straight to vision
+VAT_RATES = (0.17, 0.18)
+
 SYSTEM_PROMPT = """You are an expert at reading Israeli supplier invoices (חשבוניות ספק).
 You receive images of PDF pages. Each page may be a separate invoice, or multiple pages may belong to the same invoice.
 
@@ -52,44 +81,126 @@ Return ONLY valid JSON (no markdown, no backticks) with this structure:
 
 Rules:
 - If two consecutive pages clearly belong to the same invoice, group them: "pages": [1, 2]
+- Use the page numbers given in the "Page N:" labels; you may be shown only part of a longer PDF
 - If a value cannot be found, use empty string ""
 - Dates should be YYYY-MM-DD format
 - Amounts should be plain numbers without commas or currency symbols
 - Return JSON only, no explanation"""
 
 
-def pdf_pages_to_images(pdf_bytes, dpi=150):
-    """Convert PDF bytes to list of PNG image bytes (one per page)."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    images = []
-    for page_num in range(doc.page_count):
-        page = doc[page_num]
-        pix = page.get_pixmap(dpi=dpi)
-        png_bytes = pix.tobytes("png")
-        images.append(png_bytes)
-    doc.close()
-    return images
-
-
-def analyze_invoice_images(images):
-    """Send page images to Claude Vision API for analysis."""
+# Page rendering lives in its own module, imported by name in the pool's workers
+_RENDER_WORKER_DIR = Path(__file__).resolve().parent
+if "LLM2000_render_worker" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "LLM2000_render_worker", _RENDER_WORKER_DIR / "LLM2000_render_worker.py")
+    sys.modules["LLM2000_render_worker"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["LLM2000_render_worker"])
+_render_pages = sys.modules["LLM2000_render_worker"].render_pages
+
+
+def pdf_pages_to_images(pdf_bytes, dpi=None, image_format=None, pages=None):
+    """Convert PDF bytes to list of image bytes (one per page).
+
+    Args:
+        pages: 1-based page numbers to render (default all), returned in this order
+
+    Long PDFs are rendered in a process pool; where processes are unavailable
+    (e.g. Lambda, which has no /dev/shm) rendering falls back to this process.
+    """
+    dpi = dpi or RENDER_DPI
+    image_format = image_format or IMAGE_FORMAT
+    if pages is None:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        pages = range(1, doc.page_count + 1)
+        doc.close()
+    page_indexes = [p - 1 for p in pages]
+
+    processes = min(RENDER_PROCESSES, len(page_indexes))
+    if processes > 1 and len(page_indexes) >= RENDER_POOL_MIN_PAGES:
+        chunks = [page_indexes[i::processes] for i in range(processes)]
+        try:
+            # spawn: a forked child would inherit this process's threads and locks (HTTP pools, logging).
+            # Each worker puts the render module's directory on sys.path so tasks unpickle there.
+            with ProcessPoolExecutor(max_workers=processes,
+                                     mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=site.addsitedir,
+                                     initargs=(str(_RENDER_WORKER_DIR),)) as pool:
+                rendered = list(pool.map(_render_pages, [pdf_bytes] * processes, chunks,
+                                         [dpi] * processes, [image_format] * processes,
+                                         [JPEG_QUALITY] * processes))
+            by_index = {}
+            for chunk, chunk_images in zip(chunks, rendered):
+                by_index.update(zip(chunk, chunk_images))
+            return [by_index[i] for i in page_indexes]
+        except Exception as e:
+            logger.warning(f"LLM2000: Process pool rendering unavailable, rendering in-process: {e}")
+    return _render_pages(pdf_bytes, page_indexes, dpi, image_format, JPEG_QUALITY)
+
+
+def _page_windows(pages, size=None, overlap=WINDOW_OVERLAP):
+    """Split 1-based page numbers into windows of `size` pages, consecutive windows sharing `overlap`.
+
+    Windows never bridge a gap in the numbering (pages resolved from text).
+    """
+    size = max(size or WINDOW_PAGES, overlap + 1)
+    runs = []
+    for page in sorted(pages):
+        if runs and page == runs[-1][-1] + 1:
+            runs[-1].append(page)
+        else:
+            runs.append([page])
+    windows = []
+    for run in runs:
+        start = 0
+        while True:
+            windows.append(run[start:start + size])
+            if start + size >= len(run):
+                break
+            start += size - overlap
+    return windows
+
+
+# LLM calls go through llm_call.post: recorded by llm_metrics, plain requests.post without it
+if "llm_call" not in sys.modules:
+    _llm_call_path = Path(__file__).resolve().parent.parent / "llm_call.py"
+    _spec = importlib.util.spec_from_file_location("llm_call", _llm_call_path)
+    sys.modules["llm_call"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["llm_call"])
+llm_call = sys.modules["llm_call"]
+
+
+def analyze_invoice_images(images, page_numbers=None, page_count=None):
+    """Send page images to Claude Vision API for analysis.
+
+    Args:
+        images: image bytes per page (JPEG or PNG)
+        page_numbers: 1-based PDF page number of each image (default 1..n)
+        page_count: total pages in the PDF, when images are only a window of it
+    """
     if not ANTHROPIC_API_KEY or ANTHROPIC_API_KEY == "not-configured":
         return None
 
+    page_numbers = page_numbers or list(range(1, len(images) + 1))
     content = []
-    for i, png_bytes in enumerate(images):
-        b64 = base64.b64encode(png_bytes).decode("utf-8")
-        content.append({"type": "text", "text": f"Page {i + 1}:"})
+    if page_count and page_count > len(images):
+        content.append({"type": "text", "text": f"Pages {page_numbers[0]}-{page_numbers[-1]} "
+                                                f"of a {page_count}-page PDF. An invoice may continue "
+                                                f"on pages outside this range."})
+    for page_no, image_bytes in zip(page_numbers, images):
+        b64 = base64.b64encode(image_bytes).decode("utf-8")
+        media_type = "image/jpeg" if image_bytes[:3] == b"\xff\xd8\xff" else "image/png"
+        content.append({"type": "text", "text": f"Page {page_no}:"})
         content.append({
             "type": "image",
             "source": {
                 "type": "base64",
-                "media_type": "image/png",
+                "media_type": media_type,
                 "data": b64,
             }
         })
 
-    resp = requests.post(
+    resp = llm_call.post(
+        "LLM2000.vision", CLAUDE_MODEL,
         "https://api.anthropic.com/v1/messages",
         headers={
             "x-api-key": ANTHROPIC_API_KEY,
@@ -111,6 +222,204 @@ def analyze_invoice_images(images):
     return _parse_response(text)
 
 
+def _page_numbers(values):
+    """Page numbers from the model's `pages` list: ints, numeric strings and ranges ("1-2").
+
+    Anything else is skipped with a warning.
+    """
+    pages = set()
+    for value in values or []:
+        match = re.fullmatch(r"\s*(\d+)\s*(?:[-–]\s*(\d+)\s*)?", str(value))
+        if not match:
+            logger.warning(f"LLM2000: Ignoring invalid page value {value!r}")
+            continue
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        pages.update(range(min(first, last), max(first, last) + 1))
+    return sorted(pages)
+
+
+def _merge_invoices(window_results):
+    """Merge invoices from overlapping windows.
+
+    Two invoices are the same if they share an invoice number (and company ID,
+    when both have one), or if neither conflicts on invoice number and they
+    cover a common page. Pages are unioned; empty fields are filled from the other.
+    """
+    merged = []
+    for invoices in window_results:
+        for inv in invoices:
+            inv = {**inv, "pages": _page_numbers(inv.get("pages"))}
+            match = next((m for m in merged if _same_invoice(m, inv)), None)
+            if match is None:
+                merged.append(inv)
+                continue
+            match["pages"] = sorted(set(match["pages"]) | set(inv["pages"]))
+            for key, value in inv.items():
+                if value not in ("", None) and match.get(key) in ("", None):
+                    match[key] = value
+    merged.sort(key=lambda inv: inv["pages"][0] if inv["pages"] else 0)
+    return merged
+
+
+def _same_invoice(a, b):
+    num_a, num_b = a.get("invoiceNum") or "", b.get("invoiceNum") or ""
+    cid_a, cid_b = a.get("companyId") or "", b.get("companyId") or ""
+    if cid_a and cid_b and cid_a != cid_b:
+        return False
+    if num_a and num_b:
+        return num_a == num_b
+    return bool(set(a["pages"]) & set(b["pages"]))
+
+
+# ── Text-layer extraction ────────────────────────────────────
+#
+# A template applies to a page whose text matches `match`; each field regex
+# captures its value in group 1. Fixed values (e.g. companyId for a supplier
+# whose invoices don't print it) go in `fixed`. PyMuPDF returns Hebrew runs of
+# some PDFs in visual order, so templates for those suppliers match the
+# reversed labels ("כ"סה", "מס חשבונית" after the number).
+
+_AMOUNT = r"([\d,]+\.\d{2})"
+_DATE = r"(\d{1,2}[/.]\d{1,2}[/.]\d{2,4})"
+
+TEXT_TEMPLATES = [
+    {
+        # Renovation contractor (bavli 21.25): visual-order text, one invoice per page
+        "name": "visual-order-contractor",
+        "match": r"\d{4,6}\s*מס חשבונית",
+        "invoiceNum": r"(\d{4,6})\s*מס חשבונית",
+        "date": _DATE + r"\s*(?:עד|תאריך)",
+        "amountNoVat": r"סה₪" + _AMOUNT,
+        "amountWithVat": r"לתשלום.*?סה₪" + _AMOUNT,
+        "description": r"^1(?=.*עבור)(.+?)₪",  # the line item line: starts with 1, mentions עבור
+        "description_map": {
+            "שיפוצים עבודות עבור": "עבור עבודות שיפוצים",
+            "בניה עבודות עבור": "עבור עבודות בניה",
+        },
+    },
+    {
+        # Priority ERP exports: label after the value (":תאריך חשבונית"), alphanumeric
+        # document numbers (IN264200000075, 102-26-000006), totals as ש"ח<amount><label>
+        "name": "priority-export",
+        "match": r":תאריך חשבונית",
+        "companyId": r"(\d{8,9}) :עוסק מורשה",
+        "invoiceNum": r"([A-Z0-9][A-Z0-9-]{3,}) :מספר תעודה",
+        "date": _DATE + r" :תאריך חשבונית",
+        "amountNoVat": r"ש[\"״]ח" + _AMOUNT + r"מחיר כולל",
+        "amountWithVat": r"ש[\"״]ח" + _AMOUNT + r"סה[\"״]כ מחיר",
+        "description": r"פרטים:\s*(.+)",
+    },
+    {
+        # Logical-order text with the usual Hebrew labels
+        "name": "generic",
+        "match": r"חשבונית",
+        "companyId": r"(?:ח\.?\s?פ\.?|ע\.?\s?מ\.?|ח[\"״]פ|עוסק מורשה)\s*(?:מס['׳]?|מספר)?\s*[:#]?\s*(\d{8,9})\b",
+        "invoiceNum": r"חשבונית(?:\s*מס)?(?:\s*/?\s*קבלה)?\s*(?:מספר|מס['׳]?)?\s*[:#]?\s*(\d{3,10})\b",
+        "date": r"תאריך(?:\s*(?:חשבונית|הפקה|מסמך))?\s*:?\s*" + _DATE,
+        "amountNoVat": r"סה[\"״]?כ\s*(?:לפני|ללא)\s*מע[\"״]?מ\s*:?\s*₪?\s*" + _AMOUNT,
+        "amountWithVat": r"סה[\"״]?כ\s*(?:לתשלום|כולל\s*מע[\"״]?מ)\s*:?\s*₪?\s*" + _AMOUNT,
+        "description": r"(?:עבור|תיאור)\s*:?\s*(.+)",
+    },
+]
+
+_FIELDS = ("companyId", "invoiceNum", "date", "amountNoVat", "amountWithVat", "description")
+
+
+def _normalize_date(raw):
+    """dd/mm/yyyy or dd.mm.yy → YYYY-MM-DD ("" if not a valid date)."""
+    parts = re.split(r"[/.]", raw)
+    if len(parts) != 3:
+        return ""
+    day, month, year = (int(p) for p in parts)
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return ""
+
+
+def _apply_template(template, text):
+    """Fields extracted from page text by one template, or None if it doesn't apply."""
+    if not re.search(template["match"], text):
+        return None
+    fields = {}
+    for field in _FIELDS:
+        pattern = template.get(field)
+        m = re.search(pattern, text, re.MULTILINE) if pattern else None
+        fields[field] = m.group(1).strip() if m else ""
+    fields.update(template.get("fixed", {}))
+    fields["date"] = _normalize_date(fields["date"]) if fields["date"] else ""
+    for field in ("amountNoVat", "amountWithVat"):
+        fields[field] = fields[field].replace(",", "")
+    fields["description"] = template.get("description_map", {}).get(fields["description"], fields["description"])
+    return fields
+
+
+def _text_result_confident(fields):
+    """Whether text-extracted fields can be trusted without the vision model.
+
+    Needs an invoice number, a valid date and both totals, with the total
+    including VAT equal to the pre-VAT total plus a known VAT rate (or no VAT).
+    """
+    if not (fields.get("invoiceNum") and fields.get("date")):
+        return False
+    try:
+        no_vat, with_vat = float(fields["amountNoVat"]), float(fields["amountWithVat"])
+    except (KeyError, ValueError):
+        return False
+    if no_vat <= 0:
+        return False
+    tolerance = max(0.05, no_vat * 0.001)
+    return (abs(with_vat - no_vat) <= tolerance
+            or any(abs(with_vat - no_vat * (1 + rate)) <= tolerance for rate in VAT_RATES))
+
+
+def extract_with_templates(text):
+    """Extractor: first TEXT_TEMPLATES entry whose result is confident.
+
+    Returns:
+        (fields, template name) or None
+    """
+    for template in TEXT_TEMPLATES:
+        fields = _apply_template(template, text)
+        if fields and _text_result_confident(fields):
+            return fields, template["name"]
+    return None
+
+
+# Extractors run in order on each page's text; each returns (fields, name) or None
+PAGE_EXTRACTORS = [extract_with_templates]
+
+
+def extract_text_layer(pdf_bytes):
+    """Resolve pages from their text layer.
+
+    Returns:
+        (page_count, {page number: (fields, extractor name)}) for resolved pages
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    resolved = {}
+    try:
+        for index in range(doc.page_count):
+            text = doc[index].get_text()
+            if len(text.strip()) < MIN_TEXT_CHARS:
+                continue
+            for extractor in PAGE_EXTRACTORS:
+                try:
+                    result = extractor(text)
+                except Exception as e:
+                    logger.warning(f"LLM2000: Extractor failed on page {index + 1}: {e}")
+                    continue
+                if result:
+                    resolved[index + 1] = result
+                    break
+        return doc.page_count, resolved
+    finally:
+        doc.close()
+
+
 def _parse_response(raw_text):
     """Parse JSON from Claude response, stripping markdown wrappers if present."""
     text = raw_text.strip()
@@ -124,15 +433,34 @@ def _parse_response(raw_text):
 def analyze_pdf(pdf_bytes):
     """Main entry point: PDF bytes in, invoice data out."""
     try:
-        images = pdf_pages_to_images(pdf_bytes)
-        result = analyze_invoice_images(images)
-        if result is None:
-            return {"ok": False, "error": "ANTHROPIC_API_KEY not configured"}
-        return {
+        page_count, resolved = extract_text_layer(pdf_bytes)
+        results = [[{"pages": [page], **fields, "source": "text"} for page, (fields, _) in sorted(resolved.items())]]
+        report = {page: {"page": page, "path": "text", "extractor": name}
+                  for page, (_, name) in resolved.items()}
+
+        vision_pages = [p for p in range(1, page_count + 1) if p not in resolved]
+        failed = []
+        if vision_pages:
+            if not ANTHROPIC_API_KEY or ANTHROPIC_API_KEY == "not-configured":
+                if not resolved:
+                    return {"ok": False, "error": "ANTHROPIC_API_KEY not configured"}
+                failed = vision_pages
+            else:
+                vision_results, failed = _analyze_vision(pdf_bytes, vision_pages, page_count)
+                results.extend(vision_results)
+            for page in vision_pages:
+                report[page] = {"page": page, "path": "vision"}
+        logger.info(f"LLM2000: {len(resolved)}/{page_count} pages from text, {len(vision_pages)} via vision")
+
+        response = {
             "ok": True,
-            "invoices": result.get("invoices", []),
-            "page_count": len(images),
+            "invoices": _merge_invoices(results),
+            "page_count": page_count,
+            "pages": [report[p] for p in sorted(report)],
         }
+        if failed:
+            response["failed_pages"] = failed
+        return response
     except json.JSONDecodeError as e:
         logger.error(f"LLM2000: Failed to parse Claude JSON: {e}")
         return {"ok": False, "error": f"Failed to parse AI response: {e}"}
@@ -142,3 +470,33 @@ def analyze_pdf(pdf_bytes):
     except Exception as e:
         logger.error(f"LLM2000: Analysis failed: {e}")
         return {"ok": False, "error": str(e)}
+
+
+def _analyze_vision(pdf_bytes, pages, page_count):
+    """Render the given pages and analyse them in concurrent windows.
+
+    Returns:
+        (list of invoice lists, one per successful window; pages no successful window covered)
+        Raises the first window's error if every window failed.
+    """
+    images = dict(zip(pages, pdf_pages_to_images(pdf_bytes, pages=pages)))
+    windows = _page_windows(pages)
+
+    def analyze_window(window):
+        return analyze_invoice_images([images[p] for p in window], window, page_count)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_REQUESTS, len(windows)))) as pool:
+        futures = [pool.submit(analyze_window, window) for window in windows]
+    results, done, errors = [], set(), []
+    for window, future in zip(windows, futures):
+        try:
+            invoices = future.result().get("invoices", [])
+        except Exception as e:
+            logger.error(f"LLM2000: Pages {window[0]}-{window[-1]} failed: {e}")
+            errors.append(e)
+            continue
+        results.append([{**inv, "source": "vision"} for inv in invoices])
+        done.update(window)
+    if not results:
+        raise errors[0]
+    return results, [p for p in pages if p not in done]
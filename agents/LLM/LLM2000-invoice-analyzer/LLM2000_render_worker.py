@@ -0,0 +1,27 @@
+"""
+LLM2000 - Page render worker
+Renders PDF pages to image bytes for LLM2000_invoice_analyzer's process pool.
+
+Kept separate (and free of project imports) so a spawned worker process can
+import it by name once its directory is on sys.path: the analyzer itself is
+loaded by file path and cannot be resolved when unpickling a task.
+"""
+
+import fitz  # PyMuPDF
+
+
+def render_pages(pdf_bytes, page_numbers, dpi, image_format, jpeg_quality):
+    """Render the given 0-based pages to image bytes."""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    images = []
+    try:
+        for page_num in page_numbers:
+            page = doc[page_num]
+            if image_format == "jpeg":
+                pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                images.append(pix.tobytes("jpeg", jpg_quality=jpeg_quality))
+            else:
+                images.append(page.get_pixmap(dpi=dpi).tobytes("png"))
+    finally:
+        doc.close()
+    return images
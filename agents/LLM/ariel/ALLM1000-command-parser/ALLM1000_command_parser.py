@@ -6,15 +6,24 @@ Returns structured command data:
   - command: debt_report / uncharged_delivery / unknown
   - confidence: high / medium / low
   - reply: text reply if command is unknown
+
+Parsed commands are cached in-process, keyed by a hash of the model, the
+rendered system prompt (which carries today's date) and the normalized message,
+so a repeated command ("דוח חייבים" every morning) skips the API call.
 """
 
 import os
+import sys
+import copy
 import json
+import time
+import hashlib
 import logging
+import unicodedata
+import importlib.util
+from collections import OrderedDict
 from pathlib import Path
 
-import requests
-
 if os.environ.get("IS_LAMBDA") != "true":
     from dotenv import load_dotenv
     env_path = Path(__file__).resolve().parent.parent.parent.parent.parent / ".env"
@@ -25,6 +34,11 @@ logger = logging.getLogger("urbangroup.ALLM1000")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 
+_response_cache = OrderedDict()  # least recently used first
+RESPONSE_CACHE_TTL_SECONDS = 6 * 60 * 60  # 6 hours (the date in the prompt also rolls the key daily)
+RESPONSE_CACHE_MAX_ENTRIES = 500
+_response_cache_stats = {"hits": 0, "misses": 0}
+
 SYSTEM_PROMPT = """אתה עוזר חכם של חברת אריאל (סניף 102 של Urban Group).
 תפקידך לזהות מה המשתמש רוצה מתוך הודעת WhatsApp, כולל סינונים אם צוינו.
 
@@ -73,13 +87,40 @@ def _get_system_prompt():
     return SYSTEM_PROMPT.replace("{today}", today).replace("{year}", year)
 
 
-def _call_openai(text):
+def _response_cache_key(system_prompt, text):
+    """Hash of model + system prompt + message (NFC, whitespace-collapsed, lowercased)."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split()).lower()
+    prompt_version = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+    return hashlib.sha256(f"{OPENAI_MODEL}\n{prompt_version}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def get_response_cache_stats():
+    """Return response cache counters and hit rate since cold start."""
+    total = _response_cache_stats["hits"] + _response_cache_stats["misses"]
+    return {
+        **_response_cache_stats,
+        "cache_entries": len(_response_cache),
+        "hit_rate": round(_response_cache_stats["hits"] / total, 3) if total else 0.0,
+    }
+
+
+# LLM calls go through llm_call.post: recorded by llm_metrics, plain requests.post without it
+if "llm_call" not in sys.modules:
+    _llm_call_path = Path(__file__).resolve().parent.parent.parent / "llm_call.py"
+    _spec = importlib.util.spec_from_file_location("llm_call", _llm_call_path)
+    sys.modules["llm_call"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["llm_call"])
+llm_call = sys.modules["llm_call"]
+
+
+def _call_openai(text, system_prompt=None):
     """Call ChatGPT to parse a command."""
     if not OPENAI_API_KEY:
         logger.error("OPENAI_API_KEY not set")
         return None
 
-    resp = requests.post(
+    resp = llm_call.post(
+        "ALLM1000.chat", OPENAI_MODEL,
         "https://api.openai.com/v1/chat/completions",
         headers={
             "Authorization": f"Bearer {OPENAI_API_KEY}",
@@ -88,7 +129,7 @@ def _call_openai(text):
         json={
             "model": OPENAI_MODEL,
             "messages": [
-                {"role": "system", "content": _get_system_prompt()},
+                {"role": "system", "content": system_prompt or _get_system_prompt()},
                 {"role": "user", "content": text},
             ],
             "max_tokens": 300,
@@ -109,20 +150,38 @@ def _parse_response(raw_text):
     return json.loads(text)
 
 
-def parse_command(text):
+def parse_command(text, use_cache=True):
     """Parse a user message and identify the command.
 
     Args:
         text: User message text
+        use_cache: Answer repeats from the response cache (default True)
 
     Returns:
         dict: {command, confidence, reply} or None on failure
     """
     try:
+        system_prompt = _get_system_prompt()
+        cache_key = _response_cache_key(system_prompt, text)
+        cached = _response_cache.get(cache_key) if use_cache else None
+        if cached and (time.time() - cached["cached_at"]) >= RESPONSE_CACHE_TTL_SECONDS:
+            _response_cache.pop(cache_key, None)
+            cached = None
+        if cached:
+            _response_cache[cache_key] = _response_cache.pop(cache_key, cached)  # now most recently used
+            _response_cache_stats["hits"] += 1
+            logger.info(f"ALLM1000: Cache hit: {cached['result']}")
+            return copy.deepcopy(cached["result"])
+
+        _response_cache_stats["misses"] += 1
         logger.info(f"ALLM1000: Parsing command from text ({len(text)} chars)")
-        raw = _call_openai(text)
+        raw = _call_openai(text, system_prompt)
         result = _parse_response(raw)
         logger.info(f"ALLM1000: Result: {result}")
+        _response_cache.pop(cache_key, None)
+        if len(_response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+            _response_cache.popitem(last=False)  # drop the least recently used entry
+        _response_cache[cache_key] = {"result": copy.deepcopy(result), "cached_at": time.time()}
         return result
     except json.JSONDecodeError as e:
         logger.error(f"ALLM1000: Failed to parse LLM JSON: {e}")
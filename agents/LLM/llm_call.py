@@ -0,0 +1,47 @@
+"""
+llm_call - requests.post for LLM API calls, recorded by llm_metrics.
+
+Every LLM call site posts through post(site, model, url, ...). It goes through
+llm_metrics.post when that module loads and falls back to plain requests.post
+when it does not, so a metrics problem never fails an LLM call.
+"""
+
+import sys
+import logging
+import importlib.util
+from pathlib import Path
+
+import requests
+
+logger = logging.getLogger("urbangroup.llm_call")
+
+# Lazy-loaded llm_metrics module (False once loading failed)
+_llm_metrics = None
+
+
+def _get_llm_metrics():
+    """Lazy-load llm_metrics module (shared with server.py through sys.modules)."""
+    global _llm_metrics
+    if _llm_metrics is None:
+        try:
+            if "llm_metrics" in sys.modules:
+                _llm_metrics = sys.modules["llm_metrics"]
+            else:
+                metrics_path = Path(__file__).resolve().parent / "llm_metrics.py"
+                spec = importlib.util.spec_from_file_location("llm_metrics", metrics_path)
+                _llm_metrics = importlib.util.module_from_spec(spec)
+                sys.modules["llm_metrics"] = _llm_metrics
+                spec.loader.exec_module(_llm_metrics)
+        except Exception as e:
+            logger.warning(f"Failed to load llm_metrics, LLM calls go unrecorded: {e}")
+            sys.modules.pop("llm_metrics", None)
+            _llm_metrics = False
+    return _llm_metrics or None
+
+
+def post(site, model, url, **kwargs):
+    """requests.post, recorded by llm_metrics under `site` when it is available."""
+    metrics = _get_llm_metrics()
+    if metrics is None:
+        return requests.post(url, **kwargs)
+    return metrics.post(site, model, url, **kwargs)
@@ -0,0 +1,242 @@
+"""
+llm_metrics - Latency, token and outcome instrumentation for LLM API calls.
+
+Call sites send their HTTP request through llm_call.post(site, model, url, ...),
+which hands it to post() here: a thin wrapper over requests.post that times the
+call, reads token usage from the response (OpenAI
+usage.prompt_tokens/completion_tokens, Anthropic usage.input_tokens/output_tokens),
+including how many prompt tokens the provider served from its prompt cache
+(cached_tokens), and records the outcome (ok, http_<status>, or the exception name).
+
+Per site the process keeps running totals and the last WINDOW_CALLS latencies
+(exact p50/p95 for this container). Counters and a latency histogram are also
+accumulated per UTC hour and flushed to llm_metrics_db every
+FLUSH_INTERVAL_SECONDS from a background thread, so dashboard() can report
+p50/p95 per call site across all containers.
+"""
+
+import sys
+import time
+import logging
+import threading
+import importlib.util
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+
+logger = logging.getLogger("urbangroup.llm_metrics")
+
+WINDOW_CALLS = 500  # recent calls per site kept for in-process percentiles
+FLUSH_INTERVAL_SECONDS = 60
+LATENCY_BUCKETS_MS = (100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 13000, 20000, 30000)
+
+_lock = threading.Lock()
+_sites = {}    # site -> running totals + recent latencies
+_pending = {}  # (site, hour) -> {"model", "counters"} not yet flushed
+_flush_state = {"last": time.time(), "running": False}
+
+# Lazy-loaded llm_metrics_db module
+_metrics_db = None
+
+
+def _get_metrics_db():
+    """Lazy-load llm_metrics_db module."""
+    global _metrics_db
+    if _metrics_db is None:
+        try:
+            if "llm_metrics_db" in sys.modules:
+                _metrics_db = sys.modules["llm_metrics_db"]
+            else:
+                db_path = Path(__file__).resolve().parent.parent.parent / "database" / "maintenance" / "llm_metrics_db.py"
+                spec = importlib.util.spec_from_file_location("llm_metrics_db", db_path)
+                _metrics_db = importlib.util.module_from_spec(spec)
+                sys.modules["llm_metrics_db"] = _metrics_db
+                spec.loader.exec_module(_metrics_db)
+        except Exception as e:
+            logger.warning(f"Failed to load llm_metrics_db: {e}")
+            return None
+    return _metrics_db
+
+
+# ── Recording ────────────────────────────────────────────────
+
+def _bucket(latency_ms):
+    return f"lat_{bisect_left(LATENCY_BUCKETS_MS, latency_ms):02d}"
+
+
+def record(site, model, latency_ms, prompt_tokens=0, completion_tokens=0, cached_tokens=0, outcome="ok"):
+    """Record one LLM call."""
+    error = outcome != "ok"
+    hour = datetime.utcnow().strftime("%Y-%m-%dT%H")
+    with _lock:
+        stats = _sites.get(site)
+        if stats is None:
+            stats = _sites[site] = {"model": model, "calls": 0, "errors": 0, "prompt_tokens": 0,
+                                    "completion_tokens": 0, "cached_tokens": 0, "latency_ms": 0.0, "outcomes": {},
+                                    "recent": deque(maxlen=WINDOW_CALLS)}
+        stats["model"] = model
+        stats["calls"] += 1
+        stats["errors"] += error
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["latency_ms"] += latency_ms
+        stats["outcomes"][outcome] = stats["outcomes"].get(outcome, 0) + 1
+        stats["recent"].append(latency_ms)
+
+        pending = _pending.setdefault((site, hour), {"model": model, "counters": {}})
+        pending["model"] = model
+        counters = pending["counters"]
+        for name, value in (("calls", 1), ("errors", int(error)), ("latency_ms", round(latency_ms)),
+                            ("prompt_tokens", prompt_tokens), ("completion_tokens", completion_tokens),
+                            ("cached_tokens", cached_tokens), (_bucket(latency_ms), 1)):
+            counters[name] = counters.get(name, 0) + value
+    _maybe_flush()
+
+
+def post(site, model, url, **kwargs):
+    """requests.post that records latency, token usage and outcome under `site`."""
+    t0 = time.perf_counter()
+    try:
+        resp = requests.post(url, **kwargs)
+    except Exception as e:
+        record(site, model, (time.perf_counter() - t0) * 1000, outcome=type(e).__name__)
+        raise
+    latency_ms = (time.perf_counter() - t0) * 1000
+    usage = {}
+    if resp.ok:
+        try:
+            usage = resp.json().get("usage") or {}
+        except ValueError:
+            pass
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", usage.get("cache_read_input_tokens", 0))
+    record(
+        site, model, latency_ms,
+        prompt_tokens=int(usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0),
+        completion_tokens=int(usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0),
+        cached_tokens=int(cached or 0),
+        outcome="ok" if resp.ok else f"http_{resp.status_code}",
+    )
+    return resp
+
+
+# ── Flushing ─────────────────────────────────────────────────
+
+def _maybe_flush():
+    with _lock:
+        if _flush_state["running"] or time.time() - _flush_state["last"] < FLUSH_INTERVAL_SECONDS:
+            return
+        _flush_state["running"] = True
+    threading.Thread(target=flush, name="llm-metrics-flush", daemon=True).start()
+
+
+def flush():
+    """Write pending hourly counters to llm_metrics_db. Failed items are kept for the next flush."""
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        _flush_state["running"] = True
+    db = _get_metrics_db()
+    try:
+        for (site, hour), entry in batch.items():
+            try:
+                if db is None:
+                    raise RuntimeError("llm_metrics_db unavailable")
+                db.add_counters(site, hour, entry["model"], entry["counters"])
+            except Exception as e:
+                logger.warning(f"LLM metrics flush failed for {site} {hour}: {e}")
+                with _lock:
+                    merged = _pending.setdefault((site, hour), {"model": entry["model"], "counters": {}})
+                    for name, value in entry["counters"].items():
+                        merged["counters"][name] = merged["counters"].get(name, 0) + value
+    finally:
+        with _lock:
+            _flush_state["last"] = time.time()
+            _flush_state["running"] = False
+
+
+# ── Reporting ────────────────────────────────────────────────
+
+def _exact_percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))], 1)
+
+
+def _histogram_percentile(counters, q):
+    """Upper bound of the latency bucket holding the q-quantile (None without calls)."""
+    total = sum(counters.get(f"lat_{i:02d}", 0) for i in range(len(LATENCY_BUCKETS_MS) + 1))
+    if not total:
+        return None
+    seen = 0
+    for i in range(len(LATENCY_BUCKETS_MS) + 1):
+        seen += counters.get(f"lat_{i:02d}", 0)
+        if seen >= q * total:
+            return LATENCY_BUCKETS_MS[min(i, len(LATENCY_BUCKETS_MS) - 1)]
+    return LATENCY_BUCKETS_MS[-1]
+
+
+def process_stats():
+    """Per-site stats of this process since cold start, slowest p95 first."""
+    with _lock:
+        snapshot = {site: {**s, "recent": sorted(s["recent"]), "outcomes": dict(s["outcomes"])}
+                    for site, s in _sites.items()}
+    rows = []
+    for site, s in snapshot.items():
+        rows.append({
+            "site": site,
+            "model": s["model"],
+            "calls": s["calls"],
+            "errors": s["errors"],
+            "error_rate": round(s["errors"] / s["calls"], 3) if s["calls"] else 0.0,
+            "avg_ms": round(s["latency_ms"] / s["calls"], 1) if s["calls"] else None,
+            "p50_ms": _exact_percentile(s["recent"], 0.50),
+            "p95_ms": _exact_percentile(s["recent"], 0.95),
+            "prompt_tokens": s["prompt_tokens"],
+            "completion_tokens": s["completion_tokens"],
+            "cached_tokens": s["cached_tokens"],
+            "cached_rate": round(s["cached_tokens"] / s["prompt_tokens"], 3) if s["prompt_tokens"] else 0.0,
+            "outcomes": s["outcomes"],
+        })
+    return sorted(rows, key=lambda r: r["p95_ms"] or 0, reverse=True)
+
+
+def dashboard(hours=24):
+    """Per-site stats over the last `hours` from all containers (flushes this one first).
+
+    p50/p95 are histogram estimates: the upper bound of the bucket holding the percentile.
+    """
+    flush()
+    db = _get_metrics_db()
+    if db is None:
+        return []
+    since = (datetime.utcnow() - timedelta(hours=hours - 1)).strftime("%Y-%m-%dT%H")
+    totals = {}
+    for item in db.get_since(since):
+        site = totals.setdefault(item["site"], {"model": item.get("model", ""), "last_hour": ""})
+        if item["hour"] >= site["last_hour"]:
+            site["model"], site["last_hour"] = item.get("model", ""), item["hour"]
+        for name, value in item.items():
+            if isinstance(value, int) and name != "expires_at":
+                site[name] = site.get(name, 0) + value
+    rows = []
+    for name, s in totals.items():
+        calls = s.get("calls", 0)
+        rows.append({
+            "site": name,
+            "model": s["model"],
+            "calls": calls,
+            "errors": s.get("errors", 0),
+            "error_rate": round(s.get("errors", 0) / calls, 3) if calls else 0.0,
+            "avg_ms": round(s.get("latency_ms", 0) / calls, 1) if calls else None,
+            "p50_ms": _histogram_percentile(s, 0.50),
+            "p95_ms": _histogram_percentile(s, 0.95),
+            "prompt_tokens": s.get("prompt_tokens", 0),
+            "completion_tokens": s.get("completion_tokens", 0),
+            "cached_tokens": s.get("cached_tokens", 0),
+            "cached_rate": round(s.get("cached_tokens", 0) / s["prompt_tokens"], 3) if s.get("prompt_tokens") else 0.0,
+        })
+    return sorted(rows, key=lambda r: r["p95_ms"] or 0, reverse=True)
@@ -8,14 +8,30 @@ Returns structured service call data:
   - urgency: דחיפות (low/medium/high/critical)
   - is_service_call: bool - האם זו קריאת שירות
   - summary: תמצית לשליחה ללקוח
+
+Requests are assembled so that they start with the same bytes for every
+message: the active system prompt (bot_prompts_db, cached and versioned) is the
+first message on its own, and the per-message RAG context follows it as a
+separate system message, just before the customer's message. The stable prefix
+is what lets provider-side prompt caching reuse the prompt across messages.
+
+Text analyses are cached in-process, keyed by a hash of the model, the prompt
+version (prompt id + content hash), the RAG context and the normalized message.
+Results with RAG context expire sooner, and CACHE_RAG_RESPONSES=false keeps
+them out of the cache altogether.
 """
 
 import os
 import sys
+import copy
 import json
+import time
 import base64
+import hashlib
 import logging
+import unicodedata
 import importlib.util
+from collections import OrderedDict
 from pathlib import Path
 
 import requests
@@ -29,9 +45,21 @@ logger = logging.getLogger("urbangroup.MLLM1000")
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
 
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
 
+_response_cache = OrderedDict()  # least recently used first
+RESPONSE_CACHE_TTL_SECONDS = 6 * 60 * 60  # 6 hours
+RAG_RESPONSE_CACHE_TTL_SECONDS = 15 * 60  # knowledge can change under a RAG-enriched answer
+RESPONSE_CACHE_MAX_ENTRIES = 500
+CACHE_RAG_RESPONSES = os.getenv("CACHE_RAG_RESPONSES", "true").lower() == "true"
+_response_cache_stats = {"hits": 0, "misses": 0, "uncached": 0}
+
+# Stable prompt prefix: {"key": (prompt_id, updated_at), "content": ..., "version": ...}
+_prompt_prefix = {"key": None, "content": None, "version": None}
+_prompt_prefix_stats = {"builds": 0, "reuses": 0}
+
 SYSTEM_PROMPT = """אתה מנתח קריאות שירות של חברת Urban Group - חברה לאחזקת מבנים ומתקני חניה.
 תפקידך לנתח הודעות ותמונות שמגיעות מלקוחות דרך WhatsApp ולזהות קריאות שירות.
 
@@ -88,15 +116,37 @@ def _get_prompts_db():
 
 def _get_system_prompt():
     """Get the system prompt from DB, falling back to hardcoded constant."""
+    return _get_prompt_prefix()[0]
+
+
+def _get_prompt_prefix():
+    """Active system prompt and its version ("<prompt_id>:<content hash>", "builtin:..." for the constant).
+
+    bot_prompts_db caches the active prompt and revalidates it against its
+    version counter; the content hash is computed once per prompt revision.
+    """
+    prompt = None
     try:
         db = _get_prompts_db()
         if db:
             prompt = db.get_active_prompt()
-            if prompt and prompt.get("content"):
-                return prompt["content"]
     except Exception as e:
         logger.warning(f"Failed to load prompt from DB, using default: {e}")
-    return SYSTEM_PROMPT
+    if prompt and prompt.get("content"):
+        key, content = (prompt.get("prompt_id", ""), prompt.get("updated_at", "")), prompt["content"]
+    else:
+        key, content = ("builtin", ""), SYSTEM_PROMPT
+
+    if _prompt_prefix["key"] == key and _prompt_prefix["content"] == content:
+        _prompt_prefix_stats["reuses"] += 1
+    else:
+        _prompt_prefix_stats["builds"] += 1
+        _prompt_prefix.update({
+            "key": key,
+            "content": content,
+            "version": f"{key[0]}:{hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]}",
+        })
+    return _prompt_prefix["content"], _prompt_prefix["version"]
 
 
 # Lazy-loaded rag_retrieval module
@@ -122,30 +172,47 @@ def _get_rag_retrieval():
     return _rag_module
 
 
-def _enrich_prompt_with_rag(base_prompt, query_text):
-    """Inject relevant knowledge context into the system prompt.
+def _get_rag_context(query_text):
+    """Relevant knowledge for a message, as text for its own system message.
 
     Args:
-        base_prompt: The base system prompt
-        query_text: The user's message text (for similarity search)
+        query_text: The user's message text (for lexical / similarity search)
 
     Returns:
-        str: Prompt with RAG context appended, or original prompt if no matches
+        str: RAG context, or "" if no matches
     """
     try:
         rag = _get_rag_retrieval()
         if not rag:
-            return base_prompt
-        matches = rag.search_knowledge(query_text, top_k=3)
+            return ""
+        matches = rag.hybrid_search(query_text, top_k=3)
         if not matches:
-            return base_prompt
-        context = rag.format_rag_context(matches)
+            return ""
+        context = rag.format_rag_context(matches).strip()
         if context:
-            logger.info(f"RAG: Injecting {len(matches)} knowledge items into prompt")
-            return base_prompt + context
+            logger.info(f"RAG: Adding {len(matches)} knowledge items to the request")
+            return context
     except Exception as e:
-        logger.warning(f"RAG enrichment failed, using base prompt: {e}")
-    return base_prompt
+        logger.warning(f"RAG lookup failed, sending without context: {e}")
+    return ""
+
+
+def _build_messages(system_prompt, rag_context, user_content):
+    """Chat messages: the stable system prompt first, then the per-message parts."""
+    messages = [{"role": "system", "content": system_prompt}]
+    if rag_context:
+        messages.append({"role": "system", "content": rag_context})
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+# LLM calls go through llm_call.post: recorded by llm_metrics, plain requests.post without it
+if "llm_call" not in sys.modules:
+    _llm_call_path = Path(__file__).resolve().parent.parent.parent / "llm_call.py"
+    _spec = importlib.util.spec_from_file_location("llm_call", _llm_call_path)
+    sys.modules["llm_call"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["llm_call"])
+llm_call = sys.modules["llm_call"]
 
 
 def download_whatsapp_media(media_id):
@@ -217,8 +284,9 @@ def _call_openai(messages):
         logger.error("OPENAI_API_KEY not set")
         return None
 
-    resp = requests.post(
-        "https://api.openai.com/v1/chat/completions",
+    resp = llm_call.post(
+        "MLLM1000.chat", OPENAI_MODEL,
+        f"{OPENAI_BASE_URL}/chat/completions",
         headers={
             "Authorization": f"Bearer {OPENAI_API_KEY}",
             "Content-Type": "application/json",
@@ -253,30 +321,70 @@ def analyze_image(image_bytes, mime_type="image/jpeg", caption=""):
         },
     })
 
-    prompt = _get_system_prompt()
-    # RAG: enrich prompt with relevant knowledge (use caption as query)
-    prompt = _enrich_prompt_with_rag(prompt, caption or "image analysis")
-    raw = _call_openai([
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": user_content},
-    ])
+    prompt, _ = _get_prompt_prefix()
+    # RAG: relevant knowledge (use caption as query)
+    rag_context = _get_rag_context(caption or "image analysis")
+    raw = _call_openai(_build_messages(prompt, rag_context, user_content))
     return _parse_llm_response(raw)
 
 
-def analyze_text(text):
+def _response_cache_key(prompt_version, rag_context, text):
+    """Hash of model + prompt version + RAG context + normalized message."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split()).lower()
+    rag_hash = hashlib.sha256(rag_context.encode("utf-8")).hexdigest()[:16] if rag_context else "-"
+    return hashlib.sha256(f"{OPENAI_MODEL}\n{prompt_version}\n{rag_hash}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def get_response_cache_stats():
+    """Return response cache counters and hit rate since cold start."""
+    total = _response_cache_stats["hits"] + _response_cache_stats["misses"]
+    return {
+        **_response_cache_stats,
+        "cache_entries": len(_response_cache),
+        "hit_rate": round(_response_cache_stats["hits"] / total, 3) if total else 0.0,
+        "prompt_version": _prompt_prefix["version"],
+        "prompt_prefix_builds": _prompt_prefix_stats["builds"],
+        "prompt_prefix_reuses": _prompt_prefix_stats["reuses"],
+    }
+
+
+def analyze_text(text, use_cache=True):
     """Analyze a text message using ChatGPT.
 
+    Args:
+        text: Message text
+        use_cache: Answer repeats from the response cache (default True)
+
     Returns:
         dict: Structured service call data
     """
-    prompt = _get_system_prompt()
-    # RAG: enrich prompt with relevant knowledge
-    prompt = _enrich_prompt_with_rag(prompt, text)
-    raw = _call_openai([
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": text},
-    ])
-    return _parse_llm_response(raw)
+    prompt, prompt_version = _get_prompt_prefix()
+    # RAG: relevant knowledge, sent after the stable prompt
+    rag_context = _get_rag_context(text)
+    cacheable = use_cache and (CACHE_RAG_RESPONSES or not rag_context)
+    ttl = RAG_RESPONSE_CACHE_TTL_SECONDS if rag_context else RESPONSE_CACHE_TTL_SECONDS
+
+    cache_key = _response_cache_key(prompt_version, rag_context, text)
+    cached = _response_cache.get(cache_key) if cacheable else None
+    if cached and (time.time() - cached["cached_at"]) >= ttl:
+        _response_cache.pop(cache_key, None)
+        cached = None
+    if cached:
+        _response_cache[cache_key] = _response_cache.pop(cache_key, cached)  # now most recently used
+        _response_cache_stats["hits"] += 1
+        logger.info("MLLM1000: Response cache hit")
+        return copy.deepcopy(cached["result"])
+
+    _response_cache_stats["misses" if cacheable else "uncached"] += 1
+    raw = _call_openai(_build_messages(prompt, rag_context, text))
+    result = _parse_llm_response(raw)
+    if not cacheable:
+        return result
+    _response_cache.pop(cache_key, None)
+    if len(_response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)  # drop the least recently used entry
+    _response_cache[cache_key] = {"result": copy.deepcopy(result), "cached_at": time.time()}
+    return result
 
 
 def process(msg_type, text="", media_id="", caption=""):
@@ -0,0 +1,96 @@
+"""
+bench_ann_recall - recall@k and latency of the knowledge ANN index vs exact search.
+
+Generates clustered synthetic embeddings (knowledge items about the same fault
+land close together), builds knowledge_ann.IVFIndex, and for several nprobe
+values reports recall@k against exact brute-force search and the per-query time
+of both. Also reports build, save and load times for the /tmp file.
+
+Pure CPU — no OpenAI or DynamoDB access.
+
+Usage:
+    python agents/LLM/maintenance/benchmarks/bench_ann_recall.py [--items 50000] [--dims 1536] [--k 10]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import importlib.util
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+ANN_PATH = Path(__file__).resolve().parent.parent / "knowledge_ann.py"
+_spec = importlib.util.spec_from_file_location("knowledge_ann", ANN_PATH)
+ann = importlib.util.module_from_spec(_spec)
+sys.modules["knowledge_ann"] = ann
+_spec.loader.exec_module(ann)
+
+
+def make_corpus(n, dims, rng, per_cluster=40):
+    centers = rng.standard_normal((max(1, n // per_cluster), dims), dtype=np.float32)
+    labels = rng.integers(0, len(centers), n)
+    vectors = centers[labels] + 1.5 * rng.standard_normal((n, dims), dtype=np.float32)
+    items = [{"id": f"k{i}", "title": "", "content": "", "tags": [], "type": "manual",
+              "embedding": array("f", vectors[i].tobytes())} for i in range(n)]
+    return items, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    items, vectors = make_corpus(args.items, args.dims, rng)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.choice(args.items, args.queries, replace=False)
+    queries = vectors[picks] + 1.0 * rng.standard_normal((args.queries, args.dims), dtype=np.float32)
+
+    t0 = time.perf_counter()
+    index = ann.IVFIndex.build(items, version=1)
+    build_s = time.perf_counter() - t0
+    path = os.path.join(tempfile.gettempdir(), "bench_knowledge_ann.npz")
+    t0 = time.perf_counter()
+    index.save(path)
+    save_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ann.IVFIndex.load(path)
+    load_s = time.perf_counter() - t0
+    os.remove(path)
+    print(f"{args.items} items x {args.dims} dims, {len(index.centroids)} lists: "
+          f"build {build_s:.1f} s, save {save_s:.2f} s, load {load_s:.2f} s")
+
+    t0 = time.perf_counter()
+    exact = []
+    for q in queries:
+        scores = normalized @ (q / np.linalg.norm(q))
+        top = np.argpartition(-scores, args.k - 1)[:args.k]
+        exact.append({f"k{i}" for i in top})
+    exact_ms = (time.perf_counter() - t0) * 1000 / args.queries
+    print(f"\n{'search':<16} {'recall@' + str(args.k):>10} {'ms/query':>10}")
+    print(f"{'exact':<16} {1.0:>10.3f} {exact_ms:>10.2f}")
+
+    default = index.default_nprobe()
+    for nprobe in sorted({1, 4, default, default * 2, default * 4}):
+        if nprobe > len(index.centroids):
+            continue
+        hits = 0
+        t0 = time.perf_counter()
+        for q, truth in zip(queries, exact):
+            found = index.search(q, top_k=args.k, min_score=-1.0, nprobe=nprobe)
+            hits += len(truth & {r["id"] for r in found})
+        ms = (time.perf_counter() - t0) * 1000 / args.queries
+        label = f"nprobe={nprobe}" + (" *" if nprobe == default else "")
+        print(f"{label:<16} {hits / (args.k * args.queries):>10.3f} {ms:>10.2f}")
+    print("\n* default nprobe")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+bench_hybrid_search - embedding calls and latency of hybrid (BM25-first) vs vector-only RAG search.
+
+Seeds knowledge_db on the in-memory DynamoDB stand-in with synthetic Hebrew
+troubleshooting items (device × fault), then runs a set of customer-style
+messages — short "device + fault" texts, paraphrases with prefixes and niqqud,
+and free text that shares few words with the knowledge base — through
+search_knowledge (always embeds) and hybrid_search (embeds only on weak lexical
+matches).
+
+The embeddings API is replaced by a stub that sleeps --embed-ms (a typical
+OpenAI round trip from Lambda) and returns bag-of-words hash vectors, and the
+embedding cache is cleared before every query so each embedding is a real call.
+
+Reports per mode: embedding calls, mean / p95 latency, and how often the top
+result is the item the message was generated from (device + fault messages
+only). The stub vectors know nothing about Hebrew prefixes, so vector-only
+accuracy here is a floor, not what the real model achieves.
+
+Usage:
+    python agents/LLM/maintenance/benchmarks/bench_hybrid_search.py [--embed-ms 250] [--rounds 3]
+"""
+
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import importlib.util
+from pathlib import Path
+
+os.environ["DYNAMODB_BACKEND"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent.parent
+RAG_PATH = PROJECT_ROOT / "agents" / "LLM" / "maintenance" / "rag_retrieval.py"
+_spec = importlib.util.spec_from_file_location("rag_retrieval", RAG_PATH)
+rag = importlib.util.module_from_spec(_spec)
+sys.modules["rag_retrieval"] = rag
+_spec.loader.exec_module(rag)
+
+DIMS = 256
+
+DEVICES = ["דוד שמש", "דוד חשמל", "מזגן", "משאבת מים", "מעלית", "שער חשמלי", "גנרטור", "לוח חשמל",
+           "מערכת כיבוי אש", "אינטרקום"]
+FAULTS = [
+    ("לא עובד", "בדוק אספקת חשמל, מפסק פחת ונתיך לפני הזמנת טכנאי"),
+    ("נזילה", "סגור את ברז הראשי, צלם את מקום הנזילה ופתח קריאה דחופה"),
+    ("רעש חזק", "רעש חריג מעיד על מיסב שחוק או חלק רופף, יש להפסיק הפעלה"),
+    ("קצר חשמלי", "אל תיגע במכשיר, נתק את המפסק בלוח ופתח קריאה דחופה"),
+    ("לא מחמם", "בדוק את התרמוסטט וגוף החימום, ובדוד שמש את הקולטים"),
+    ("ריח שרוף", "נתק מיד מהחשמל, ריח שרוף מעיד על התחממות יתר של מנוע"),
+]
+SHORT = ["{device} {fault}", "ה{device} {fault}", "{device} מספר {number} {fault}"]
+PARAPHRASE = ["שלום, יש לנו בעיה: ב{device} {fault} כבר יומיים", "וְהַ{device} {fault}, תודה"]
+FREE_TEXT = [
+    "משהו לא בסדר אצלנו בבניין, אפשר לשלוח מישהו?",
+    "הדיירים מתלוננים כבר שבוע ואף אחד לא מגיע",
+    "יש בעיה דחופה בקומה שלישית",
+    "image analysis",
+]
+
+
+def fake_vector(text):
+    """Bag-of-words hash embedding: texts sharing words get similar vectors."""
+    vector = [0.0] * DIMS
+    for word in text.split():
+        h = int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16)
+        vector[h % DIMS] += 1.0
+        vector[(h >> 16) % DIMS] += 0.5
+    return vector
+
+
+def install_embedding_stub(embed_ms):
+    calls = {"n": 0}
+
+    def request(texts):
+        calls["n"] += 1
+        time.sleep(embed_ms / 1000)
+        return [fake_vector(t) for t in texts]
+
+    rag._request_embeddings = request
+    rag._get_embedding_cache_db = lambda: None
+    return calls
+
+
+def seed(db):
+    items = []
+    for device in DEVICES:
+        for fault, advice in FAULTS:
+            text = f"{device} {fault}"
+            items.append({"title": text, "content": f"{text}: {advice}", "type": "manual",
+                          "embedding": fake_vector(f"{text} {advice}")})
+    db.save_items(items)
+
+
+def make_queries(rng):
+    """(message, title of the item it is about, or None for free text)"""
+    queries = []
+    for template in SHORT + PARAPHRASE:
+        for _ in range(6):
+            device, fault = rng.choice(DEVICES), rng.choice(FAULTS)[0]
+            queries.append((template.format(device=device, fault=fault, number=rng.randint(10000, 99999)),
+                            f"{device} {fault}"))
+    return queries + [(text, None) for text in FREE_TEXT]
+
+
+def run(search, queries, calls):
+    calls["n"] = 0
+    timings, correct = [], 0
+    for query, expected in queries:
+        rag._embedding_lru.clear()
+        t0 = time.perf_counter()
+        results = search(query, top_k=3)
+        timings.append((time.perf_counter() - t0) * 1000)
+        if expected and results and results[0]["title"] == expected:
+            correct += 1
+    timings.sort()
+    labelled = sum(1 for _, expected in queries if expected)
+    return calls["n"], sum(timings) / len(timings), timings[int(len(timings) * 0.95) - 1], correct / labelled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embed-ms", type=float, default=250.0, help="simulated embeddings API latency")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    calls = install_embedding_stub(args.embed_ms)
+    db = rag._get_knowledge_db()
+    seed(db)
+    rng = random.Random(3)
+    queries = [q for _ in range(args.rounds) for q in make_queries(rng)]
+    rag._rebuild_indexes(db)  # build the ANN and BM25 indexes outside the timings
+
+    v_calls, v_mean, v_p95, v_acc = run(rag.search_knowledge, queries, calls)
+    rag.get_search_stats(reset=True)
+    h_calls, h_mean, h_p95, h_acc = run(rag.hybrid_search, queries, calls)
+    stats = rag.get_search_stats()
+
+    print(f"{len(queries)} queries, {len(DEVICES) * len(FAULTS)} knowledge items, "
+          f"embeddings API {args.embed_ms:.0f} ms\n")
+    print(f"{'mode':<14} {'embed calls':>11} {'mean ms':>9} {'p95 ms':>9} {'top-1':>7}")
+    print(f"{'vector-only':<14} {v_calls:>11} {v_mean:>9.1f} {v_p95:>9.1f} {v_acc:>7.0%}")
+    print(f"{'hybrid':<14} {h_calls:>11} {h_mean:>9.1f} {h_p95:>9.1f} {h_acc:>7.0%}")
+    print(f"\nembedding calls avoided: {stats['embedding_calls_avoided']} "
+          f"({stats['avoided_rate']:.0%}); lexical path {stats['avg_lexical_ms']} ms, "
+          f"hybrid path {stats['avg_hybrid_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
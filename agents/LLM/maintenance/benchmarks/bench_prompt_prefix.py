@@ -0,0 +1,221 @@
+"""
+bench_prompt_prefix - provider prompt-cache reuse and time to first token of MLLM1000 requests.
+
+Starts a stand-in for the OpenAI chat completions API on localhost and points
+MLLM1000 at it (OPENAI_BASE_URL). The stand-in behaves like automatic prompt
+caching: a request whose serialized messages share a prefix of at least
+--min-cached tokens with an earlier request (in 128-token steps) gets that
+prefix from cache, reports it as usage.prompt_tokens_details.cached_tokens, and
+its time to first token (TTFT) is --base-ms plus --prefill-ms per 1000
+uncached tokens (cached tokens cost a tenth of that). Tokens are estimated as
+--chars-per-token characters.
+
+The active prompt is seeded into bot_prompts_db (in-memory DynamoDB): the
+built-in prompt plus operator examples up to --prompt-tokens, since prompts
+edited from the website grow that way. RAG lookups are stubbed to return one to
+three knowledge items for most messages (rag_retrieval.format_rag_context is
+real), and the response cache is bypassed so every message reaches the server.
+
+Modes:
+  concatenated  RAG context appended to the system prompt (previous behaviour)
+  stable-prefix system prompt alone first, RAG context as its own message after it
+
+Appending already left the start of the request unchanged, so both modes
+should reuse the whole prompt; the run checks that the split keeps it that way,
+and counts bot_prompts_db scans across all messages.
+
+Usage:
+    python agents/LLM/maintenance/benchmarks/bench_prompt_prefix.py [--messages 120] [--prompt-tokens 2000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+os.environ["DYNAMODB_BACKEND"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent.parent
+CACHE_STEP = 128  # tokens, granularity of cached prefixes
+
+DEVICES = ["מטען", "מחסום", "שער חניה", "מתקן חניה", "לוח חשמל", "מעלית רכב", "משאבת מים", "תאורת חניון"]
+FAULTS = ["לא עובד", "תקוע", "לא מגיב", "עושה רעש", "נזילה מתחת", "מציג שגיאה", "נתקע באמצע", "לא נטען"]
+TEMPLATES = ["{device} {fault}", "שלום, ה{device} בקומה {floor} {fault}", "דחוף! {device} {fault} מהבוקר",
+             "מספר מנוי:{number} ה{device} {fault}"]
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# ── Stand-in LLM server ──────────────────────────────────────
+
+class StandInServer:
+    """Chat completions stand-in with prefix caching and a prefill-time model."""
+
+    def __init__(self, args):
+        self.args = args
+        self.prefixes = set()  # hashes of cached prefixes (character offsets at CACHE_STEP boundaries)
+        self.lock = threading.Lock()
+        self.ttfts = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                payload = json.dumps(server.complete(body["messages"])).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def complete(self, messages):
+        args = self.args
+        text = "".join(f"<|{m['role']}|>{m['content']}" for m in messages)
+        tokens = len(text) // args.chars_per_token
+        boundaries = range(args.min_cached, tokens + 1, CACHE_STEP)
+        keys = [hashlib.sha256(text[:b * args.chars_per_token].encode("utf-8")).digest() for b in boundaries]
+        with self.lock:
+            cached = 0
+            for boundary, key in zip(boundaries, keys):
+                if key not in self.prefixes:
+                    break
+                cached = boundary
+            self.prefixes.update(keys)
+        ttft_ms = args.base_ms + args.prefill_ms * ((tokens - cached) + cached / 10) / 1000
+        time.sleep(ttft_ms / 1000)
+        with self.lock:
+            self.ttfts.append(ttft_ms)
+        answer = {"is_service_call": True, "issue_type": "אחר", "description": "", "urgency": "medium",
+                  "location": "", "summary": "", "branch_context": "unknown", "customer_number": "",
+                  "customer_name": "", "device_number": "", "contact_name": "", "is_system_down": False}
+        return {
+            "choices": [{"message": {"role": "assistant", "content": json.dumps(answer, ensure_ascii=False)}}],
+            "usage": {"prompt_tokens": tokens, "completion_tokens": 60,
+                      "prompt_tokens_details": {"cached_tokens": cached}},
+        }
+
+
+# ── Setup ────────────────────────────────────────────────────
+
+def seed_prompt(prompts_db, base_prompt, prompt_tokens, chars_per_token, rng):
+    """Active prompt: the built-in one plus operator examples up to ~prompt_tokens."""
+    lines = [base_prompt, "", "דוגמאות מתויגות:"]
+    while len("\n".join(lines)) < prompt_tokens * chars_per_token:
+        message = rng.choice(TEMPLATES).format(device=rng.choice(DEVICES), fault=rng.choice(FAULTS),
+                                               floor=rng.randint(-3, 5), number=rng.randint(1000, 9999))
+        lines.append(f"- \"{message}\" → is_service_call=true, urgency={rng.choice(['medium', 'high'])}")
+    prompts_db.save_prompt({"prompt_id": "bench", "content": "\n".join(lines), "active": True})
+
+
+def install_rag_stub(rag, rng):
+    def hybrid_search(query_text, top_k=3, **kwargs):
+        if rng.random() < 0.2:
+            return []
+        return [{"title": f"{rng.choice(DEVICES)} {rng.choice(FAULTS)}",
+                 "content": f"בדוק מפסק, אפס את הבקר ופתח קריאה אם התקלה חוזרת (מקרה {rng.randint(1, 500)})"}
+                for _ in range(rng.randint(1, top_k))]
+
+    rag.hybrid_search = hybrid_search
+
+
+def concatenated_messages(system_prompt, rag_context, user_content):
+    """Previous assembly: RAG context appended to the system prompt."""
+    system = f"{system_prompt}\n{rag_context}" if rag_context else system_prompt
+    return [{"role": "system", "content": system}, {"role": "user", "content": user_content}]
+
+
+def run(mllm, metrics, server, messages):
+    metrics._sites.clear()
+    server.ttfts.clear()
+    server.prefixes.clear()
+    timings = []
+    for text in messages:
+        t0 = time.perf_counter()
+        mllm.analyze_text(text, use_cache=False)
+        timings.append((time.perf_counter() - t0) * 1000)
+    site = next(s for s in metrics.process_stats() if s["site"] == "MLLM1000.chat")
+    ttfts = sorted(server.ttfts)
+    timings.sort()
+    return {
+        "cached_rate": site["cached_rate"],
+        "prompt_tokens": site["prompt_tokens"] // len(messages),
+        "ttft_mean": sum(ttfts) / len(ttfts),
+        "ttft_p95": ttfts[int(len(ttfts) * 0.95) - 1],
+        "mean_ms": sum(timings) / len(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=120)
+    parser.add_argument("--prompt-tokens", type=int, default=2000, help="size of the seeded active prompt")
+    parser.add_argument("--min-cached", type=int, default=1024, help="shortest prefix the stand-in caches")
+    parser.add_argument("--chars-per-token", type=int, default=3)
+    parser.add_argument("--base-ms", type=float, default=40.0, help="TTFT of a fully cached request")
+    parser.add_argument("--prefill-ms", type=float, default=120.0, help="prefill time per 1000 uncached tokens")
+    args = parser.parse_args()
+
+    server = StandInServer(args)
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    metrics = _load("llm_metrics", PROJECT_ROOT / "agents" / "LLM" / "llm_metrics.py")
+    metrics.FLUSH_INTERVAL_SECONDS = float("inf")
+    prompts_db = _load("bot_prompts_db", PROJECT_ROOT / "database" / "maintenance" / "bot_prompts_db.py")
+    rag = _load("rag_retrieval", PROJECT_ROOT / "agents" / "LLM" / "maintenance" / "rag_retrieval.py")
+    mllm = _load("MLLM1000_servicecall_identifier", PROJECT_ROOT / "agents" / "LLM" / "maintenance"
+                 / "MLLM1000-servicecall-identifier" / "MLLM1000_servicecall_identifier.py")
+
+    rng = random.Random(7)
+    seed_prompt(prompts_db, mllm.SYSTEM_PROMPT, args.prompt_tokens, args.chars_per_token, rng)
+    scans = {"n": 0}
+    table_scan = prompts_db._table.scan
+
+    def counting_scan(**kwargs):
+        scans["n"] += 1
+        return table_scan(**kwargs)
+
+    prompts_db._table.scan = counting_scan
+    messages = [rng.choice(TEMPLATES).format(device=rng.choice(DEVICES), fault=rng.choice(FAULTS),
+                                             floor=rng.randint(-3, 5), number=rng.randint(1000, 9999))
+                for _ in range(args.messages)]
+
+    stable_build = mllm._build_messages
+    results = {}
+    for mode, builder in (("concatenated", concatenated_messages), ("stable-prefix", stable_build)):
+        install_rag_stub(rag, random.Random(11))  # same RAG answers in both modes
+        mllm._build_messages = builder
+        results[mode] = run(mllm, metrics, server, messages)
+
+    print(f"{args.messages} messages, active prompt ~{args.prompt_tokens} tokens, "
+          f"stand-in caches prefixes >= {args.min_cached} tokens\n")
+    print(f"{'mode':<14} {'prompt tok':>10} {'cached':>7} {'TTFT ms':>8} {'TTFT p95':>9} {'call ms':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<14} {r['prompt_tokens']:>10} {r['cached_rate']:>7.0%} {r['ttft_mean']:>8.1f} "
+              f"{r['ttft_p95']:>9.1f} {r['mean_ms']:>8.1f}")
+    stats = mllm.get_response_cache_stats()
+    print(f"\nprompt prefix: {stats['prompt_prefix_builds']} builds, {stats['prompt_prefix_reuses']} reuses; "
+          f"bot_prompts_db scans: {scans['n']} for {2 * args.messages} messages")
+
+
+if __name__ == "__main__":
+    main()
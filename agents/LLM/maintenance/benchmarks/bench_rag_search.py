@@ -0,0 +1,87 @@
+"""
+bench_rag_search - per-query cost of knowledge search, pure Python vs NumPy matrix.
+
+For corpus sizes from 100 to 100k synthetic 1536-dimension embeddings, reports
+the time to answer one query with the old per-item cosine loop and with the
+pre-normalized float32 matrix (one matrix-vector product + argpartition top-k),
+plus the one-off matrix build time paid after each knowledge cache refill.
+Also times a type-prefiltered query.
+
+Pure CPU — no OpenAI or DynamoDB access.
+
+Usage:
+    python agents/LLM/maintenance/benchmarks/bench_rag_search.py [--sizes 100,1000,10000,100000] [--dims 1536]
+"""
+
+import sys
+import time
+import argparse
+import importlib.util
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+RAG_PATH = Path(__file__).resolve().parent.parent / "rag_retrieval.py"
+_spec = importlib.util.spec_from_file_location("rag_retrieval", RAG_PATH)
+rag = importlib.util.module_from_spec(_spec)
+sys.modules["rag_retrieval"] = rag
+_spec.loader.exec_module(rag)
+
+TYPES = ("manual", "feedback", "document")
+PYTHON_MAX_ITEMS = 10000  # the pure-Python loop takes minutes beyond this
+
+
+def make_items(n, dims, rng):
+    vectors = rng.standard_normal((n, dims), dtype=np.float32) * 0.03
+    return [{
+        "id": f"k{i}",
+        "title": f"item {i}",
+        "content": "",
+        "tags": [f"tag{i % 7}"],
+        "type": TYPES[i % len(TYPES)],
+        "embedding": array("f", vectors[i].tobytes()),
+    } for i in range(n)]
+
+
+def per_query_ms(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'items':>8} {'python/query':>14} {'numpy/query':>13} {'filtered':>10} {'build':>10}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        items = make_items(n, args.dims, rng)
+        query = list(items[n // 2]["embedding"])
+
+        t0 = time.perf_counter()
+        index = rag._get_search_index(items)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        repeat = max(5, 20000 // n)
+        numpy_ms = per_query_ms(lambda: rag._search_matrix(index, query, args.top_k, 0.0), repeat)
+        filtered_ms = per_query_ms(
+            lambda: rag._search_matrix(index, query, args.top_k, 0.0, item_type="feedback"), repeat)
+        if n <= PYTHON_MAX_ITEMS:
+            python_ms = per_query_ms(lambda: rag._search_python(items, query, args.top_k, 0.0), 1)
+            python_col = f"{python_ms:11.2f} ms"
+        else:
+            python_col = f"{'-':>14}"
+
+        hits = [r["id"] for r in rag._search_matrix(index, query, args.top_k, 0.0)]
+        assert hits[0] == f"k{n // 2}", hits
+        print(f"{n:>8} {python_col} {numpy_ms:10.3f} ms {filtered_ms:7.3f} ms {build_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
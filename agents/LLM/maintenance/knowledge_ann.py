@@ -0,0 +1,264 @@
+"""
+knowledge_ann - Persisted IVF approximate nearest-neighbour index for knowledge embeddings.
+
+Vectors are stored row-normalized (float32), so cosine similarity is a dot
+product. K-means centroids split the rows into `nlist` inverted lists; a query
+scores the centroids, probes the `nprobe` closest lists and scores only their
+rows. Up to EXACT_MAX_ITEMS rows the index keeps a single list, which is exact
+search.
+
+upsert/remove and search/save take the index's lock, so a search never sees a
+half-applied update. New rows go into spare capacity of the vector matrix
+(doubled when full) instead of copying it on every insert.
+
+Each index carries the knowledge_db index version it reflects and is saved as
+an .npz file (in /tmp on Lambda), so a warm container reloads it instead of
+rescanning the knowledge table. Items can be upserted and removed in place;
+rebuilding re-clusters from scratch.
+"""
+
+import os
+import json
+import math
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("urbangroup.knowledge_ann")
+
+EXACT_MAX_ITEMS = 2000     # below this, one list = exact search
+MIN_NPROBE = 8
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE = 20000      # rows used to train the centroids
+ASSIGN_BLOCK = 8192        # rows per block when assigning to centroids
+
+
+def _item_meta(item):
+    return {
+        "id": item["id"],
+        "title": item.get("title", ""),
+        "content": item.get("content", ""),
+        "tags": item.get("tags") or [],
+        "type": item.get("type", "manual"),
+    }
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _assign(vectors, centroids):
+    """Nearest centroid (by dot product) of each row, in blocks to bound memory."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = vectors[start:start + ASSIGN_BLOCK]
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _train_centroids(vectors, nlist, seed=0):
+    """Spherical k-means on a sample of the rows."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        if empty.any():
+            # Re-seed empty lists from random rows
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over normalized embeddings with per-row item metadata."""
+
+    def __init__(self, centroids, vectors, assign, meta, version):
+        self.centroids = centroids
+        self.vectors = vectors        # len(assign) rows in use, the rest is spare capacity
+        self.assign = assign          # list number per row, -1 = removed
+        self.meta = meta              # item metadata per row, None = removed
+        self.version = version
+        self.rows = {m["id"]: row for row, m in enumerate(meta) if m is not None}
+        self._lists = None
+        self._lock = threading.Lock()
+
+    # ── build / persist ──
+
+    @classmethod
+    def build(cls, items, version, nlist=None):
+        """Build from knowledge_db items ({id, title, content, tags, type, embedding})."""
+        dims = {}
+        for item in items:
+            n = len(item.get("embedding") or ())
+            if n:
+                dims[n] = dims.get(n, 0) + 1
+        dim = max(dims, key=dims.get) if dims else 0
+        usable = [i for i in items if dim and len(i.get("embedding") or ()) == dim]
+
+        vectors = np.empty((len(usable), dim), dtype=np.float32)
+        for row, item in enumerate(usable):
+            vectors[row] = np.asarray(item["embedding"], dtype=np.float32)
+        vectors = _normalize(vectors)
+
+        if nlist is None:
+            nlist = 1 if len(usable) <= EXACT_MAX_ITEMS else int(math.sqrt(len(usable)))
+        if nlist <= 1 or not len(usable):
+            centroids = np.zeros((1, dim), dtype=np.float32)
+            assign = np.zeros(len(usable), dtype=np.int32)
+        else:
+            centroids = _train_centroids(vectors, nlist)
+            assign = _assign(vectors, centroids)
+
+        meta = [_item_meta(item) for item in usable]
+        logger.info(f"Built knowledge ANN index v{version}: {len(usable)} x {dim}, {len(centroids)} lists")
+        return cls(centroids, vectors, assign, meta, version)
+
+    def save(self, path):
+        """Write the index atomically (temp file + rename)."""
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        with self._lock:
+            np.savez(
+                tmp,
+                centroids=self.centroids,
+                vectors=self.vectors[:len(self.assign)],
+                assign=self.assign,
+                meta=np.frombuffer(json.dumps(self.meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+                version=np.array([self.version], dtype=np.int64),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or None if missing or unreadable."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+                return cls(data["centroids"], data["vectors"], data["assign"], meta,
+                           int(data["version"][0]))
+        except Exception as e:
+            logger.warning(f"Failed to load knowledge ANN index from {path}: {e}")
+            return None
+
+    # ── incremental updates ──
+
+    @property
+    def size(self):
+        return len(self.rows)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def upsert(self, item):
+        """Add or replace one item; an item without an embedding is removed.
+
+        Returns:
+            bool: False if the item's embedding doesn't match the index dimension
+            (the item is removed and the index needs a rebuild), True otherwise
+        """
+        embedding = item.get("embedding")
+        if not embedding or len(embedding) != self.dim:
+            self.remove(item["id"])
+            return not embedding
+        vector = _normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        list_no = int(np.argmax(self.centroids @ vector)) if len(self.centroids) > 1 else 0
+        meta = _item_meta(item)
+        with self._lock:
+            row = self.rows.get(item["id"])
+            if row is None:
+                row = len(self.assign)
+                if row == len(self.vectors):
+                    grown = np.empty((max(2 * row, 64), self.dim), dtype=np.float32)
+                    grown[:row] = self.vectors[:row]
+                    self.vectors = grown
+                self.meta.append(meta)
+                self.assign = np.append(self.assign, np.int32(list_no))
+                self.rows[item["id"]] = row
+            else:
+                self.assign[row] = list_no
+                self.meta[row] = meta
+            self.vectors[row] = vector
+            self._lists = None
+        return True
+
+    def remove(self, item_id):
+        with self._lock:
+            row = self.rows.pop(item_id, None)
+            if row is None:
+                return
+            self.assign[row] = -1
+            self.meta[row] = None
+            self._lists = None
+
+    # ── search ──
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assign, kind="stable")
+            counts = np.bincount(self.assign[self.assign >= 0], minlength=len(self.centroids))
+            live = order[np.count_nonzero(self.assign < 0):]
+            self._lists = np.split(live, np.cumsum(counts)[:-1])
+        return self._lists
+
+    def default_nprobe(self):
+        return max(MIN_NPROBE, len(self.centroids) // 10)
+
+    def search(self, query, top_k=3, min_score=0.0, nprobe=None, item_type=None, tags=None):
+        """Approximate top-k by cosine similarity.
+
+        Returns:
+            list of dicts: item metadata + score, best first
+        """
+        if not self.rows or len(query) != self.dim:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return []
+        q = q / norm
+        with self._lock:
+            return self._search(q, top_k, min_score, nprobe, item_type, tags)
+
+    def _search(self, q, top_k, min_score, nprobe, item_type, tags):
+        lists = self._inverted_lists()
+        if len(lists) == 1:
+            candidates = lists[0]
+        else:
+            nprobe = min(nprobe or self.default_nprobe(), len(lists))
+            probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+            candidates = np.concatenate([lists[p] for p in probe])
+
+        if item_type or tags:
+            types = {item_type} if isinstance(item_type, str) else set(item_type or ())
+            wanted = set(tags or ())
+            keep = [row for row in candidates
+                    if (not types or self.meta[row]["type"] in types)
+                    and (not wanted or wanted & set(self.meta[row]["tags"]))]
+            candidates = np.asarray(keep, dtype=np.int64)
+        if not len(candidates):
+            return []
+
+        scores = self.vectors[candidates] @ q
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            score = float(scores[i])
+            if score < min_score:
+                break
+            results.append({**self.meta[candidates[i]], "score": round(score, 4)})
+        return results
@@ -0,0 +1,201 @@
+"""
+knowledge_lexical - In-memory BM25 inverted index over knowledge titles and content.
+
+Tokenization is Hebrew-aware: niqqud and cantillation marks are removed, geresh
+and gershayim inside words are dropped (צה"ל → צהל), and one-letter prefixes
+(ו ה ב כ ל מ ש, up to three of them, e.g. וכשה) are stripped while at least
+three letters remain. Stripping is greedy and applied the same way to items and
+queries, so "בדוד" and "הדוד" both index as "דוד". Common function words and
+service-message filler ("בעיה", "מספר") are dropped.
+
+Besides BM25 ranking, search() reports a confidence in [0, 1]: the share of the
+query's IDF weight that the best item matches. rag_retrieval uses it to decide
+whether the lexical answer is good enough to skip the embedding search.
+
+Like the ANN index, a BM25Index carries the knowledge_db index version it
+reflects and takes items upserted and removed in place (under its lock), so
+writes made through the backend don't need a rebuild. IDF is computed from the
+live document counts at query time.
+"""
+
+import re
+import math
+import logging
+import threading
+
+logger = logging.getLogger("urbangroup.knowledge_lexical")
+
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2  # title tokens count this many times
+
+_MARKS_RE = re.compile("[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")  # niqqud + cantillation
+_INNER_QUOTE_RE = re.compile("(?<=[\u05D0-\u05EA])[\"'\u05F3\u05F4](?=[\u05D0-\u05EA])")  # geresh/gershayim
+_TOKEN_RE = re.compile(r"\w+")
+_HEBREW_RE = re.compile("^[\u05D0-\u05EA]+$")
+
+PREFIX_LETTERS = "והבכלמש"
+MAX_PREFIX = 3
+MIN_STEM = 3
+
+STOPWORDS = {
+    "של", "את", "על", "עם", "זה", "זו", "זאת", "לא", "יש", "אין", "גם", "או", "אם", "כי",
+    "הוא", "היא", "הם", "הן", "אני", "אנחנו", "אתה", "אתם", "מה", "איך", "למה", "כל",
+    "רק", "עוד", "כבר", "אבל", "שלום", "תודה", "בבקשה", "לי", "לך", "לו", "לה", "לנו",
+    "שלי", "שלך", "שלו", "שלה", "שלנו", "יותר", "מאוד", "היום", "עכשיו", "אחרי", "לפני",
+    "כמו", "אז", "פה", "שם", "כן", "אותו", "אותה",
+    # filler of service messages, says nothing about which fault it is
+    "בעיה", "בעיות", "תקלה", "מספר", "אפשר", "צריך", "משהו", "מישהו", "דחוף", "יומיים", "שבוע",
+    "the", "a", "an", "and", "or", "of", "to", "in", "is", "it", "for", "on",
+}
+
+
+def normalize(text):
+    """Strip niqqud and in-word geresh/gershayim, turn maqaf into a space, lowercase."""
+    text = _MARKS_RE.sub("", text or "").replace("\u05BE", " ")  # maqaf
+    return _INNER_QUOTE_RE.sub("", text).lower()
+
+
+def stem(token):
+    """Strip Hebrew one-letter prefixes (greedy, keeping at least MIN_STEM letters)."""
+    if not _HEBREW_RE.match(token):
+        return token
+    stripped = 0
+    while (stripped < MAX_PREFIX and len(token) - 1 >= MIN_STEM
+           and token[0] in PREFIX_LETTERS):
+        token = token[1:]
+        stripped += 1
+    return token
+
+
+def tokenize(text):
+    """Index terms of a text, in order (with repeats)."""
+    terms = []
+    for token in _TOKEN_RE.findall(normalize(text)):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        term = stem(token)
+        if term not in STOPWORDS:
+            terms.append(term)
+    return terms
+
+
+class BM25Index:
+    """Inverted index of knowledge items with BM25 scoring."""
+
+    def __init__(self, items, version=0):
+        self.meta = []      # item metadata per row, None = removed
+        self.lengths = []   # terms per row (0 once removed)
+        self.postings = {}  # term -> {row: term frequency}
+        self.rows = {}      # item id -> row
+        self.version = version
+        self._total_length = 0
+        self._lock = threading.Lock()
+        for item in items:
+            self._add(item)
+        logger.info(f"Built knowledge BM25 index v{version}: {len(self.rows)} items, {len(self.postings)} terms")
+
+    def _add(self, item):
+        terms = tokenize(item.get("title", "")) * TITLE_WEIGHT + tokenize(item.get("content", ""))
+        row = len(self.meta)
+        self.meta.append({
+            "id": item["id"],
+            "title": item.get("title", ""),
+            "content": item.get("content", ""),
+            "tags": item.get("tags") or [],
+            "type": item.get("type", "manual"),
+        })
+        self.lengths.append(len(terms))
+        self._total_length += len(terms)
+        self.rows[item["id"]] = row
+        for term in terms:
+            row_tf = self.postings.setdefault(term, {})
+            row_tf[row] = row_tf.get(row, 0) + 1
+
+    def _drop(self, item_id):
+        row = self.rows.pop(item_id, None)
+        if row is None:
+            return
+        meta = self.meta[row]
+        for term in set(tokenize(meta["title"]) + tokenize(meta["content"])):
+            row_tf = self.postings.get(term)
+            if row_tf is not None:
+                row_tf.pop(row, None)
+                if not row_tf:
+                    del self.postings[term]
+        self._total_length -= self.lengths[row]
+        self.lengths[row] = 0
+        self.meta[row] = None
+
+    # ── incremental updates ──
+
+    @property
+    def size(self):
+        return len(self.rows)
+
+    def upsert(self, item):
+        """Add or replace one item (items without an embedding are indexed too)."""
+        with self._lock:
+            self._drop(item["id"])
+            self._add(item)
+
+    def remove(self, item_id):
+        with self._lock:
+            self._drop(item_id)
+
+    # ── search ──
+
+    def _idf(self, df):
+        n = len(self.rows)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _allowed(self, row, types, wanted_tags):
+        meta = self.meta[row]
+        return ((not types or meta["type"] in types)
+                and (not wanted_tags or wanted_tags & set(meta["tags"])))
+
+    def search(self, query, top_k=3, min_score=0.0, item_type=None, tags=None):
+        """BM25 top-k for a query.
+
+        Returns:
+            (results, confidence) — results are item metadata + score (the share of
+            the query's IDF weight the item matches, 0-1), best BM25 first;
+            confidence is the best item's score (0.0 when nothing matched)
+        """
+        with self._lock:
+            return self._search(set(tokenize(query)), top_k, min_score, item_type, tags)
+
+    def _search(self, terms, top_k, min_score, item_type, tags):
+        # Numbers the knowledge base never mentions (device/phone numbers) say nothing about relevance
+        terms = {t for t in terms if t in self.postings or not t.isdigit()}
+        if not terms or not self.rows:
+            return [], 0.0
+        weights = {t: self._idf(len(self.postings.get(t, ()))) for t in terms}
+        avg_length = self._total_length / len(self.rows)
+        total_weight = sum(weights.values())
+        types = {item_type} if isinstance(item_type, str) else set(item_type or ())
+        wanted_tags = set(tags or ())
+
+        scores = {}
+        matched = {}
+        for term in terms:
+            rows = self.postings.get(term)
+            if not rows:
+                continue
+            idf = weights[term]
+            for row, tf in rows.items():
+                if (types or wanted_tags) and not self._allowed(row, types, wanted_tags):
+                    continue
+                norm = K1 * (1 - B + B * self.lengths[row] / avg_length)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+                matched[row] = matched.get(row, 0.0) + idf
+        if not scores:
+            return [], 0.0
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        results = []
+        for row in ranked[:top_k]:
+            coverage = matched[row] / total_weight
+            if coverage >= min_score:
+                results.append({**self.meta[row], "score": round(coverage, 4)})
+        return results, round(matched[ranked[0]] / total_weight, 4)
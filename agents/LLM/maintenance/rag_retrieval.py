@@ -3,16 +3,39 @@ RAG Retrieval Module - Embedding generation and similarity search.
 
 Uses OpenAI text-embedding-3-small for vectorizing text,
 and cosine similarity against DynamoDB-stored knowledge items.
+
+Search goes through the persisted IVF index in knowledge_ann.py (exact below
+2000 items), kept in step with knowledge_db's index version: writes made through
+the backend are applied incrementally (on_knowledge_changed), anything else
+triggers a background rebuild. Without the index, the knowledge cache is held as
+a row-normalized float32 matrix (one matrix-vector product + argpartition top-k),
+and without NumPy the search falls back to pure Python.
+
+Embeddings are cached in two tiers keyed by sha256(model + normalized text): an
+in-process LRU and the embedding-cache DynamoDB table (embedding_cache_db.py),
+so a repeated text never goes back to the embedding API.
+
+hybrid_search answers from a Hebrew-aware BM25 index (knowledge_lexical.py) over
+all active items, built and kept current beside the ANN index, and only embeds
+the query when the lexical match is weak, fusing both rankings in that case.
 """
 
 import os
 import sys
 import math
+import time
+import hashlib
 import logging
+import threading
+import unicodedata
 import importlib.util
+from collections import OrderedDict
 from pathlib import Path
 
-import requests
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback in search_knowledge
+    np = None
 
 if os.environ.get("IS_LAMBDA") != "true":
     from dotenv import load_dotenv
@@ -24,8 +47,21 @@ logger = logging.getLogger("urbangroup.rag_retrieval")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 EMBEDDING_MODEL = "text-embedding-3-small"  # 1536 dimensions, cheap & fast
 
-# Lazy-loaded knowledge_db module
+EMBEDDING_MAX_CHARS = 8000
+EMBEDDING_LRU_SIZE = 512  # in-process tier; the DynamoDB tier is shared by all containers
+EMBEDDING_BATCH_SIZE = 64  # texts per multi-input API request (max ~8000 chars each)
+
+LEXICAL_CONFIDENCE = 0.75  # share of the query's IDF weight the best lexical match must cover
+RRF_K = 60  # reciprocal rank fusion constant
+
+ANN_INDEX_PATH = os.environ.get("KNOWLEDGE_ANN_PATH", "/tmp/knowledge_ann.npz")
+ANN_VERSION_CHECK_SECONDS = 30  # how often to compare the index to knowledge_db's version
+
+# Lazy-loaded knowledge_db, knowledge_ann, knowledge_lexical and embedding_cache_db modules
 _knowledge_db = None
+_knowledge_ann = None
+_knowledge_lexical = None
+_embedding_cache_db = None
 
 
 def _get_knowledge_db():
@@ -47,41 +83,254 @@ def _get_knowledge_db():
     return _knowledge_db
 
 
+def _get_knowledge_ann():
+    """Lazy-load knowledge_ann module (None without NumPy)."""
+    global _knowledge_ann
+    if _knowledge_ann is None and np is not None:
+        try:
+            if "knowledge_ann" in sys.modules:
+                _knowledge_ann = sys.modules["knowledge_ann"]
+            else:
+                ann_path = Path(__file__).resolve().parent / "knowledge_ann.py"
+                spec = importlib.util.spec_from_file_location("knowledge_ann", ann_path)
+                _knowledge_ann = importlib.util.module_from_spec(spec)
+                sys.modules["knowledge_ann"] = _knowledge_ann
+                spec.loader.exec_module(_knowledge_ann)
+        except Exception as e:
+            logger.warning(f"Failed to load knowledge_ann: {e}")
+            return None
+    return _knowledge_ann
+
+
+def _get_knowledge_lexical():
+    """Lazy-load knowledge_lexical module."""
+    global _knowledge_lexical
+    if _knowledge_lexical is None:
+        try:
+            if "knowledge_lexical" in sys.modules:
+                _knowledge_lexical = sys.modules["knowledge_lexical"]
+            else:
+                lexical_path = Path(__file__).resolve().parent / "knowledge_lexical.py"
+                spec = importlib.util.spec_from_file_location("knowledge_lexical", lexical_path)
+                _knowledge_lexical = importlib.util.module_from_spec(spec)
+                sys.modules["knowledge_lexical"] = _knowledge_lexical
+                spec.loader.exec_module(_knowledge_lexical)
+        except Exception as e:
+            logger.warning(f"Failed to load knowledge_lexical: {e}")
+            return None
+    return _knowledge_lexical
+
+
+def _get_embedding_cache_db():
+    """Lazy-load embedding_cache_db module."""
+    global _embedding_cache_db
+    if _embedding_cache_db is None:
+        try:
+            if "embedding_cache_db" in sys.modules:
+                _embedding_cache_db = sys.modules["embedding_cache_db"]
+            else:
+                db_path = Path(__file__).resolve().parent.parent.parent.parent / "database" / "maintenance" / "embedding_cache_db.py"
+                spec = importlib.util.spec_from_file_location("embedding_cache_db", db_path)
+                _embedding_cache_db = importlib.util.module_from_spec(spec)
+                sys.modules["embedding_cache_db"] = _embedding_cache_db
+                spec.loader.exec_module(_embedding_cache_db)
+        except Exception as e:
+            logger.warning(f"Failed to load embedding_cache_db: {e}")
+            return None
+    return _embedding_cache_db
+
+
+# LLM calls go through llm_call.post: recorded by llm_metrics, plain requests.post without it
+if "llm_call" not in sys.modules:
+    _llm_call_path = Path(__file__).resolve().parent.parent / "llm_call.py"
+    _spec = importlib.util.spec_from_file_location("llm_call", _llm_call_path)
+    sys.modules["llm_call"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["llm_call"])
+llm_call = sys.modules["llm_call"]
+
+
+# ── Embedding cache ─────────────────────────────────────────
+
+_embedding_lru = OrderedDict()  # cache_key -> tuple of floats, most recent last
+_embedding_lock = threading.Lock()
+_embedding_stats = {"memory_hits": 0, "store_hits": 0, "misses": 0,
+                    "api_calls": 0, "api_failures": 0, "store_errors": 0}
+
+
+def _normalize_embedding_text(text):
+    """Canonical form of the text sent to the embedding API (and hashed for the cache)."""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())[:EMBEDDING_MAX_CHARS]
+
+
+def _embedding_cache_key(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _lru_get(key):
+    with _embedding_lock:
+        vector = _embedding_lru.get(key)
+        if vector is not None:
+            _embedding_lru.move_to_end(key)
+        return vector
+
+
+def _lru_put(key, vector):
+    with _embedding_lock:
+        _embedding_lru[key] = vector
+        _embedding_lru.move_to_end(key)
+        while len(_embedding_lru) > EMBEDDING_LRU_SIZE:
+            _embedding_lru.popitem(last=False)
+
+
+def _count(stat, n=1):
+    with _embedding_lock:
+        _embedding_stats[stat] += n
+
+
+def get_embedding_cache_stats(reset=False):
+    """Hit counts and hit rate of the embedding cache since process start (or the last reset)."""
+    with _embedding_lock:
+        stats = dict(_embedding_stats)
+        stats["memory_size"] = len(_embedding_lru)
+        if reset:
+            for name in _embedding_stats:
+                _embedding_stats[name] = 0
+    lookups = stats["memory_hits"] + stats["store_hits"] + stats["misses"]
+    stats["lookups"] = lookups
+    stats["hit_rate"] = round((stats["memory_hits"] + stats["store_hits"]) / lookups, 4) if lookups else None
+    return stats
+
+
+def _request_embeddings(texts):
+    """Call the OpenAI embeddings API for a list of texts (one request).
+
+    Returns:
+        list of vectors, in input order
+    """
+    resp = llm_call.post(
+        "rag.embedding", EMBEDDING_MODEL,
+        "https://api.openai.com/v1/embeddings",
+        headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": EMBEDDING_MODEL,
+            "input": texts,
+        },
+        timeout=15 + len(texts) // 10,
+    )
+    resp.raise_for_status()
+    data = sorted(resp.json()["data"], key=lambda d: d["index"])
+    return [d["embedding"] for d in data]
+
+
+def _cache_lookup(keys, store):
+    """Vectors for cache keys from the LRU, then one batched read of the DynamoDB tier (counted).
+
+    Returns:
+        dict cache_key -> tuple of floats, for the keys found
+    """
+    found = {}
+    pending = []
+    for key in keys:
+        vector = _lru_get(key)
+        if vector is not None:
+            _count("memory_hits")
+            found[key] = vector
+        else:
+            pending.append(key)
+    if not pending or store is None:
+        return found
+    try:
+        cached = store.get_vectors(pending)
+    except Exception as e:
+        logger.warning(f"Embedding cache read failed: {e}")
+        _count("store_errors")
+        return found
+    for key in pending:
+        if key in cached:
+            _count("store_hits")
+            vector = tuple(cached[key])
+            _lru_put(key, vector)
+            found[key] = vector
+    return found
+
+
+def _cache_store(key, embedding, store):
+    _lru_put(key, tuple(embedding))
+    if store is None:
+        return
+    try:
+        store.save_vector(key, EMBEDDING_MODEL, embedding)
+    except Exception as e:
+        logger.warning(f"Embedding cache write failed: {e}")
+        _count("store_errors")
+
+
 def generate_embedding(text):
     """Generate an embedding vector for text using OpenAI.
 
+    Looks in the in-process LRU, then the DynamoDB embedding cache, and only
+    calls the API on a miss; new vectors are written to both tiers.
+
     Args:
-        text: The text to embed (will be truncated to ~8000 chars)
+        text: The text to embed (whitespace-normalized, truncated to ~8000 chars)
 
     Returns:
         list of floats (1536 dimensions), or None on failure
     """
+    return generate_embeddings([text])[0]
+
+
+def generate_embeddings(texts):
+    """Embed many texts, sending all cache misses in one multi-input API request.
+
+    Args:
+        texts: list of texts (normalized and truncated as in generate_embedding)
+
+    Returns:
+        list aligned with texts: list of floats, or None for empty texts and on failure
+    """
+    texts = [_normalize_embedding_text(t) for t in texts]
+    keys = [_embedding_cache_key(EMBEDDING_MODEL, t) for t in texts]
+    results = [None] * len(texts)
+    store = _get_embedding_cache_db()
+
+    cached = _cache_lookup([key for text, key in zip(texts, keys) if text], store)
+    missing = {}  # text -> positions, so duplicates cost one input
+    for pos, (text, key) in enumerate(zip(texts, keys)):
+        if not text:
+            continue
+        if key in cached:
+            results[pos] = list(cached[key])
+        else:
+            missing.setdefault(text, []).append(pos)
+    if not missing:
+        return results
+
     if not OPENAI_API_KEY:
         logger.error("OPENAI_API_KEY not set, cannot generate embedding")
-        return None
-
-    # Truncate to avoid token limits
-    text = text[:8000]
+        return results
 
-    try:
-        resp = requests.post(
-            "https://api.openai.com/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": EMBEDDING_MODEL,
-                "input": text,
-            },
-            timeout=15,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        return data["data"][0]["embedding"]
-    except Exception as e:
-        logger.error(f"Failed to generate embedding: {e}")
-        return None
+    pending = list(missing)
+    _count("misses", len(pending))
+    for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+        chunk = pending[start:start + EMBEDDING_BATCH_SIZE]
+        _count("api_calls")
+        try:
+            embeddings = _request_embeddings(chunk)
+        except Exception as e:
+            logger.error(f"Failed to generate embedding ({len(chunk)} texts): {e}")
+            _count("api_failures")
+            continue
+        for text, embedding in zip(chunk, embeddings):
+            positions = missing[text]
+            _cache_store(keys[positions[0]], embedding, store)
+            for pos in positions:
+                results[pos] = embedding
+    return results
 
 
 def _cosine_similarity(a, b):
@@ -94,38 +343,105 @@ def _cosine_similarity(a, b):
     return dot / (norm_a * norm_b)
 
 
-def search_knowledge(query_text, top_k=3, min_score=0.3):
-    """Search the knowledge base for items relevant to the query.
+# Search matrix built from the knowledge_db embeddings cache.
+# Rebuilt whenever knowledge_db hands back a different list (its cache refilled).
+_search_index = {"source": None, "matrix": None, "meta": [], "types": None, "tags": []}
 
-    Args:
-        query_text: The text to search for (customer message)
-        top_k: Number of top matches to return
-        min_score: Minimum similarity score (0-1) to include
 
-    Returns:
-        list of dicts: [{id, title, content, score, tags}, ...]
-        Empty list if no matches or on failure.
-    """
-    # Step 1: Embed the query
-    query_embedding = generate_embedding(query_text)
-    if not query_embedding:
-        return []
+def _get_search_index(items):
+    """Row-normalized float32 matrix + metadata for the current knowledge items."""
+    if _search_index["source"] is items:
+        return _search_index
 
-    # Step 2: Load all knowledge items with embeddings
-    db = _get_knowledge_db()
-    if not db:
+    dims = {}
+    for item in items:
+        n = len(item.get("embedding") or ())
+        if n:
+            dims[n] = dims.get(n, 0) + 1
+    dim = max(dims, key=dims.get) if dims else 0
+    usable = [i for i in items if dim and len(i.get("embedding") or ()) == dim]
+
+    matrix = np.empty((len(usable), dim), dtype=np.float32)
+    for row, item in enumerate(usable):
+        # array('f') embeddings are copied through the buffer protocol
+        matrix[row] = np.asarray(item["embedding"], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    _search_index.update({
+        "source": items,
+        "matrix": matrix,
+        "meta": [{
+            "id": i["id"],
+            "title": i["title"],
+            "content": i["content"],
+            "tags": i.get("tags", []),
+            "type": i.get("type", "manual"),
+        } for i in usable],
+        "types": np.array([i.get("type", "manual") for i in usable], dtype=object),
+        "tags": [set(i.get("tags") or ()) for i in usable],
+    })
+    logger.info(f"RAG: Search matrix built ({len(usable)} x {dim})")
+    return _search_index
+
+
+def _prefilter_mask(index, item_type=None, tags=None):
+    """Boolean row mask for the type / tags filters (None = no filtering)."""
+    if not item_type and not tags:
+        return None
+    mask = np.ones(len(index["meta"]), dtype=bool)
+    if item_type:
+        types = [item_type] if isinstance(item_type, str) else list(item_type)
+        mask &= np.isin(index["types"], types)
+    if tags:
+        wanted = set(tags)
+        mask &= np.fromiter((bool(t & wanted) for t in index["tags"]), dtype=bool, count=len(index["tags"]))
+    return mask
+
+
+def _search_matrix(index, query_embedding, top_k, min_score, item_type=None, tags=None):
+    """Top-k rows of the search matrix by cosine similarity to the query."""
+    matrix = index["matrix"]
+    if matrix is None or not len(matrix) or matrix.shape[1] != len(query_embedding):
+        return []
+    q = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(q)
+    if norm == 0:
         return []
+    scores = matrix @ (q / norm)
 
-    items = db.get_all_active_with_embeddings()
-    if not items:
+    mask = _prefilter_mask(index, item_type, tags)
+    if mask is not None:
+        scores = np.where(mask, scores, -np.inf)
+
+    k = min(top_k, len(scores))
+    if k <= 0:
         return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    results = []
+    for row in top:
+        score = float(scores[row])
+        if score < min_score:
+            break
+        results.append({**index["meta"][row], "score": round(score, 4)})
+    return results
+
 
-    # Step 3: Compute similarity scores
+def _search_python(items, query_embedding, top_k, min_score, item_type=None, tags=None):
+    """Pure-Python search, used when NumPy is not installed."""
+    types = {item_type} if isinstance(item_type, str) else set(item_type or ())
+    wanted_tags = set(tags or ())
     scored = []
     for item in items:
         embedding = item.get("embedding")
         if not embedding or len(embedding) != len(query_embedding):
             continue
+        if types and item.get("type", "manual") not in types:
+            continue
+        if wanted_tags and not wanted_tags & set(item.get("tags") or ()):
+            continue
         score = _cosine_similarity(query_embedding, embedding)
         if score >= min_score:
             scored.append({
@@ -136,21 +452,287 @@ def search_knowledge(query_text, top_k=3, min_score=0.3):
                 "tags": item.get("tags", []),
                 "type": item.get("type", "manual"),
             })
-
-    # Step 4: Sort by score and return top_k
     scored.sort(key=lambda x: x["score"], reverse=True)
-    results = scored[:top_k]
+    return scored[:top_k]
+
+
+# ── Search indexes (ANN + BM25) ──────────────────────────────
+#
+# Both indexes are built from one scan of all active knowledge items (the ANN
+# index keeps those with an embedding, BM25 takes them all), tagged with the
+# knowledge_db index version read before the scan, and then kept current by
+# on_knowledge_changed. Builds only ever run in a background thread.
+
+_ann_state = {"index": None, "lexical": None, "latest": None, "checked_at": 0, "rebuilding": False}
+_ann_lock = threading.Lock()
+
+
+def _rebuild_indexes(db):
+    """Build the ANN and BM25 indexes from knowledge_db and make them current (ANN also saved)."""
+    ann = _get_knowledge_ann()
+    lexical = _get_knowledge_lexical()
+    # Read the version before the scan: a write during the scan bumps it and triggers another rebuild
+    version = db.get_index_version()
+    items = db.get_all_active()
+    if lexical is not None:
+        lexical_index = lexical.BM25Index(items, version)
+        with _ann_lock:
+            _ann_state["lexical"] = lexical_index
+    current = _ann_state["index"]
+    if ann is not None and (current is None or current.version != version):
+        index = ann.IVFIndex.build(items, version)
+        try:
+            index.save(ANN_INDEX_PATH)
+        except OSError as e:
+            logger.warning(f"RAG: Could not save ANN index to {ANN_INDEX_PATH}: {e}")
+        with _ann_lock:
+            _ann_state["index"] = index
+
+
+def _start_index_rebuild(db):
+    """Rebuild the search indexes in a background thread (at most one at a time)."""
+    with _ann_lock:
+        if _ann_state["rebuilding"]:
+            return
+        _ann_state["rebuilding"] = True
+
+    def run():
+        try:
+            _rebuild_indexes(db)
+        except Exception as e:
+            logger.error(f"RAG: Search index rebuild failed: {e}")
+        finally:
+            with _ann_lock:
+                _ann_state["rebuilding"] = False
+
+    threading.Thread(target=run, name="knowledge-index-rebuild", daemon=True).start()
+
+
+def _latest_index_version(db):
+    """knowledge_db's index version, re-read at most every ANN_VERSION_CHECK_SECONDS."""
+    now = time.time()
+    if _ann_state["latest"] is None or now - _ann_state["checked_at"] >= ANN_VERSION_CHECK_SECONDS:
+        _ann_state["latest"] = db.get_index_version()
+        _ann_state["checked_at"] = now
+    return _ann_state["latest"]
+
+
+def _current_ann_index(db):
+    """The ANN index to search with, or None if it can't be used yet.
+
+    A stale index is still returned while a background rebuild catches it up.
+    With no index in memory or in /tmp (cold container) the build runs in the
+    background too, and the caller searches the embeddings matrix meanwhile.
+    """
+    ann = _get_knowledge_ann()
+    if ann is None:
+        return None
+    latest = _latest_index_version(db)
+
+    index = _ann_state["index"]
+    if index is None:
+        index = ann.IVFIndex.load(ANN_INDEX_PATH)
+        if index is None:
+            _start_index_rebuild(db)
+            return None
+        with _ann_lock:
+            _ann_state["index"] = index
+    if index.version != latest:
+        _start_index_rebuild(db)
+    return index
+
+
+def _current_lexical_index(db):
+    """The BM25 index to search with, or None until the first background build finishes.
+
+    A stale index is still returned while a background rebuild catches it up.
+    """
+    if _get_knowledge_lexical() is None:
+        return None
+    latest = _latest_index_version(db)
+    index = _ann_state["lexical"]
+    if index is None or index.version != latest:
+        _start_index_rebuild(db)
+    return index
+
+
+def on_knowledge_changed(items):
+    """Apply knowledge items just written through knowledge_db (one write call) to the search indexes.
+
+    Args:
+        items: the item dicts the caller passed to save_item / save_items (ids
+            filled in), or {"id": ..., "active": False} for a deleted item
+
+    Each write call bumps the index version once. An in-memory index at the
+    previous version is updated in place and moves to the new one; otherwise
+    another writer got in between and the next search rebuilds it. The ANN
+    index also stays behind (and is rebuilt) when an embedding doesn't fit it,
+    e.g. the first embedded item of an empty index or a new embedding model.
+    The ANN index file is saved before returning (Lambda may freeze the
+    container right after the response).
+    """
+    index, lexical_index = _ann_state["index"], _ann_state["lexical"]
+    db = _get_knowledge_db()
+    if (index is None and lexical_index is None) or not db:
+        return
+    try:
+        version = db.get_index_version()
+        ann_applied = True
+        for item in items:
+            active = item.get("active", True)
+            if index is not None:
+                if active and item.get("embedding"):
+                    ann_applied = index.upsert(item) and ann_applied
+                else:
+                    index.remove(item["id"])
+            if lexical_index is not None:
+                if active:
+                    lexical_index.upsert(item)
+                else:
+                    lexical_index.remove(item["id"])
+        with _ann_lock:
+            for current in (index if ann_applied else None, lexical_index):
+                if current is not None and version == current.version + 1:
+                    current.version = version
+            _ann_state["latest"] = version
+            _ann_state["checked_at"] = time.time()
+        if index is not None:
+            index.save(ANN_INDEX_PATH)
+    except Exception as e:
+        logger.warning(f"RAG: Search index update failed for {[i.get('id') for i in items]}: {e}")
+
+
+def search_knowledge(query_text, top_k=3, min_score=0.3, item_type=None, tags=None):
+    """Search the knowledge base for items relevant to the query.
+
+    Args:
+        query_text: The text to search for (customer message)
+        top_k: Number of top matches to return
+        min_score: Minimum similarity score (0-1) to include
+        item_type: Optional type (or list of types) to restrict the search to
+        tags: Optional tags — only items carrying at least one of them are searched
+
+    Returns:
+        list of dicts: [{id, title, content, score, tags, type}, ...]
+        Empty list if no matches or on failure.
+    """
+    # Step 1: Embed the query
+    query_embedding = generate_embedding(query_text)
+    if not query_embedding:
+        return []
+
+    db = _get_knowledge_db()
+    if not db:
+        return []
+
+    # Step 2: Search the ANN index (no table scan while it is current). An empty index,
+    # or one built for another embedding size, falls back to the exact search below.
+    try:
+        index = _current_ann_index(db)
+    except Exception as e:
+        logger.warning(f"RAG: ANN index unavailable, using exact search: {e}")
+        index = None
+    if index is not None and index.size and len(query_embedding) == index.dim:
+        results = index.search(query_embedding, top_k, min_score, item_type=item_type, tags=tags)
+        if results:
+            logger.info(f"RAG: Found {len(results)} matches (top score: {results[0]['score']})")
+        return results
+
+    # Fallback: load all knowledge items with embeddings
+    items = db.get_all_active_with_embeddings()
+    if not items:
+        return []
+
+    # Step 3: Score and take the top_k
+    if np is not None:
+        results = _search_matrix(_get_search_index(items), query_embedding, top_k, min_score,
+                                 item_type, tags)
+    else:
+        results = _search_python(items, query_embedding, top_k, min_score, item_type, tags)
 
     if results:
         logger.info(f"RAG: Found {len(results)} matches (top score: {results[0]['score']})")
     return results
 
 
+# ── Hybrid (lexical + vector) search ─────────────────────────
+
+_search_stats = {"queries": 0, "lexical_answers": 0, "vector_searches": 0,
+                 "lexical_ms": 0.0, "hybrid_ms": 0.0}
+
+
+def _fuse(rankings, top_k):
+    """Reciprocal rank fusion; each result keeps the score of the first ranking it appears in."""
+    fused = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking):
+            entry = fused.setdefault(match["id"], {"match": match, "rrf": 0.0})
+            entry["rrf"] += 1.0 / (RRF_K + rank + 1)
+    ordered = sorted(fused.values(), key=lambda e: e["rrf"], reverse=True)
+    return [e["match"] for e in ordered[:top_k]]
+
+
+def get_search_stats(reset=False):
+    """hybrid_search counters since process start: embedding calls avoided and mean latency per path."""
+    stats = dict(_search_stats)
+    if reset:
+        for name in _search_stats:
+            _search_stats[name] = 0.0 if name.endswith("_ms") else 0
+    lexical, vector = stats["lexical_answers"], stats["vector_searches"]
+    return {
+        "queries": stats["queries"],
+        "lexical_answers": lexical,
+        "vector_searches": vector,
+        "embedding_calls_avoided": lexical,
+        "avoided_rate": round(lexical / stats["queries"], 4) if stats["queries"] else None,
+        "avg_lexical_ms": round(stats["lexical_ms"] / lexical, 2) if lexical else None,
+        "avg_hybrid_ms": round(stats["hybrid_ms"] / vector, 2) if vector else None,
+    }
+
+
+def hybrid_search(query_text, top_k=3, min_score=0.3, item_type=None, tags=None):
+    """Search the knowledge base lexically first, adding the embedding search only when needed.
+
+    If the best BM25 match covers at least LEXICAL_CONFIDENCE of the query's
+    IDF weight, its results are returned without embedding the query.
+    Otherwise search_knowledge runs too and both rankings are fused.
+
+    Args: as search_knowledge
+
+    Returns:
+        list of dicts: [{id, title, content, score, tags, type}, ...]
+    """
+    t0 = time.perf_counter()
+    _search_stats["queries"] += 1
+    db = _get_knowledge_db()
+    lexical_results, confidence = [], 0.0
+    if db:
+        try:
+            index = _current_lexical_index(db)
+            if index is not None:
+                lexical_results, confidence = index.search(query_text, top_k, min_score, item_type, tags)
+        except Exception as e:
+            logger.warning(f"RAG: lexical search failed, using vector search: {e}")
+
+    if lexical_results and confidence >= LEXICAL_CONFIDENCE:
+        _search_stats["lexical_answers"] += 1
+        _search_stats["lexical_ms"] += (time.perf_counter() - t0) * 1000
+        logger.info(f"RAG: Lexical match (confidence {confidence}), skipped embedding")
+        return lexical_results
+
+    vector_results = search_knowledge(query_text, top_k, min_score, item_type, tags)
+    _search_stats["vector_searches"] += 1
+    _search_stats["hybrid_ms"] += (time.perf_counter() - t0) * 1000
+    if not lexical_results:
+        return vector_results
+    return _fuse([vector_results, lexical_results], top_k)
+
+
 def format_rag_context(matches):
-    """Format RAG matches as text for injection into the system prompt.
+    """Format RAG matches as text for the RAG context message sent after the system prompt.
 
     Args:
-        matches: list from search_knowledge()
+        matches: list from search_knowledge() or hybrid_search()
 
     Returns:
         str: Formatted context text, or empty string if no matches
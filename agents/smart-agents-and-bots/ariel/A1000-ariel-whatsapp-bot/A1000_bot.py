@@ -6,9 +6,15 @@ Accepts commands from the owner (Boaz) and runs reports as PDF.
 Supported commands:
 - דוח חייבים  → AR1000 debt customer report (PDF)
 - תעודות שלא חויבו  → AR10010 uncharged delivery notes (PDF)
+
+Report PDFs are kept as snapshots for a few minutes (report data, PDF bytes and the
+uploaded WhatsApp media id), so asking again re-sends the same document with one
+API call. Add "רענן" to the command to force a fresh report.
 """
 
 import os
+import json
+import time
 import uuid
 import logging
 from datetime import datetime
@@ -24,6 +30,11 @@ _ariel_messages_table = _dynamodb.Table(ARIEL_MESSAGES_TABLE_NAME)
 
 OWNER_PHONE = "972542777757"
 
+# Report snapshots: {(report_type, filters_key): {"report", "pdf_bytes", "media_id", ...}}
+_report_cache = {}
+REPORT_CACHE_TTL_SECONDS = 15 * 60  # 15 minutes
+REFRESH_KEYWORDS = ("רענן", "עדכני", "refresh")
+
 
 def save_message(phone, name, text, msg_type="text", message_id=""):
     """Save an incoming message to the Ariel messages table."""
@@ -76,40 +87,98 @@ def _create_task(description):
     logger.info(f"Task created from WhatsApp: {description}")
 
 
-def _run_debt_report_pdf(phone, filters=None):
-    """Run AR1000, generate PDF, send via WhatsApp."""
-    _set_real_env()
-    import ar1000_report
-    import pdf_generator
+def _filters_key(filters):
+    """Normalize report filters into a stable cache key."""
+    norm = {k: " ".join(str(v).lower().split()) for k, v in (filters or {}).items() if v is not None}
+    return json.dumps(norm, ensure_ascii=False, sort_keys=True)
+
+
+def _send_report_snapshot(phone, report_type, filters, build, force_refresh=False):
+    """Send a report PDF, reusing a fresh snapshot when one exists.
+
+    Args:
+        report_type: Cache namespace (e.g. "debt_report")
+        filters: Report filters (part of the cache key)
+        build: Callable returning (report, pdf_bytes, filename, caption)
+        force_refresh: Ignore any cached snapshot
+
+    Returns:
+        dict: the snapshot that was sent (with "cached": True if it was reused)
+    """
     import whatsapp_bot_ariel
 
-    report = ar1000_report.generate_report(filters=filters)
-    pdf_bytes = pdf_generator.generate_debt_report_pdf(report)
+    key = (report_type, _filters_key(filters))
+    snap = _report_cache.get(key)
+    if snap and not force_refresh and (time.time() - snap["created_at"]) < REPORT_CACHE_TTL_SECONDS:
+        try:
+            whatsapp_bot_ariel.send_document_by_id(phone, snap["media_id"], snap["filename"], snap["caption"])
+            logger.info(f"{report_type} snapshot re-sent to {phone}: {snap['filename']}")
+            return {**snap, "cached": True}
+        except Exception as e:
+            # Media id may have expired on Meta's side — upload the cached bytes again
+            logger.warning(f"{report_type} cached media send failed, re-uploading: {e}")
+            result = whatsapp_bot_ariel.send_document(phone, snap["pdf_bytes"], snap["filename"], snap["caption"])
+            snap["media_id"] = result.get("media_id")
+            return {**snap, "cached": True}
+
+    report, pdf_bytes, filename, caption = build()
+    result = whatsapp_bot_ariel.send_document(phone, pdf_bytes, filename, caption)
+    snap = {
+        "report": report,
+        "pdf_bytes": pdf_bytes,
+        "media_id": result.get("media_id"),
+        "filename": filename,
+        "caption": caption,
+        "created_at": time.time(),
+    }
+    _report_cache[key] = snap
+    return {**snap, "cached": False}
+
 
-    now = datetime.utcnow().strftime("%Y%m%d_%H%M")
-    filename = f"debt_report_{now}.pdf"
-    caption = f"דוח חייבים — {report['filtered_customer_count']} לקוחות, סה״כ {report['total_balance']:,.0f} ₪"
+def _run_debt_report_pdf(phone, filters=None, force_refresh=False):
+    """Run AR1000, generate PDF, send via WhatsApp."""
+    def build():
+        _set_real_env()
+        import ar1000_report
+        import pdf_generator
 
-    whatsapp_bot_ariel.send_document(phone, pdf_bytes, filename, caption)
-    logger.info(f"Debt report PDF sent to {phone}: {filename}")
+        report = ar1000_report.generate_report(filters=filters)
+        pdf_bytes = pdf_generator.generate_debt_report_pdf(report)
+        now = datetime.utcnow().strftime("%Y%m%d_%H%M")
+        filename = f"debt_report_{now}.pdf"
+        caption = f"דוח חייבים — {report['filtered_customer_count']} לקוחות, סה״כ {report['total_balance']:,.0f} ₪"
+        return report, pdf_bytes, filename, caption
 
+    snap = _send_report_snapshot(phone, "debt_report", filters, build, force_refresh)
+    logger.info(f"Debt report PDF sent to {phone}: {snap['filename']} (cached={snap['cached']})")
+    return snap
 
-def _run_uncharged_report_pdf(phone, filters=None):
+
+def _run_uncharged_report_pdf(phone, filters=None, force_refresh=False):
     """Run AR10010, generate PDF, send via WhatsApp."""
-    _set_real_env()
-    import ar10010_report
-    import pdf_generator
-    import whatsapp_bot_ariel
+    def build():
+        _set_real_env()
+        import ar10010_report
+        import pdf_generator
+
+        report = ar10010_report.generate_report(filters=filters)
+        pdf_bytes = pdf_generator.generate_uncharged_report_pdf(report)
+        now = datetime.utcnow().strftime("%Y%m%d_%H%M")
+        filename = f"uncharged_delivery_{now}.pdf"
+        caption = f"תעודות משלוח שלא חויבו — {report['document_count']} תעודות, סה״כ {report['total_amount']:,.0f} ₪"
+        return report, pdf_bytes, filename, caption
 
-    report = ar10010_report.generate_report(filters=filters)
-    pdf_bytes = pdf_generator.generate_uncharged_report_pdf(report)
+    snap = _send_report_snapshot(phone, "uncharged_delivery", filters, build, force_refresh)
+    logger.info(f"Uncharged delivery PDF sent to {phone}: {snap['filename']} (cached={snap['cached']})")
+    return snap
 
-    now = datetime.utcnow().strftime("%Y%m%d_%H%M")
-    filename = f"uncharged_delivery_{now}.pdf"
-    caption = f"תעודות משלוח שלא חויבו — {report['document_count']} תעודות, סה״כ {report['total_amount']:,.0f} ₪"
 
-    whatsapp_bot_ariel.send_document(phone, pdf_bytes, filename, caption)
-    logger.info(f"Uncharged delivery PDF sent to {phone}: {filename}")
+def _snapshot_note(snap):
+    """Reply suffix telling the owner a cached report was re-sent."""
+    if not snap.get("cached"):
+        return ""
+    age_min = int((time.time() - snap["created_at"]) // 60)
+    return f"\n(דוח שהופק לפני {age_min} דק׳ — הוסף \"רענן\" להפקה מחדש)"
 
 
 def process_message(phone, name, text, msg_type="text", message_id="",
@@ -162,19 +231,20 @@ def process_message(phone, name, text, msg_type="text", message_id="",
     filters = parsed.get("filters") or {}
     # Remove null/None values from filters
     filters = {k: v for k, v in filters.items() if v is not None}
+    force_refresh = any(k in stripped.lower() for k in REFRESH_KEYWORDS)
 
     if command == "debt_report":
         try:
-            _run_debt_report_pdf(phone, filters)
-            return "דוח חייבים נשלח בהצלחה ✓"
+            snap = _run_debt_report_pdf(phone, filters, force_refresh)
+            return "דוח חייבים נשלח בהצלחה ✓" + _snapshot_note(snap)
         except Exception as e:
             logger.error(f"AR1000 report error: {e}")
             return f"שגיאה בהפקת דוח חייבים: {e}"
 
     elif command == "uncharged_delivery":
         try:
-            _run_uncharged_report_pdf(phone, filters)
-            return "דוח תעודות משלוח נשלח בהצלחה ✓"
+            snap = _run_uncharged_report_pdf(phone, filters, force_refresh)
+            return "דוח תעודות משלוח נשלח בהצלחה ✓" + _snapshot_note(snap)
         except Exception as e:
             logger.error(f"AR10010 report error: {e}")
             return f"שגיאה בהפקת דוח תעודות: {e}"
@@ -12,11 +12,13 @@ Flow:
 """
 
 import os
+import re
+import sys
 import uuid
 import time
 import json
+import hashlib
 import logging
-import requests as _requests
 from datetime import datetime
 
 logger = logging.getLogger("urbangroup.M10010")
@@ -27,10 +29,21 @@ _maint_db = None
 _scripts_db = None
 _equipment_reader = None
 _service_call_writer = None
+_llm_call = None
 
 SESSION_TTL_SECONDS = 30 * 60  # 30 minutes
 DEFAULT_SCRIPT_ID = "maintenance-troubleshoot"
 
+# Compiled script graphs: {script_id: {"version": updated_at, "graph": {...}}}
+_compiled_scripts = {}
+
+# LLM exit-routing decisions: {(step_id, key_hash): {"target": ..., "cached_at": ts}}
+_route_cache = {}
+ROUTE_CACHE_TTL_SECONDS = 60 * 60  # 1 hour
+ROUTE_CACHE_MAX_ENTRIES = 1000
+ROUTE_CACHE_IDENTITY_FIELDS = {"phone", "name"}  # left out of route cache keys
+_route_stats = {"rule_hits": 0, "cache_hits": 0, "llm_calls": 0, "llm_failures": 0}
+
 
 def _get_session_db():
     global _session_db
@@ -134,8 +147,57 @@ def _get_service_call_writer():
     return _service_call_writer
 
 
+def _get_llm_call():
+    """llm_call module: requests.post recorded by llm_metrics, plain requests.post without it."""
+    global _llm_call
+    if _llm_call is None:
+        if "llm_call" in sys.modules:
+            _llm_call = sys.modules["llm_call"]
+        else:
+            import importlib.util
+            call_path = os.path.join(
+                os.path.dirname(__file__), "..", "..", "..",
+                "LLM", "llm_call.py",
+            )
+            call_path = os.path.normpath(call_path)
+            spec = importlib.util.spec_from_file_location("llm_call", call_path)
+            mod = importlib.util.module_from_spec(spec)
+            sys.modules["llm_call"] = mod  # shared with the other LLM call sites
+            spec.loader.exec_module(mod)
+            _llm_call = mod
+    return _llm_call
+
+
+class SessionContext:
+    """Request-scoped session state for one inbound message.
+
+    Reads the session item at most once, lets the engine mutate the dict in place,
+    and persists all changes with a single conditional put on the `version` attribute.
+    """
+
+    def __init__(self, phone, session=None):
+        self.phone = phone
+        self.session = session
+        self._loaded = session is not None
+
+    def load(self):
+        """Return the session, reading it from DynamoDB only on first access."""
+        if not self._loaded:
+            self.session = _get_session_db().get_session(self.phone)
+            self._loaded = True
+        return self.session
+
+    def commit(self):
+        """Write the session once. Returns False if another message updated it first."""
+        self.session["updated_at"] = datetime.utcnow().isoformat() + "Z"
+        ok = _get_session_db().save_session(self.session, conditional=True)
+        if not ok:
+            logger.warning(f"[M10010] Concurrent update for {self.phone} — this message's changes were dropped")
+        return ok
+
+
 def _append_log(session, event, **kwargs):
-    """Append a diagnostic event to the session log."""
+    """Queue a diagnostic event; the next session save writes it to the log table."""
     if "session_log" not in session:
         session["session_log"] = []
     entry = {"ts": datetime.utcnow().isoformat() + "Z", "event": event}
@@ -212,27 +274,115 @@ def _load_script(script_id=None):
             return script
         # Fallback: search by name (useful when ROUTING_SCRIPT_ID is set to a display name)
         logger.info(f"[M10010] Script '{sid}' not found by ID, searching by name...")
-        all_scripts = db.list_scripts()
         sid_lower = sid.strip().lower()
-        for s in all_scripts:
-            if (s.get("name") or "").strip().lower() == sid_lower:
-                logger.info(f"[M10010] Found script by name '{sid}' → id={s['script_id']}")
-                return s
+        cursor = None
+        while True:
+            scripts, cursor = db.list_scripts(cursor=cursor)
+            for s in scripts:
+                if (s.get("name") or "").strip().lower() == sid_lower:
+                    logger.info(f"[M10010] Found script by name '{sid}' → id={s['script_id']}")
+                    return s
+            if not cursor:
+                break
     except Exception as e:
         logger.error(f"[M10010] Failed to load script {sid}: {e}")
     return None
 
 
+def _compile_script(script):
+    """Build the lookup structures the engine needs from a raw script dict.
+
+    Returns:
+        dict with:
+            steps: {step_id: step}
+            done_ids: set of terminal step IDs
+            step_save_to: ordered save_to fields of text steps
+            save_to_fields: ordered save_to fields of steps and buttons (unique)
+            auto_chains: {step_id: [(hop_id, instr_text, target), ...]} for runs of
+                instructions steps without exits — they advance regardless of session data
+            invalid_transitions: [(from_step, target)] pointing at unknown steps
+    """
+    steps = {}
+    for step in script.get("steps", []):
+        if step.get("id") and step["id"] not in steps:
+            steps[step["id"]] = step
+    done_ids = set(script.get("done_actions", {}) or {})
+
+    step_save_to = []
+    save_to_fields = []
+    seen = set()
+    for step in script.get("steps", []):
+        if step.get("save_to"):
+            step_save_to.append(step["save_to"])
+        for field in [step.get("save_to", "")] + [b.get("save_to", "") for b in step.get("buttons", [])]:
+            if field and field not in seen:
+                seen.add(field)
+                save_to_fields.append(field)
+
+    # Validate every transition target
+    invalid = []
+    first_step = script.get("first_step", "")
+    if first_step and first_step not in steps and first_step not in done_ids:
+        invalid.append(("first_step", first_step))
+    for sid, step in steps.items():
+        targets = [step.get("next_step"), step.get("on_success"), step.get("on_failure"),
+                   (step.get("skip_if") or {}).get("goto")]
+        for btn in step.get("buttons", []):
+            targets += [btn.get("next_step"), (btn.get("skip_if") or {}).get("goto")]
+        targets += [e.get("next_step") for e in step.get("exits", [])]
+        for target in targets:
+            if target and target not in steps and target not in done_ids:
+                invalid.append((sid, target))
+    if invalid:
+        logger.warning(f"[M10010] Script {script.get('script_id')}: invalid transitions {invalid}")
+
+    # Static skip-chain shortcuts: instructions steps without exits always advance
+    auto_chains = {}
+    for sid, step in steps.items():
+        chain = []
+        current = sid
+        visited = set()
+        while current in steps and current not in done_ids and current not in visited:
+            node = steps[current]
+            target = node.get("next_step", "")
+            if node.get("type") != "instructions" or node.get("exits") or not target or target == current:
+                break
+            visited.add(current)
+            chain.append((current, node.get("text", ""), target))
+            current = target
+        if chain:
+            auto_chains[sid] = chain
+
+    return {
+        "steps": steps,
+        "done_ids": done_ids,
+        "step_save_to": step_save_to,
+        "save_to_fields": save_to_fields,
+        "auto_chains": auto_chains,
+        "invalid_transitions": invalid,
+    }
+
+
+def _get_compiled(script):
+    """Return the compiled graph for a script, compiling once per script version."""
+    sid = script.get("script_id", "")
+    version = script.get("updated_at", "")
+    cached = _compiled_scripts.get(sid)
+    if cached and version and cached["version"] == version:
+        return cached["graph"]
+    graph = _compile_script(script)
+    if sid and version:
+        _compiled_scripts[sid] = {"version": version, "graph": graph}
+    return graph
+
+
 def _find_step(script, step_id):
     """Find a step definition in the script by ID.
 
     Returns:
         dict: step config, or None
     """
-    for step in script.get("steps", []):
-        if step.get("id") == step_id:
-            return step
-    return None
+    return _get_compiled(script)["steps"].get(step_id)
 
 
 # ── Generic Step Message Builder ──────────────────────────────
@@ -423,11 +573,92 @@ def _execute_action_step(step, session_data):
     return None
 
 
+def _check_exit_rule(rule, session_data):
+    """Evaluate a deterministic exit rule against session data.
+
+    A rule is a dict (or a list of dicts, all of which must match). Supports the
+    skip_if operators plus a regex search:
+        {"field": "original_text", "regex": "\\d{5,}"}
+        {"field": "equipment_check_result", "equals": "found"}
+        {"field": "device_number", "not_empty": true}
+    """
+    if isinstance(rule, list):
+        return bool(rule) and all(_check_exit_rule(r, session_data) for r in rule)
+    if not isinstance(rule, dict):
+        return False
+    if "regex" in rule:
+        value = str(session_data.get(rule.get("field", ""), "") or "")
+        try:
+            return re.search(rule["regex"], value) is not None
+        except re.error as e:
+            logger.error(f"[M10010] Invalid exit rule regex {rule['regex']!r}: {e}")
+            return False
+    return _check_skip_condition(rule, session_data)
+
+
+def _rule_route_exits(step, session_data):
+    """Pick an exit by its deterministic rule, before asking the LLM.
+
+    Exits are checked in order; the first exit whose `rule` matches wins.
+
+    Returns:
+        dict: the chosen exit, or None if no exit has a matching rule.
+    """
+    for exit_cfg in step.get("exits", []):
+        rule = exit_cfg.get("rule")
+        if rule and _check_exit_rule(rule, session_data):
+            _route_stats["rule_hits"] += 1
+            return exit_cfg
+    return None
+
+
+def _route_cache_key(step, session_info, original_text):
+    """Cache key for an LLM routing decision: step ID + hash of the inputs it depends on.
+
+    A step can list the session fields its decision depends on in "route_fields".
+    Otherwise the key covers everything the routing prompt sends: original_text
+    and the same session_info, minus the customer identity fields (phone, name)
+    so identical routings are shared across customers.
+    """
+    route_fields = step.get("route_fields")
+    if route_fields:
+        fields = {f: session_info.get(f, "") for f in route_fields}
+        if "original_text" in route_fields:
+            fields["original_text"] = original_text
+    else:
+        fields = {f: v for f, v in session_info.items() if f not in ROUTE_CACHE_IDENTITY_FIELDS}
+        fields["original_text"] = original_text
+
+    def _norm(v):
+        return " ".join(str(v).lower().split())
+
+    payload = {
+        "text": step.get("text", ""),
+        "exits": [(e.get("title", ""), e.get("next_step", "")) for e in step.get("exits", [])],
+        "fields": {k: _norm(v) for k, v in sorted(fields.items())},
+    }
+    digest = hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return (step.get("id", ""), digest.hexdigest())
+
+
+def get_route_stats():
+    """Return exit-routing counters and the share of routings that skipped the LLM."""
+    total = _route_stats["rule_hits"] + _route_stats["cache_hits"] + _route_stats["llm_calls"]
+    saved = _route_stats["rule_hits"] + _route_stats["cache_hits"]
+    return {
+        **_route_stats,
+        "cache_entries": len(_route_cache),
+        "hit_rate": round(saved / total, 3) if total else 0.0,
+    }
+
+
 def _llm_route_exits(step, session_data):
     """Use OpenAI to decide which exit to take from an instructions node with exits.
 
     Sends the instructions text + current session fields to GPT and asks it
     to choose one of the provided exits by returning its next_step target.
+    Decisions are cached per step and normalized session fields, so a repeated
+    identical routing does not call the API again.
 
     Returns:
         str: next_step target of the chosen exit, or first exit's next_step as fallback.
@@ -447,7 +678,7 @@ def _llm_route_exits(step, session_data):
     ])
 
     # Filter session to relevant fields (skip internal/large fields)
-    skip_keys = {"expires_at", "session_id", "created_at", "updated_at",
+    skip_keys = {"expires_at", "session_id", "created_at", "updated_at", "version", "log_count", "entity_type",
                  "parsed_data", "llm_result", "original_message_id",
                  "original_media_id", "bot_instructions", "bot_instructions_step"}
     session_info = {k: v for k, v in session_data.items()
@@ -456,6 +687,13 @@ def _llm_route_exits(step, session_data):
     # Always include original_text so format-detection instructions can read the raw message
     original_text = session_data.get("original_text", "")
 
+    cache_key = _route_cache_key(step, session_info, original_text)
+    cached = _route_cache.get(cache_key)
+    if cached and (time.time() - cached["cached_at"]) < ROUTE_CACHE_TTL_SECONDS:
+        _route_stats["cache_hits"] += 1
+        logger.info(f"[M10010] Route cache hit for {cache_key[0]} → {cached['target']}")
+        return cached["target"]
+
     prompt = (
         f"אתה מנתח נתוני שיחה ובוחר יציאה לפי הוראות. "
         f"החזר אך ורק מספר היציאה (0, 1 או 2) ללא שום טקסט נוסף.\n\n"
@@ -466,8 +704,10 @@ def _llm_route_exits(step, session_data):
         f"בחר מספר יציאה (החזר רק את המספר, 1 עד {len(exits)}):"
     )
 
+    _route_stats["llm_calls"] += 1
     try:
-        response = _requests.post(
+        response = _get_llm_call().post(
+            "M10010.route", model,
             "https://api.openai.com/v1/chat/completions",
             headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
             json={
@@ -484,9 +724,13 @@ def _llm_route_exits(step, session_data):
         if 0 <= idx < len(exits):
             chosen = exits[idx]
             logger.info(f"[M10010] LLM chose exit {idx} ('{chosen.get('title')}') → {chosen.get('next_step')}")
+            if len(_route_cache) >= ROUTE_CACHE_MAX_ENTRIES:
+                _route_cache.pop(next(iter(_route_cache)))  # drop the oldest entry
+            _route_cache[cache_key] = {"target": chosen.get("next_step", ""), "cached_at": time.time()}
             return chosen.get("next_step", "")
     except Exception as e:
         logger.error(f"[M10010] LLM route failed: {e}")
+    _route_stats["llm_failures"] += 1
 
     # Fallback: first exit
     fallback = exits[0].get("next_step", "")
@@ -510,21 +754,46 @@ def _resolve_skip_chain(step_id, script, session_data, max_depth=10):
     Returns:
         str: Final step ID after resolving all auto steps
     """
+    graph = _get_compiled(script)
     current = step_id
-    for _ in range(max_depth):
-        if _is_done_step(current, script):
+    depth = 0
+    while depth < max_depth:
+        depth += 1
+        if current in graph["done_ids"]:
             break
-        step = _find_step(script, current)
+        step = graph["steps"].get(current)
         if not step:
             break
 
+        # Precompiled run of exit-less instructions steps — no session data needed
+        chain = graph["auto_chains"].get(current)
+        if chain:
+            chain = chain[:max_depth - depth + 1]
+            for hop_id, instr_text, target in chain:
+                session_data["bot_instructions_step"] = instr_text
+                logger.info(f"[M10010] Instructions step {hop_id}: {instr_text[:100]}")
+                _append_log(session_data, "instructions_auto", step=hop_id, target=target)
+            depth += len(chain) - 1
+            current = chain[-1][2]
+            continue
+
         # Auto-execute instructions steps (LLM-route if exits, else simple advance)
         if step.get("type") == "instructions":
             instr_text = step.get("text", "")
             session_data["bot_instructions_step"] = instr_text
             exits = step.get("exits", [])
             if exits:
-                # LLM decides which exit to take
+                # Deterministic exit rules first, then the LLM decides
+                rule_exit = _rule_route_exits(step, session_data)
+                if rule_exit:
+                    target = rule_exit.get("next_step", "")
+                    if target and target != current:
+                        _append_log(session_data, "rule_route",
+                                    step=current, chosen_exit_title=rule_exit.get("title", ""),
+                                    target=target)
+                        current = target
+                        continue
+                    break
                 target = _llm_route_exits(step, session_data)
                 if target and target != current:
                     # Find chosen exit title for log
@@ -584,19 +853,19 @@ def _resolve_skip_chain(step_id, script, session_data, max_depth=10):
 
 def _is_done_step(step_id, script):
     """Check if a step ID is a terminal (done) step."""
-    done_actions = script.get("done_actions", {})
-    return step_id in done_actions
+    return step_id in _get_compiled(script)["done_ids"]
 
 
-def _switch_to_script(phone, target_script_id, session, db):
+def _switch_to_script(ctx, target_script_id):
     """Switch the active session to a different script (without losing session data).
 
     Used by the switch_script done_action to transition from a routing script
-    to a fault-reporting script in one seamless session.
+    to a fault-reporting script in one seamless session. Commits the session once.
 
     Returns:
         dict: first step message of the new script
     """
+    session = ctx.session
     new_script = _load_script(target_script_id)
     if not new_script:
         logger.error(f"[M10010] switch_script: target '{target_script_id}' not found")
@@ -613,13 +882,16 @@ def _switch_to_script(phone, target_script_id, session, db):
     session["expires_at"] = int(time.time()) + SESSION_TTL_SECONDS
     # Update bot_instructions from the new script
     session["bot_instructions"] = new_script.get("bot_instructions", "")
-    db.update_session(phone, session)
 
     logger.info(f"[M10010] Switched script: {target_script_id}, first_step={first_step}")
 
     if _is_done_step(first_step, new_script):
-        return _handle_done(first_step, new_script, session)
+        result = _handle_done(first_step, new_script, session)
+        ctx.commit()
+        return result
 
+    if not ctx.commit():
+        return None
     return _build_step_message(first_step, new_script, session)
 
 
@@ -628,6 +900,8 @@ def _switch_to_script(phone, target_script_id, session, db):
 def _handle_done(done_id, script, session):
     """Execute the done action and return the completion message.
 
+    Marks the session dict as done but does not write it — callers commit.
+
     Returns:
         dict: {"text": "..."} completion message
     """
@@ -654,15 +928,12 @@ def _handle_done(done_id, script, session):
         logger.info(f"[M10010] Custom action '{action}' for done={done_id}, saving as message")
         _save_customer_message(session, script)
 
-    # Log done event + extend TTL to 7 days so diagnostics can review completed sessions
+    # Log done event + extend TTL to 7 days so diagnostics can review completed sessions.
+    # The caller persists the session once (step, status, log and TTL together).
     _append_log(session, "session_done", done_id=done_id, action=action)
+    session["step"] = done_id
     session["status"] = "done"
     session["expires_at"] = int(time.time()) + 7 * 86400
-    try:
-        db = _get_session_db()
-        db.update_session(session.get("phone", ""), session)
-    except Exception as e:
-        logger.error(f"[M10010] Failed to persist done log for {session.get('phone')}: {e}")
 
     result = {"text": done_config.get("text", "תודה!")}
 
@@ -707,6 +978,9 @@ def reset_session(phone):
 def get_active_session(phone):
     """Check if phone has an active (non-expired) troubleshooting session.
 
+    Pass the returned dict to process_message(session=...) so the message is
+    handled without reading the session item a second time.
+
     Returns:
         dict session data, or None.
     """
@@ -794,12 +1068,9 @@ def start_session(phone, name, parsed_data=None, message_id="", media_id="",
     }
 
     # Pre-initialize all save_to fields defined in the script (text steps and buttons)
-    for step in script.get("steps", []):
-        if step.get("save_to") and step["save_to"] not in session_data:
-            session_data[step["save_to"]] = ""
-        for btn in step.get("buttons", []):
-            if btn.get("save_to") and btn["save_to"] not in session_data:
-                session_data[btn["save_to"]] = ""
+    for field in _get_compiled(script)["save_to_fields"]:
+        if field not in session_data:
+            session_data[field] = ""
 
     # Log session start
     _append_log(session_data, "session_start",
@@ -810,25 +1081,32 @@ def start_session(phone, name, parsed_data=None, message_id="", media_id="",
     first_step = _resolve_skip_chain(first_step, script, session_data)
     session_data["step"] = first_step
 
+    # Check if skip chain landed on a done step — run it before the single save
+    done_result = None
+    if _is_done_step(first_step, script):
+        done_result = _handle_done(first_step, script, session_data)
+
     db.save_session(session_data)
     logger.info(f"[M10010] Session started for {phone}, script={sid}, "
                 f"customer={customer_name}, device={device_number}")
 
-    # Check if skip chain landed on a done step
-    if _is_done_step(first_step, script):
-        return _handle_done(first_step, script, session_data)
-
+    if done_result is not None:
+        return done_result
     return _build_step_message(first_step, script, session_data)
 
 
-def process_message(phone, text, msg_type="text", caption=""):
+def process_message(phone, text, msg_type="text", caption="", session=None):
     """Process an incoming message for an active troubleshooting session.
 
+    Args:
+        session: Session dict already read by get_active_session (optional).
+            When given, the session item is not read again.
+
     Returns:
         dict: {"text": "...", "buttons": [...]} or {"text": "..."} or None
     """
-    db = _get_session_db()
-    session = db.get_session(phone)
+    ctx = SessionContext(phone, session)
+    session = ctx.load()
 
     if not session:
         return None
@@ -844,10 +1122,11 @@ def process_message(phone, text, msg_type="text", caption=""):
     if text.strip() == "-1":
         logger.info(f"[M10010] User {phone} pressed -1 → ending session")
         session["status"] = "cancelled"
+        session["step"] = "CANCELLED"
         _append_log(session, "session_cancelled", step=current_step)
-        db.update_session_step(phone, "CANCELLED")
         session["expires_at"] = int(time.time()) + 7 * 86400
-        db.save_session(session)
+        if not ctx.commit():
+            return None
         return {"text": "השיחה הסתיימה. תודה!"}
 
     next_step = _process_step_input(current_step, script, session, text, msg_type)
@@ -863,35 +1142,26 @@ def process_message(phone, text, msg_type="text", caption=""):
             msg["text"] = "אנא בחר אחת מהאפשרויות:\n\n" + msg["text"]
         return msg
 
+    if not _is_done_step(next_step, script):
+        # Resolve step-level skip_if chain
+        next_step = _resolve_skip_chain(next_step, script, session)
+
     if _is_done_step(next_step, script):
         done_cfg = script.get("done_actions", {}).get(next_step, {})
         if done_cfg.get("action") == "switch_script":
             logger.info(f"[M10010] switch_script: {phone} → {done_cfg.get('target_script_id')}")
-            return _switch_to_script(phone, done_cfg.get("target_script_id", ""), session, db)
+            return _switch_to_script(ctx, done_cfg.get("target_script_id", ""))
         result = _handle_done(next_step, script, session)
-        db.update_session_step(phone, next_step)
+        # Done actions have already run, so the reply goes out even if the write lost a race
+        ctx.commit()
         logger.info(f"[M10010] Done: {phone} → {next_step}")
         return result
 
-    # Resolve step-level skip_if chain
-    next_step = _resolve_skip_chain(next_step, script, session)
-
-    # Check if skip chain landed on a done step
-    if _is_done_step(next_step, script):
-        done_cfg = script.get("done_actions", {}).get(next_step, {})
-        if done_cfg.get("action") == "switch_script":
-            logger.info(f"[M10010] switch_script (after skip): {phone} → {done_cfg.get('target_script_id')}")
-            return _switch_to_script(phone, done_cfg.get("target_script_id", ""), session, db)
-        result = _handle_done(next_step, script, session)
-        db.update_session_step(phone, next_step)
-        logger.info(f"[M10010] Done (after skip): {phone} → {next_step}")
-        return result
-
     # Advance to next step
     session["step"] = next_step
-    session["updated_at"] = datetime.utcnow().isoformat() + "Z"
     session["expires_at"] = int(time.time()) + SESSION_TTL_SECONDS
-    db.update_session(phone, session)
+    if not ctx.commit():
+        return None
 
     return _build_step_message(next_step, script, session)
 
@@ -907,9 +1177,8 @@ def _save_customer_message(session, script=None):
     # Find message field: prefer "customer_message", fallback to first text save_to in script
     message = session.get("customer_message", "")
     if not message and script:
-        for step in script.get("steps", []):
-            save_to = step.get("save_to", "")
-            if save_to and session.get(save_to):
+        for save_to in _get_compiled(script)["step_save_to"]:
+            if session.get(save_to):
                 message = session[save_to]
                 break
 
@@ -966,20 +1235,10 @@ def _save_completed_service_call(session, script=None):
         "parsed_data", "llm_result",
     }
     script_fields = []  # ordered list of (field, value) as defined in script steps
-    seen = set()
     if script:
-        for step in script.get("steps", []):
-            save_to = step.get("save_to", "")
-            if save_to and save_to not in SYSTEM_FIELDS and save_to not in seen:
-                seen.add(save_to)
-                if session.get(save_to):
-                    script_fields.append((save_to, session[save_to]))
-            for btn in step.get("buttons", []):
-                bsave = btn.get("save_to", "")
-                if bsave and bsave not in SYSTEM_FIELDS and bsave not in seen:
-                    seen.add(bsave)
-                    if session.get(bsave):
-                        script_fields.append((bsave, session[bsave]))
+        for field in _get_compiled(script)["save_to_fields"]:
+            if field not in SYSTEM_FIELDS and session.get(field):
+                script_fields.append((field, session[field]))
 
     # Known field aliases that map to specific service call attributes
     description = session.get("description", "")
@@ -54,9 +54,18 @@ def send_document(phone, file_bytes, filename="document.pdf", caption=""):
         file_bytes: Document content as bytes
         filename: Display filename
         caption: Optional caption text
+
+    Returns:
+        dict: API response, plus "media_id" of the upload so it can be re-sent
     """
     media_id = upload_media(file_bytes, "application/pdf", filename)
+    result = send_document_by_id(phone, media_id, filename, caption)
+    result["media_id"] = media_id
+    return result
+
 
+def send_document_by_id(phone, media_id, filename="document.pdf", caption=""):
+    """Send an already-uploaded document (media_id from upload_media) via WhatsApp."""
     headers = {
         "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
         "Content-Type": "application/json",
@@ -120,6 +120,13 @@ whatsapp_bot_ariel = importlib.util.module_from_spec(spec_5010)
 sys.modules["whatsapp_bot_ariel"] = whatsapp_bot_ariel
 spec_5010.loader.exec_module(whatsapp_bot_ariel)
 
+# Load LLM call metrics (shared by every LLM call site)
+llm_metrics_path = PROJECT_ROOT / "agents" / "LLM" / "llm_metrics.py"
+spec_llm_metrics = importlib.util.spec_from_file_location("llm_metrics", llm_metrics_path)
+llm_metrics = importlib.util.module_from_spec(spec_llm_metrics)
+sys.modules["llm_metrics"] = llm_metrics
+spec_llm_metrics.loader.exec_module(llm_metrics)
+
 # Load ALLM1000 (Ariel command parser LLM)
 allm1000_path = PROJECT_ROOT / "agents" / "LLM" / "ariel" / "ALLM1000-command-parser" / "ALLM1000_command_parser.py"
 spec_allm1000 = importlib.util.spec_from_file_location("allm1000_command_parser", allm1000_path)
@@ -488,12 +495,13 @@ def whatsapp_incoming():
                 # Fall through to normal M1000 flow below
 
             # Check if this phone has an active troubleshooting session
-            elif m10010_bot.get_active_session(phone):
+            elif (active_session := m10010_bot.get_active_session(phone)):
                 result = m10010_bot.process_message(
                     phone=phone,
                     text=msg.get("text", ""),
                     msg_type=msg.get("type", "text"),
                     caption=msg.get("caption", ""),
+                    session=active_session,
                 )
                 if result:
                     _send_bot_response(phone, result)
@@ -681,9 +689,13 @@ def get_messages():
     """Get WhatsApp messages from DynamoDB."""
     status = request.args.get("status")
     limit = int(request.args.get("limit", "50"))
+    cursor = request.args.get("cursor")
     try:
-        messages = maintenance_db.get_messages(status=status, limit=limit)
-        return jsonify({"ok": True, "messages": messages, "count": len(messages)})
+        messages, next_cursor = maintenance_db.get_messages(status=status, limit=limit, cursor=cursor)
+        return jsonify({"ok": True, "messages": messages, "count": len(messages),
+                        "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -702,6 +714,21 @@ def update_message_status(item_id):
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@app.route("/api/messages/status", methods=["PUT"])
+def update_message_statuses():
+    """Set one status on many messages. Body: {ids: [...], status: "..."}"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids") or []
+    new_status = data.get("status")
+    if not ids or not new_status:
+        return jsonify({"ok": False, "error": "Missing ids or status"}), 400
+    try:
+        result = maintenance_db.update_message_statuses(ids, new_status)
+        return jsonify({"ok": True, **result})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
 # ── Service Calls (DynamoDB) ─────────────────────────────────
 
 @app.route("/api/service-calls", methods=["GET"])
@@ -1412,7 +1439,8 @@ Rules:
 - Return ONLY the raw JSON object, no markdown, no explanation"""
 
     try:
-        resp = http_requests.post(
+        resp = llm_metrics.post(
+            "bot_scripts.generate", model,
             "https://api.anthropic.com/v1/messages",
             headers={
                 "x-api-key": api_key,
@@ -1443,14 +1471,16 @@ Rules:
 
 @app.route("/api/bot-sessions", methods=["GET"])
 def api_bot_sessions():
-    """List recent bot sessions with their activity logs (for diagnostics)."""
+    """List recent bot sessions (for diagnostics). Logs load per session."""
     try:
-        sessions = troubleshoot_sessions_db.list_sessions(limit=50)
-        sessions.sort(key=lambda s: s.get("created_at", ""), reverse=True)
+        limit = int(request.args.get("limit", "50"))
+        sessions, next_cursor = troubleshoot_sessions_db.list_sessions(
+            limit=limit, cursor=request.args.get("cursor"))
         light = []
         for s in sessions:
             light.append({
                 "phone": s.get("phone"),
+                "session_id": s.get("session_id"),
                 "name": s.get("name"),
                 "customer_name": s.get("customer_name"),
                 "device_number": s.get("device_number"),
@@ -1459,19 +1489,118 @@ def api_bot_sessions():
                 "status": s.get("status", "active"),
                 "created_at": s.get("created_at"),
                 "updated_at": s.get("updated_at"),
-                "session_log": s.get("session_log", []),
+                "log_count": s.get("log_count", 0),
             })
-        return jsonify({"ok": True, "sessions": light})
+        return jsonify({"ok": True, "sessions": light, "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/admin/backfill-entity-index", methods=["POST"])
+def api_backfill_entity_index():
+    """One-off: tag pre-existing items so the indexed list endpoints include them."""
+    try:
+        counts = {
+            "messages": maintenance_db.backfill_message_entity_type(),
+            "sessions": troubleshoot_sessions_db.backfill_session_entity_type(),
+            "scripts": bot_scripts_db.backfill_entity_type(),
+            "prompts": bot_prompts_db.backfill_entity_type(),
+            "knowledge": knowledge_db.backfill_entity_type(),
+            "tasks": delivery_notes_db.backfill_task_entity_type(),
+            "service_call_buckets": maintenance_db.backfill_service_call_buckets(),
+        }
+        return jsonify({"ok": True, "updated": counts})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/bot-sessions", methods=["DELETE"])
+def api_delete_bot_sessions():
+    """Delete many bot sessions (cleanup). Body: {phones: [...]}"""
+    data = request.get_json(silent=True) or {}
+    phones = data.get("phones") or []
+    if not phones:
+        return jsonify({"ok": False, "error": "Missing phones"}), 400
+    try:
+        deleted = troubleshoot_sessions_db.delete_sessions(phones)
+        return jsonify({"ok": True, "deleted": deleted})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/bot-sessions/<phone>/log", methods=["GET"])
+def api_bot_session_log(phone):
+    """Get the activity log of one bot session."""
+    try:
+        log = troubleshoot_sessions_db.get_session_log(phone)
+        return jsonify({"ok": True, "session_log": log})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/bot-route-stats", methods=["GET"])
+def api_bot_route_stats():
+    """Exit-routing counters: rule hits, cache hits and LLM calls since cold start."""
+    return jsonify({"ok": True, "stats": m10010_bot.get_route_stats()})
+
+
+@app.route("/api/llm-cache-stats", methods=["GET"])
+def api_llm_cache_stats():
+    """Response cache counters of the text-classification LLMs since cold start."""
+    stats = {"ALLM1000": allm1000_module.get_response_cache_stats()}
+    mllm = m1000_bot._get_llm()
+    if mllm:
+        stats["MLLM1000"] = mllm.get_response_cache_stats()
+    return jsonify({"ok": True, "stats": stats})
+
+
+@app.route("/api/llm-metrics", methods=["GET"])
+def api_llm_metrics():
+    """Per call site LLM latency (p50/p95), tokens and errors: last ?hours=24 across containers, plus this process."""
+    try:
+        hours = max(1, min(int(request.args.get("hours", "24")), 24 * 30))
+        return jsonify({
+            "ok": True,
+            "hours": hours,
+            "sites": llm_metrics.dashboard(hours),
+            "process": llm_metrics.process_stats(),
+        })
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+LIST_ALL_PAGE_SIZE = 200  # page size when a list endpoint is called without ?limit / ?cursor
+
+
+def _list_page_or_all(list_fn, **filters):
+    """One page when the request passes ?limit or ?cursor, otherwise every page (the website reads full lists).
+
+    Returns:
+        (items, next_cursor) — next_cursor is None when the full list was read
+    """
+    cursor = request.args.get("cursor")
+    if "limit" in request.args or cursor:
+        return list_fn(limit=int(request.args.get("limit", "100")), cursor=cursor, **filters)
+    items = []
+    while True:
+        page, cursor = list_fn(limit=LIST_ALL_PAGE_SIZE, cursor=cursor, **filters)
+        items.extend(page)
+        if not cursor:
+            return items, None
+
+
 @app.route("/api/bot-scripts", methods=["GET"])
 def list_bot_scripts():
-    """List all bot conversation scripts."""
+    """List bot conversation scripts (all of them, or one page with ?limit / ?cursor)."""
     try:
-        scripts = bot_scripts_db.list_scripts()
-        return jsonify({"ok": True, "scripts": scripts, "count": len(scripts)})
+        scripts, next_cursor = _list_page_or_all(bot_scripts_db.list_scripts)
+        return jsonify({"ok": True, "scripts": scripts, "count": len(scripts), "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -1519,10 +1648,12 @@ def update_bot_script(script_id):
 
 @app.route("/api/bot-prompts", methods=["GET"])
 def list_bot_prompts():
-    """List all LLM prompts."""
+    """List LLM prompts (all of them, or one page with ?limit / ?cursor)."""
     try:
-        prompts = bot_prompts_db.list_prompts()
-        return jsonify({"ok": True, "prompts": prompts, "count": len(prompts)})
+        prompts, next_cursor = _list_page_or_all(bot_prompts_db.list_prompts)
+        return jsonify({"ok": True, "prompts": prompts, "count": len(prompts), "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -1594,13 +1725,26 @@ def get_conversation_detail(call_id):
 
 # ── Knowledge Base (RAG) ─────────────────────────────────────
 
+@app.route("/api/rag/embedding-cache-stats", methods=["GET"])
+def api_embedding_cache_stats():
+    """Embedding cache counters: LRU hits, DynamoDB hits and API calls since cold start."""
+    return jsonify({"ok": True, "stats": rag_retrieval.get_embedding_cache_stats()})
+
+
+@app.route("/api/rag/search-stats", methods=["GET"])
+def api_rag_search_stats():
+    """Hybrid search counters: lexical answers (embedding calls avoided) vs vector searches, with latency."""
+    return jsonify({"ok": True, "stats": rag_retrieval.get_search_stats()})
+
+
 @app.route("/api/knowledge", methods=["GET"])
 def list_knowledge():
-    """List all active knowledge items."""
+    """List active knowledge items (all of them, or one page with ?limit / ?cursor)."""
     try:
-        item_type = request.args.get("type")
-        items = knowledge_db.list_items(item_type=item_type)
-        return jsonify({"ok": True, "items": items, "count": len(items)})
+        items, next_cursor = _list_page_or_all(knowledge_db.list_items, item_type=request.args.get("type"))
+        return jsonify({"ok": True, "items": items, "count": len(items), "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -1630,15 +1774,38 @@ def create_knowledge_item():
         embedding = rag_retrieval.generate_embedding(data["content"])
         if embedding:
             data["embedding"] = embedding
+            data["embedding_model"] = rag_retrieval.EMBEDDING_MODEL
         else:
             logger.warning("Failed to generate embedding, saving without it")
 
         result = knowledge_db.save_item(data)
+        rag_retrieval.on_knowledge_changed([data])
         return jsonify({"ok": True, **result, "has_embedding": embedding is not None})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@app.route("/api/knowledge/bulk", methods=["POST"])
+def create_knowledge_items_bulk():
+    """Import many knowledge items at once. Body: {items: [{title, content, type, tags}, ...]}"""
+    data = request.get_json(silent=True) or {}
+    items = data.get("items") or []
+    if not items or any(not i.get("title") or not i.get("content") for i in items):
+        return jsonify({"ok": False, "error": "items with title and content are required"}), 400
+    try:
+        embeddings = rag_retrieval.generate_embeddings([item["content"] for item in items])
+        for item, embedding in zip(items, embeddings):
+            if embedding:
+                item["embedding"] = embedding
+                item["embedding_model"] = rag_retrieval.EMBEDDING_MODEL
+        ids = knowledge_db.save_items(items)
+        rag_retrieval.on_knowledge_changed(items)
+        return jsonify({"ok": True, "ids": ids, "count": len(ids),
+                        "with_embedding": sum(1 for i in items if i.get("embedding"))})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
 @app.route("/api/knowledge/<item_id>", methods=["PUT"])
 def update_knowledge_item(item_id):
     """Update a knowledge item (re-embeds if content changed)."""
@@ -1650,8 +1817,10 @@ def update_knowledge_item(item_id):
             embedding = rag_retrieval.generate_embedding(data["content"])
             if embedding:
                 data["embedding"] = embedding
+                data["embedding_model"] = rag_retrieval.EMBEDDING_MODEL
 
         result = knowledge_db.save_item(data)
+        rag_retrieval.on_knowledge_changed([data])
         return jsonify({"ok": True, **result})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -1662,6 +1831,7 @@ def delete_knowledge_item(item_id):
     """Deactivate a knowledge item."""
     try:
         knowledge_db.delete_item(item_id)
+        rag_retrieval.on_knowledge_changed([{"id": item_id, "active": False}])
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -1709,8 +1879,10 @@ def create_knowledge_from_call():
         embedding = rag_retrieval.generate_embedding(content)
         if embedding:
             item_data["embedding"] = embedding
+            item_data["embedding_model"] = rag_retrieval.EMBEDDING_MODEL
 
         result = knowledge_db.save_item(item_data)
+        rag_retrieval.on_knowledge_changed([item_data])
         return jsonify({"ok": True, **result, "title": title})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -1970,23 +2142,10 @@ def get_hr_sheets():
     except Exception as e:
         logger.warning(f"SharePoint sheets fetch failed: {e}")
     # Add DB-only months (created via "Create Month" button).
-    # Paginate — DynamoDB scan returns 1MB per page and the table is large.
     try:
-        scan_kwargs = {
-            "FilterExpression": "begins_with(id, :p)",
-            "ExpressionAttributeValues": {":p": "HR_SHEET_"},
-            "ProjectionExpression": "id",
-        }
-        while True:
-            resp = delivery_notes_db._table.scan(**scan_kwargs)
-            for item in resp.get("Items", []):
-                month = item.get("id", "").replace("HR_SHEET_", "")
-                if month and month not in sheets:
-                    sheets.append(month)
-            last_key = resp.get("LastEvaluatedKey")
-            if not last_key:
-                break
-            scan_kwargs["ExclusiveStartKey"] = last_key
+        for month in delivery_notes_db.list_hr_sheets():
+            if month and month not in sheets:
+                sheets.append(month)
     except Exception as e:
         logger.warning(f"DB sheets fetch failed: {e}")
     return jsonify({"ok": True, "sheets": sheets})
@@ -2407,11 +2566,12 @@ def sync_hr_priority():
 
 @app.route("/api/hr/tasks", methods=["GET"])
 def list_tasks():
-    """List tasks, optionally filtered by status."""
+    """List tasks, optionally filtered by status (all of them, or one page with ?limit / ?cursor)."""
     try:
-        status = request.args.get("status")
-        tasks = delivery_notes_db.list_tasks(status=status)
-        return jsonify({"ok": True, "tasks": tasks})
+        tasks, next_cursor = _list_page_or_all(delivery_notes_db.list_tasks, status=request.args.get("status"))
+        return jsonify({"ok": True, "tasks": tasks, "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         logger.error(f"List tasks failed: {e}")
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -2796,12 +2956,16 @@ def list_charging_months():
 
 @app.route("/api/energy/charging-sessions", methods=["GET"])
 def get_charging_sessions():
-    """Get saved charging sessions for a specific month."""
+    """Get saved charging sessions for a specific month.
+
+    Query: month, optional repeated site=<PARTNER> to read only those sites' rows.
+    """
     try:
         month = request.args.get("month", "").strip()
         if not month:
             return jsonify({"ok": False, "error": "Missing month parameter"}), 400
-        result = delivery_notes_db.get_charging_sessions(month)
+        sites = request.args.getlist("site") or None
+        result = delivery_notes_db.get_charging_sessions(month, sites=sites)
         if not result:
             return jsonify({"ok": True, "rows": [], "count": 0, "fileName": "", "updatedAt": "", "month": month})
         return jsonify({
@@ -2811,6 +2975,7 @@ def get_charging_sessions():
             "fileName": result.get("file_name", ""),
             "updatedAt": result.get("updated_at", ""),
             "month": result.get("month", month),
+            "totals": result.get("totals", {}),
         })
     except Exception as e:
         logger.error(f"Get charging sessions failed: {e}")
@@ -2938,6 +3103,23 @@ def _build_committee_xlsx(site_name, site_rows, month):
     return buf.getvalue(), round(total_energy, 2)
 
 
+def _fill_committee_site_rows(month, sites):
+    """Load rows from the saved month for site entries sent without rows (only those sites are read)."""
+    missing = [(s.get("siteName") or "").strip() for s in sites if not s.get("rows")]
+    missing = [m for m in missing if m]
+    if not missing:
+        return
+    saved = delivery_notes_db.get_charging_sessions(month, sites=missing)
+    if not saved:
+        return
+    by_site = {}
+    for row in saved["rows"]:
+        by_site.setdefault((row.get("PARTNER") or "ללא אתר").strip(), []).append(row)
+    for s in sites:
+        if not s.get("rows"):
+            s["rows"] = by_site.get((s.get("siteName") or "").strip(), [])
+
+
 def _safe_committee_filename(name):
     for c in '\\/:*?"<>|':
         name = name.replace(c, "_")
@@ -2950,7 +3132,7 @@ def energy_generate_committee_reports():
 
     Body:
       month: "4.26"
-      sites: [{ siteName, rows: [...session row dicts...] }]
+      sites: [{ siteName, rows: [...session row dicts...] }] — rows may be omitted to use the saved month
       saveSharePoint: bool
       saveLocal: bool (if true, returns files as base64 for browser to download)
     """
@@ -2962,6 +3144,7 @@ def energy_generate_committee_reports():
         save_local = bool(body.get("saveLocal"))
         if not month or not sites:
             return jsonify({"ok": False, "error": "Missing month or sites"}), 400
+        _fill_committee_site_rows(month, sites)
 
         import base64 as _b64
 
@@ -3023,7 +3206,7 @@ def energy_send_committee_emails():
 
     Body:
       month: "4.26"
-      sites: [{ siteName, rows: [...], email: "committee@example.com" }]
+      sites: [{ siteName, rows: [...], email: "committee@example.com" }] — rows may be omitted to use the saved month
       bodyText: optional custom message template. Supports {date}, {total}, {site} placeholders.
       testRecipient: optional override (string). When provided, ALL emails go there instead of each site's own address.
     """
@@ -3035,6 +3218,7 @@ def energy_send_committee_emails():
         body_template = body.get("bodyText") or ""
         if not month or not sites:
             return jsonify({"ok": False, "error": "Missing month or sites"}), 400
+        _fill_committee_site_rows(month, sites)
 
         gmail_user = os.getenv("URBANGROUP_GMAIL_USER", "urbangroup300@gmail.com")
         gmail_pass = os.getenv("URBANGROUP_GMAIL_APP_PASSWORD", "")
@@ -3055,6 +3239,7 @@ def energy_send_committee_emails():
         sender_label = formataddr((str(Header("אנרגיה אורבנית", "utf-8")), gmail_user))
 
         results = []
+        sent_log = []
         with smtplib.SMTP("smtp.gmail.com", 587) as smtp:
             smtp.starttls()
             smtp.login(gmail_user, gmail_pass)
@@ -3110,14 +3295,16 @@ def energy_send_committee_emails():
                     smtp.send_message(msg)
                     results.append({"siteName": site_name, "ok": True, "to": recipient, "total": total})
                     if not test_recipient:
-                        try:
-                            delivery_notes_db.mark_committee_sent(month, site_name, recipient, total)
-                        except Exception as e:
-                            logger.error(f"Mark committee sent failed for {site_name}: {e}")
+                        sent_log.append({"site": site_name, "to": recipient, "total": total})
                 except Exception as e:
                     logger.error(f"Send email for {site_name} failed: {e}")
                     results.append({"siteName": site_name, "ok": False, "error": str(e)})
 
+        try:
+            delivery_notes_db.mark_committee_sent_many(month, sent_log)
+        except Exception as e:
+            logger.error(f"Mark committees sent failed for {month}: {e}")
+
         ok_count = sum(1 for r in results if r.get("ok"))
         return jsonify({"ok": True, "sent": ok_count, "total": len(results), "results": results})
     except Exception as e:
@@ -3248,7 +3435,9 @@ def energy_create_journal_entries():
 
     Body:
       month: "3.26"
-      sites: [{ siteCustname, users: [{custname, amount}, ...] }]
+      sites: [{ siteName, siteCustname, users: [{custname, amount}, ...] }]
+      phoneToCust: optional {member phone: custname or {custname}}. Sites sent without users get
+        them from the saved month's precomputed per-member totals.
     """
     try:
         body = request.get_json(force=True)
@@ -3269,6 +3458,23 @@ def energy_create_journal_entries():
         except ValueError:
             return jsonify({"ok": False, "error": "Invalid month numbers"}), 400
 
+        phone_to_cust = body.get("phoneToCust") or {}
+        if phone_to_cust and any(not s.get("users") for s in sites):
+            totals = delivery_notes_db.get_charging_totals(month_str) or {}
+            site_members = totals.get("site_members", {})
+            for site in sites:
+                if site.get("users"):
+                    continue
+                amounts = {}
+                for phone, t in site_members.get(site.get("siteName", ""), {}).items():
+                    cust = phone_to_cust.get(phone)
+                    if isinstance(cust, dict):
+                        cust = cust.get("custname")
+                    # Same rule as the energy page: only rows with a positive price are billed
+                    if cust and t["billed_energy"] > 0:
+                        amounts[cust] = amounts.get(cust, 0) + t["billed_energy"]
+                site["users"] = [{"custname": c, "amount": a} for c, a in amounts.items()]
+
         # Last day of month
         from calendar import monthrange
         last_day = monthrange(year, mm)[1]
@@ -0,0 +1,92 @@
+"""
+bench_batch_writes - throughput of batched vs one-by-one writes in maintenance_db.
+
+Compares, for N messages:
+  - save_message() in a loop        vs  save_messages() (batch_writer)
+  - update_message_status() in a loop vs  update_message_statuses() (parallel fan-out)
+
+Runs against a local DynamoDB stand-in (DynamoDB Local / LocalStack) at --endpoint.
+A throwaway table is created and deleted.
+
+Usage:
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python database/benchmarks/bench_batch_writes.py [--endpoint http://localhost:8000] [--count 500]
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib.util
+from pathlib import Path
+
+import boto3
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+BENCH_TABLE = "urbangroup-bench-messages"
+
+
+def load_db(resource):
+    """Import maintenance_db and point it at the stand-in table."""
+    spec = importlib.util.spec_from_file_location(
+        "maintenance_db", PROJECT_ROOT / "database" / "maintenance" / "maintenance_db.py")
+    db = importlib.util.module_from_spec(spec)
+    sys.modules["maintenance_db"] = db
+    spec.loader.exec_module(db)
+    db._dynamodb = resource
+    db.MESSAGES_TABLE_NAME = BENCH_TABLE
+    db._messages_table = resource.Table(BENCH_TABLE)
+    return db
+
+
+def create_table(resource):
+    table = resource.create_table(
+        TableName=BENCH_TABLE,
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.wait_until_exists()
+    return table
+
+
+def rate(count, seconds):
+    return f"{seconds * 1000:8.0f} ms  {count / seconds:8.0f} items/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", default=os.environ.get("DYNAMODB_ENDPOINT", "http://localhost:8000"))
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+
+    resource = boto3.resource("dynamodb", endpoint_url=args.endpoint, region_name="us-east-1",
+                              aws_access_key_id="bench", aws_secret_access_key="bench")
+    table = create_table(resource)
+    try:
+        db = load_db(resource)
+        msgs = [{"phone": f"9725000{i:05d}", "name": "bench", "text": f"הודעה {i}"} for i in range(args.count)]
+
+        start = time.perf_counter()
+        single_ids = [db.save_message(**m)["id"] for m in msgs]
+        print(f"save_message x{args.count}:             {rate(args.count, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        batch_ids = db.save_messages(msgs)
+        print(f"save_messages (batched):           {rate(args.count, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        for item_id in single_ids:
+            db.update_message_status(item_id, "completed")
+        print(f"update_message_status x{args.count}:    {rate(args.count, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        result = db.update_message_statuses(batch_ids, "completed")
+        print(f"update_message_statuses (fan-out): {rate(args.count, time.perf_counter() - start)}"
+              f"  failed={len(result['failed'])}")
+    finally:
+        table.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bench_blob_store - read latency of the chunked blob store vs dataset size.
+
+Writes synthetic parts catalogues of increasing size through
+delivery_notes_db._save_blob, reads each back several times with _load_blob,
+and prints median/max latency. The legacy single-item format is timed too
+while the dataset still fits in one 400 KB item.
+
+Runs against the table in DELIVERY_NOTES_TABLE (AWS credentials required).
+Benchmark items use ids starting with "BENCH_" and are deleted at the end.
+
+Usage:
+    python database/benchmarks/bench_blob_store.py [--sizes 1000,5000,20000] [--reads 5]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import importlib.util
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_spec = importlib.util.spec_from_file_location(
+    "delivery_notes_db", PROJECT_ROOT / "database" / "maintenance" / "delivery_notes_db.py")
+db = importlib.util.module_from_spec(_spec)
+sys.modules["delivery_notes_db"] = db
+_spec.loader.exec_module(db)
+
+LEGACY_MAX_BYTES = 380 * 1024
+
+
+def make_parts(n):
+    """Synthetic Priority parts rows (shape of the real PARTS_CACHE)."""
+    rng = random.Random(n)
+    return [{
+        "PARTNAME": f"P{i:06d}",
+        "PARTDES": f"חלק לדוגמה {i} " + "".join(rng.choice("אבגדהוזחטיכלמנסעפצקרשת") for _ in range(12)),
+        "UNITNAME": rng.choice(["יח'", "מטר", "ק\"ג"]),
+        "PRICE": round(rng.uniform(1, 2000), 2),
+    } for i in range(n)]
+
+
+def timed(fn, reads):
+    times = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,5000,20000,50000")
+    parser.add_argument("--reads", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"table={db.TABLE_NAME} chunk={db.BLOB_CHUNK_BYTES // 1024}KB reads={args.reads}")
+    print(f"{'rows':>8} {'json KB':>9} {'gz KB':>7} {'chunks':>6} {'write ms':>9} "
+          f"{'blob med':>9} {'blob max':>9} {'legacy med':>11}")
+    cleanup = []
+    try:
+        for n in (int(x) for x in args.sizes.split(",")):
+            parts = make_parts(n)
+            blob_id = f"BENCH_BLOB_{n}"
+            cleanup.append(blob_id)
+
+            start = time.perf_counter()
+            manifest = db._save_blob(blob_id, parts, {"count": n})
+            write_ms = (time.perf_counter() - start) * 1000
+            blob_med, blob_max = timed(lambda: db._load_blob(blob_id), args.reads)
+
+            legacy = "-"
+            raw = json.dumps(parts, ensure_ascii=False)
+            if len(raw.encode("utf-8")) < LEGACY_MAX_BYTES:
+                legacy_id = f"BENCH_LEGACY_{n}"
+                cleanup.append(legacy_id)
+                db._table.put_item(Item={"id": legacy_id, "parts": raw})
+
+                def read_legacy():
+                    item = db._table.get_item(Key={"id": legacy_id})["Item"]
+                    json.loads(item["parts"])
+                legacy = f"{timed(read_legacy, args.reads)[0]:.1f}"
+
+            print(f"{n:>8} {manifest['raw_bytes'] / 1024:>9.0f} {manifest['stored_bytes'] / 1024:>7.0f} "
+                  f"{manifest['chunk_count']:>6} {write_ms:>9.1f} {blob_med:>9.1f} {blob_max:>9.1f} {legacy:>11}")
+    finally:
+        for item_id in cleanup:
+            item = db._table.get_item(Key={"id": item_id}).get("Item") or {}
+            if item.get("blob_version"):
+                db._delete_blob_chunks(item_id, item["blob_version"], int(item["chunk_count"]))
+            db._table.delete_item(Key={"id": item_id})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+bench_embedding_storage - size and decode time of knowledge embeddings by format.
+
+Builds N synthetic 1536-dimension embeddings and, for each storage format
+(legacy JSON text, packed float32, packed float16), reports the bytes stored
+per item and the time to decode all N items the way
+knowledge_db.get_all_active_with_embeddings does on a cache refill.
+Also reports the worst-case cosine-score drift float16 introduces.
+
+Pure CPU — no DynamoDB access.
+
+Usage:
+    python database/benchmarks/bench_embedding_storage.py [--items 10000] [--dims 1536]
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import importlib.util
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_spec = importlib.util.spec_from_file_location(
+    "knowledge_db", PROJECT_ROOT / "database" / "maintenance" / "knowledge_db.py")
+db = importlib.util.module_from_spec(_spec)
+sys.modules["knowledge_db"] = db
+_spec.loader.exec_module(db)
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    return dot / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(x * x for x in b)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--dims", type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vectors = [[rng.gauss(0, 0.03) for _ in range(args.dims)] for _ in range(args.items)]
+
+    formats = {
+        "json (legacy)": ([json.dumps(v) for v in vectors], lambda raw: json.loads(raw)),
+        "float32": ([db._pack_embedding(v, "f32")[0] for v in vectors],
+                    lambda raw: db._unpack_embedding(raw, "f32")),
+        "float16": ([db._pack_embedding(v, "f16")[0] for v in vectors],
+                    lambda raw: db._unpack_embedding(raw, "f16")),
+    }
+
+    print(f"{args.items} items x {args.dims} dims")
+    print(f"{'format':<14} {'bytes/item':>10} {'total MB':>9} {'decode ms':>10}")
+    for name, (stored, decode) in formats.items():
+        size = sum(len(x) for x in stored)
+        start = time.perf_counter()
+        for raw in stored:
+            decode(raw)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"{name:<14} {size / args.items:>10.0f} {size / 1e6:>9.1f} {ms:>10.1f}")
+
+    query = vectors[0]
+    drift = max(abs(cosine(query, v) - cosine(query, db._unpack_embedding(db._pack_embedding(v, "f16")[0], "f16")))
+                for v in vectors[:200])
+    print(f"\nmax cosine drift float16 vs float64 (200 samples): {drift:.6f}")
+
+
+if __name__ == "__main__":
+    main()
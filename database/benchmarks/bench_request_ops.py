@@ -0,0 +1,163 @@
+"""
+bench_request_ops - DynamoDB operations per request for the bot and HR flows.
+
+Runs the backend on the in-memory DynamoDB stand-in (DYNAMODB_BACKEND=memory,
+database/maintenance/memory_dynamodb.py), seeds representative data, and reports
+for each request the DynamoDB calls it made, by table and operation, with the
+estimated read/write capacity.
+
+Flows:
+  - HR: the /api/hr endpoints the HR screen calls on load and when editing tasks,
+    once cold (process caches cleared) and once warm.
+  - Bot: a full M10010 troubleshooting conversation (start, leave a message;
+    start, report a fault), one inbound WhatsApp message at a time, as the
+    webhook handles it (get_active_session + process_message).
+
+Priority pushes are replaced by a no-op writer so only DynamoDB traffic is measured.
+
+Usage:
+    python database/benchmarks/bench_request_ops.py [--parts 8000] [--tasks 150]
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib.util
+from pathlib import Path
+
+os.environ["DYNAMODB_BACKEND"] = "memory"
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+BENCH_PHONE = "972500000001"
+
+
+def load_server():
+    sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+    spec = importlib.util.spec_from_file_location("server", PROJECT_ROOT / "backend" / "server.py")
+    server = importlib.util.module_from_spec(spec)
+    sys.modules["server"] = server
+    spec.loader.exec_module(server)
+    return server
+
+
+class NoopServiceCallWriter:
+    def create_service_call(self, call_data):
+        return {"DOCNO": "SC-BENCH"}
+
+
+def seed_hr(db, parts, tasks):
+    db.save_parts_cache([{"PARTNAME": f"P{i:05d}", "PARTDES": f"חלק {i}", "PRICE": 10 + i % 90}
+                         for i in range(parts)])
+    db.save_customers_cache([{"CUSTNAME": f"C{i:04d}", "CUSTDES": f"לקוח {i}"} for i in range(400)])
+    db.save_sites_cache([{"CUSTNAME": f"C{i % 400:04d}", "SITECODE": f"S{i:05d}", "SITEDES": f"אתר {i}"}
+                         for i in range(2500)])
+    rows = [{"row": i, "site": f"S{i:05d}", "amount": i * 3} for i in range(600)]
+    db.save_hr_sheet("2.26", rows, {"sites": sorted({r["site"] for r in rows})})
+    for i in range(tasks):
+        db.save_task(f"משימה {i}", month="2.26")
+
+
+def clear_process_caches(server):
+    """Drop in-process caches so the next request reads DynamoDB as a fresh Lambda would."""
+    server.delivery_notes_db._blob_cache.clear()
+
+
+def format_ops(stats):
+    if not stats:
+        return "0 ops"
+    total = sum(sum(t["ops"].values()) for t in stats.values())
+    rcu = sum(t["rcu"] for t in stats.values())
+    wcu = sum(t["wcu"] for t in stats.values())
+    detail = ", ".join(
+        f"{table.replace('urbangroup-', '').replace('-prod', '')}:{op}×{n}"
+        for table, t in sorted(stats.items()) for op, n in sorted(t["ops"].items()))
+    return f"{total:3d} ops  {rcu:7.1f} RCU  {wcu:6.1f} WCU   {detail}"
+
+
+def measure(memory, label, fn):
+    memory.stats(reset=True)
+    t0 = time.perf_counter()
+    fn()
+    elapsed = (time.perf_counter() - t0) * 1000
+    print(f"  {label:<38} {elapsed:7.1f} ms  {format_ops(memory.stats(reset=True))}")
+
+
+def run_hr(server, memory, client):
+    task_ids = []
+
+    def get(path):
+        return lambda: client.get(path).get_json()
+
+    def create_task():
+        task_ids.append(client.post("/api/hr/tasks", json={"description": "בדיקה", "month": "2.26"})
+                        .get_json()["id"])
+
+    requests = [
+        ("GET /api/hr/db-data", get("/api/hr/db-data?sheet=2.26")),
+        ("GET /api/hr/parts", get("/api/hr/parts")),
+        ("GET /api/hr/customers", get("/api/hr/customers")),
+        ("GET /api/hr/sites?customer=C0007", get("/api/hr/sites?customer=C0007")),
+        ("GET /api/hr/tasks", get("/api/hr/tasks")),
+        ("GET /api/hr/tasks?status=open", get("/api/hr/tasks?status=open")),
+        ("GET /api/hr/contractor-payments", get("/api/hr/contractor-payments?sheet=2.26")),
+    ]
+    for phase in ("cold", "warm"):
+        print(f"\nHR flow ({phase})")
+        if phase == "cold":
+            clear_process_caches(server)
+        for label, fn in requests:
+            measure(memory, label, fn)
+
+    print("\nHR task edits")
+    measure(memory, "POST /api/hr/tasks", create_task)
+    measure(memory, "PUT /api/hr/tasks/<id>",
+            lambda: client.put(f"/api/hr/tasks/{task_ids[0]}", json={"status": "done"}))
+    measure(memory, "DELETE /api/hr/tasks/<id>", lambda: client.delete(f"/api/hr/tasks/{task_ids[0]}"))
+
+
+def run_bot(server, memory):
+    bot = server.m10010_bot
+    bot._service_call_writer = NoopServiceCallWriter()
+
+    def inbound(text):
+        def handle():
+            session = bot.get_active_session(BENCH_PHONE)
+            return bot.process_message(BENCH_PHONE, text, session=session)
+        return handle
+
+    def start():
+        bot.start_session(BENCH_PHONE, "לקוח בדיקה", original_text="שלום",
+                          script_id=bot.DEFAULT_SCRIPT_ID)
+
+    conversations = {
+        "leave a message": [("intent_message", "button"), ("הדוד לא מחמם", "message")],
+        "report a fault": [("intent_fault", "button"), ("device_no", "button"),
+                           ("הרצל 10 תל אביב", "address"), ("system_down_yes", "button"),
+                           ("אין מים חמים", "description")],
+    }
+    for name, steps in conversations.items():
+        print(f"\nBot flow: {name}")
+        bot.reset_session(BENCH_PHONE)
+        memory.stats(reset=True)
+        measure(memory, "start_session", start)
+        for text, kind in steps:
+            measure(memory, f"inbound {kind} ({text[:16]})", inbound(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=8000)
+    parser.add_argument("--tasks", type=int, default=150)
+    args = parser.parse_args()
+
+    server = load_server()
+    memory = sys.modules["memory_dynamodb"]
+
+    seed_hr(server.delivery_notes_db, args.parts, args.tasks)
+    run_hr(server, memory, server.app.test_client())
+    run_bot(server, memory)
+
+
+if __name__ == "__main__":
+    main()
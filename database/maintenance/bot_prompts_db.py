@@ -3,23 +3,47 @@ bot_prompts_db - DynamoDB storage for LLM system prompts.
 
 Table: urbangroup-bot-prompts-{stage}
   PK: prompt_id (String)
+  GSI: entity_type-created_at-index (entity_type="prompt" → created_at)
 
 Stores the system prompts used by MLLM1000 to analyze WhatsApp messages.
 Operators can edit prompts from the website to "train" the bot.
+
+The active prompt is read on every analyzed message, so it is cached per
+container and revalidated against a version counter (one consistent get_item)
+instead of re-scanning the table; every save bumps the version, so an edit
+reaches all containers within ACTIVE_VERSION_CHECK_SECONDS. Changes that skip
+the counter (edits made in the console) are picked up by a full rescan once the
+cached prompt is CACHE_TTL_SECONDS old.
 """
 
 import os
+import sys
 import json
 import time
 import logging
+import importlib.util
 from datetime import datetime
 from decimal import Decimal
 
-import boto3
+from boto3.dynamodb.conditions import Attr
 
 logger = logging.getLogger("urbangroup.bot_prompts_db")
 
-_dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb, entity_paging) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+_paging = _load_shared("entity_paging")
 
 TABLE_NAME = os.environ.get("BOT_PROMPTS_TABLE", "urbangroup-bot-prompts-prod")
 _table = _dynamodb.Table(TABLE_NAME)
@@ -27,6 +51,7 @@ _table = _dynamodb.Table(TABLE_NAME)
 # In-memory cache for active prompt
 _cache = {}
 CACHE_TTL_SECONDS = 300  # 5 minutes
+ACTIVE_VERSION_CHECK_SECONDS = 30  # how often a cached active prompt is compared to the version counter
 
 
 def get_active_prompt(use_cache=True):
@@ -38,21 +63,30 @@ def get_active_prompt(use_cache=True):
     Returns:
         dict with prompt data, or None if no active prompt
     """
-    if use_cache:
-        cached = _cache.get("active")
-        if cached and (time.time() - cached["fetched_at"]) < CACHE_TTL_SECONDS:
-            return cached["data"]
-
-    resp = _table.scan(
-        FilterExpression="active = :val",
-        ExpressionAttributeValues={":val": True},
-    )
-    items = resp.get("Items", [])
-    if items:
-        data = _deserialize_item(items[0])
-        _cache["active"] = {"data": data, "fetched_at": time.time()}
-        return data
-    return None
+    cached = _cache.get("active") if use_cache else None
+    if cached and (time.time() - cached["fetched_at"]) < ACTIVE_VERSION_CHECK_SECONDS:
+        return cached["data"]
+
+    # Read the version before the scan: a save during the scan bumps it and triggers another one
+    version = get_version()
+    if cached and cached["version"] == version and time.time() - cached["scanned_at"] < CACHE_TTL_SECONDS:
+        cached["fetched_at"] = time.time()
+        return cached["data"]
+
+    scan_kwargs = {"FilterExpression": Attr("active").eq(True)}
+    data = None
+    while data is None:
+        resp = _table.scan(**scan_kwargs)
+        items = resp.get("Items", [])
+        if items:
+            data = _deserialize_item(items[0])
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    # "No active prompt" is cached too, so callers fall back to their default without a scan per call
+    now = time.time()
+    _cache["active"] = {"data": data, "version": version, "fetched_at": now, "scanned_at": now}
+    return data
 
 
 def get_prompt(prompt_id, use_cache=True):
@@ -92,6 +126,7 @@ def save_prompt(prompt_data):
     prompt_data["updated_at"] = now
     if not prompt_data.get("created_at"):
         prompt_data["created_at"] = now
+    prompt_data["entity_type"] = "prompt"
 
     item = _prepare_item(prompt_data)
     _table.put_item(Item=item)
@@ -100,20 +135,29 @@ def save_prompt(prompt_data):
     pid = prompt_data["prompt_id"]
     _cache.pop(pid, None)
     _cache.pop("active", None)
+    _bump_version()
 
     logger.info(f"Prompt saved: {pid}")
     return {"prompt_id": pid}
 
 
-def list_prompts():
-    """List all prompts.
+def list_prompts(limit=100, cursor=None):
+    """List one page of prompts, newest first.
+
+    Args:
+        limit: Max items to return
+        cursor: next_cursor from the previous page (None = first page)
 
     Returns:
-        list of prompt dicts
+        (list of prompt dicts, next_cursor or None)
     """
-    resp = _table.scan()
-    items = resp.get("Items", [])
-    return [_deserialize_item(item) for item in items]
+    items, next_cursor = _paging.query_page(_table, "prompt", limit, cursor, key_name="prompt_id")
+    return [_deserialize_item(item) for item in items], next_cursor
+
+
+def backfill_entity_type():
+    """One-off: tag prompts saved before entity_type-created_at-index existed."""
+    return _paging.backfill_entity_type(_table, "prompt_id", "prompt")
 
 
 def invalidate_cache(prompt_id=None):
@@ -129,6 +173,37 @@ def invalidate_cache(prompt_id=None):
         _cache.clear()
 
 
+# ── Prompt version ───────────────────────────────────────────
+#
+# A counter item bumped on every save. Containers caching the active prompt
+# compare it to the version they read to tell whether their copy is current.
+
+PROMPTS_VERSION_ID = "PROMPTS_VERSION"
+
+
+def _bump_version():
+    """Increment the prompts version. Returns the new version."""
+    resp = _table.update_item(
+        Key={"prompt_id": PROMPTS_VERSION_ID},
+        UpdateExpression="ADD #v :one SET updated_at = :now",
+        ExpressionAttributeNames={"#v": "version"},
+        ExpressionAttributeValues={":one": 1, ":now": datetime.utcnow().isoformat() + "Z"},
+        ReturnValues="ALL_NEW",
+    )
+    return int(resp["Attributes"]["version"])
+
+
+def get_version():
+    """Current prompts version (0 if nothing was saved since it was introduced)."""
+    resp = _table.get_item(
+        Key={"prompt_id": PROMPTS_VERSION_ID},
+        ProjectionExpression="#v",
+        ExpressionAttributeNames={"#v": "version"},
+        ConsistentRead=True,
+    )
+    return int((resp.get("Item") or {}).get("version", 0))
+
+
 def _prepare_item(data):
     """Convert Python types to DynamoDB-safe format."""
     item = {}
@@ -3,23 +3,39 @@ bot_scripts_db - DynamoDB storage for bot conversation scripts.
 
 Table: urbangroup-bot-scripts-{stage}
   PK: script_id (String)
+  GSI: entity_type-created_at-index (entity_type="script" → created_at)
 
 Scripts define conversation flows as JSON: steps, buttons, text templates,
 skip conditions, and done actions. The M10010 bot engine reads these at runtime.
 """
 
 import os
+import sys
 import json
 import time
 import logging
+import importlib.util
 from datetime import datetime
 from decimal import Decimal
 
-import boto3
 
 logger = logging.getLogger("urbangroup.bot_scripts_db")
 
-_dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb, entity_paging) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+_paging = _load_shared("entity_paging")
 
 TABLE_NAME = os.environ.get("BOT_SCRIPTS_TABLE", "urbangroup-bot-scripts-prod")
 _table = _dynamodb.Table(TABLE_NAME)
@@ -70,6 +86,7 @@ def save_script(script_data):
     script_data["updated_at"] = now
     if not script_data.get("created_at"):
         script_data["created_at"] = now
+    script_data["entity_type"] = "script"
 
     item = _prepare_item(script_data)
     _table.put_item(Item=item)
@@ -82,15 +99,23 @@ def save_script(script_data):
     return {"script_id": sid}
 
 
-def list_scripts():
-    """List all bot scripts.
+def list_scripts(limit=100, cursor=None):
+    """List one page of bot scripts, newest first.
+
+    Args:
+        limit: Max items to return
+        cursor: next_cursor from the previous page (None = first page)
 
     Returns:
-        list of script dicts
+        (list of script dicts, next_cursor or None)
     """
-    resp = _table.scan()
-    items = resp.get("Items", [])
-    return [_deserialize_item(item) for item in items]
+    items, next_cursor = _paging.query_page(_table, "script", limit, cursor, key_name="script_id")
+    return [_deserialize_item(item) for item in items], next_cursor
+
+
+def backfill_entity_type():
+    """One-off: tag scripts saved before entity_type-created_at-index existed."""
+    return _paging.backfill_entity_type(_table, "script_id", "script")
 
 
 def delete_script(script_id):
@@ -4,23 +4,53 @@ delivery_notes_db - DynamoDB storage for delivery notes (תעודות משלוח
 Table: urbangroup-delivery-notes-{stage}
   PK: id (String, UUID)
   GSI: status-created_at-index (status → created_at)
+  GSI: entity_type-created_at-index (entity_type → created_at)
+
+The table is multiplexed. Every record carries an entity_type so each kind is a
+Query on entity_type-created_at-index instead of a scan with an id-prefix filter:
+  delivery_note, task, hr_sheet, charging_sessions, committee_email (one per
+  site; legacy single-map record: committee_emails), committee_sends,
+  contractor_payments, cache
+(see _entity_type_for_id; database/migrations/migrate_delivery_notes_entity_type.py
+tags records written before this).
 
 Each delivery note has a header + line items stored as JSON.
 Status flow: draft → sent → error
+
+Large cache datasets (parts, customers, sites, HR sheets, customer phones,
+accounts) are stored as chunked blobs: a manifest item + compressed chunk items.
 """
 
 import os
+import sys
 import json
+import time
 import uuid
 import logging
+import importlib.util
 from datetime import datetime
 from decimal import Decimal
 
-import boto3
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
 
 logger = logging.getLogger("urbangroup.delivery_notes_db")
 
-_dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb, entity_paging) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+_paging = _load_shared("entity_paging")
 TABLE_NAME = os.environ.get("DELIVERY_NOTES_TABLE", "urbangroup-delivery-notes-prod")
 _table = _dynamodb.Table(TABLE_NAME)
 
@@ -53,6 +83,7 @@ def save_delivery_note(customer_num, customer_name, site_name, details, items):
         "error": "",
         "created_at": now,
         "updated_at": now,
+        "entity_type": "delivery_note",
     })
 
     _table.put_item(Item=item)
@@ -78,14 +109,10 @@ def list_delivery_notes(status=None, limit=100):
             ScanIndexForward=False,
             Limit=limit,
         )
+        items = resp.get("Items", [])
     else:
-        resp = _table.scan(Limit=limit)
-
-    items = resp.get("Items", [])
-    result = [_deserialize_item(i) for i in items]
-    if not status:
-        result.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    return result
+        items, _ = _paging.query_page(_table, "delivery_note", limit)
+    return [_deserialize_item(i) for i in items]
 
 
 def update_delivery_note(note_id, updates):
@@ -139,6 +166,54 @@ def delete_delivery_note(note_id):
     logger.info(f"Deleted delivery note {note_id}")
 
 
+# ── Entity index ─────────────────────────────────────────────
+
+def _query_entity_all(entity_type, projection=None, names=None):
+    """Read every record of an entity type (all pages), newest first."""
+    kwargs = {
+        "IndexName": _paging.ENTITY_INDEX,
+        "KeyConditionExpression": Key("entity_type").eq(entity_type),
+        "ScanIndexForward": False,
+    }
+    if projection:
+        kwargs["ProjectionExpression"] = projection
+    if names:
+        kwargs["ExpressionAttributeNames"] = names
+    items = []
+    while True:
+        resp = _table.query(**kwargs)
+        items.extend(resp.get("Items", []))
+        if "LastEvaluatedKey" not in resp:
+            return items
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+_ENTITY_ID_PREFIXES = (
+    ("TASK_", "task"),
+    ("HR_SHEET_", "hr_sheet"),
+    ("CHARGING_SESSIONS_", "charging_sessions"),
+    ("COMMITTEE_EMAILS", "committee_emails"),
+    ("COMMITTEE_EMAIL_", "committee_email"),
+    ("COMMITTEE_SENT_", "committee_sends"),
+    ("CP_", "contractor_payments"),
+    ("PARTS_CACHE", "cache"),
+    ("CUSTOMERS_CACHE", "cache"),
+    ("SITES_CACHE", "cache"),
+    ("CUSTOMERS_PHONE_CACHE", "cache"),
+    ("ACCOUNTS_CACHE", "cache"),
+)
+
+
+def _entity_type_for_id(item_id):
+    """Entity type of a record from its id (blob chunks have none)."""
+    if "#" in item_id:
+        return None
+    for prefix, entity_type in _ENTITY_ID_PREFIXES:
+        if item_id.startswith(prefix):
+            return entity_type
+    return "delivery_note"
+
+
 def _prepare_item(data):
     """Convert Python types to DynamoDB-safe format."""
     item = {}
@@ -173,6 +248,172 @@ def _deserialize_item(item):
     return data
 
 
+# ── Chunked blob store (large cache datasets) ─────────────────────────
+#
+# A dataset is stored as one manifest item (id = blob id, plus metadata) and N
+# gzip-compressed binary chunk items (id = "<blob id>#<version>#<n>"). Chunks of
+# a new version are written first; putting the manifest switches readers over in
+# one step, then the replaced version's chunks are deleted.
+#
+# Decoded payloads are kept per process. A warm read only does a projected
+# GetItem of the manifest's blob_version and reuses the cached payload if unchanged.
+
+# {blob_id: {"version": str, "payload": ..., "manifest": dict}}
+_blob_cache = {}
+
+BLOB_CHUNK_BYTES = 300 * 1024  # stay well under the 400 KB item limit
+BLOB_GET_BATCH = 10            # keys per batch_get_item request (run in parallel)
+BLOB_READ_WORKERS = 8
+
+
+def _blob_chunk_id(blob_id, version, n):
+    return f"{blob_id}#{version}#{n:04d}"
+
+
+def _save_blob(blob_id, payload, meta=None):
+    """Store a JSON-serializable payload as manifest + compressed chunks.
+
+    Args:
+        blob_id: Manifest item id (e.g. PARTS_CACHE_ID)
+        payload: Data to store
+        meta: Extra manifest attributes (count, synced_at, filters, ...)
+
+    Returns:
+        dict: the manifest that was written
+    """
+    import gzip
+    raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    compressed = gzip.compress(raw)
+    version = uuid.uuid4().hex[:12]
+    chunks = [compressed[i:i + BLOB_CHUNK_BYTES]
+              for i in range(0, len(compressed), BLOB_CHUNK_BYTES)]
+
+    # batch_writer groups puts into BatchWriteItem calls and resends unprocessed items
+    with _table.batch_writer() as batch:
+        for n, chunk in enumerate(chunks):
+            batch.put_item(Item={
+                "id": _blob_chunk_id(blob_id, version, n),
+                "blob_of": blob_id,
+                "chunk": chunk,
+            })
+
+    now = datetime.utcnow().isoformat() + "Z"
+    manifest = _prepare_item({
+        "created_at": now,
+        **(meta or {}),
+        "id": blob_id,
+        "blob_version": version,
+        "chunk_count": len(chunks),
+        "raw_bytes": len(raw),
+        "stored_bytes": len(compressed),
+        "updated_at": now,
+    })
+    resp = _table.put_item(Item=manifest, ReturnValues="ALL_OLD")
+    _blob_cache[blob_id] = {"version": version, "payload": payload, "manifest": _deserialize_item(manifest)}
+    old = resp.get("Attributes") or {}
+    if old.get("blob_version"):
+        _delete_blob_chunks(blob_id, old["blob_version"], int(old.get("chunk_count", 0)))
+    logger.info(f"Saved blob {blob_id} v{version}: {len(raw)} bytes → "
+                f"{len(compressed)} compressed in {len(chunks)} chunk(s)")
+    return manifest
+
+
+def _delete_blob_chunks(blob_id, version, chunk_count):
+    """Delete the chunk items of a replaced blob version."""
+    with _table.batch_writer() as batch:
+        for n in range(chunk_count):
+            batch.delete_item(Key={"id": _blob_chunk_id(blob_id, version, n)})
+
+
+def _read_blob_chunks(blob_id, version, chunk_count):
+    """Fetch all chunks of a version with parallel batch_get_item calls.
+
+    Returns:
+        list of chunk bytes in order, or None if any chunk is missing
+    """
+    return _read_chunk_items([_blob_chunk_id(blob_id, version, n) for n in range(chunk_count)])
+
+
+def _read_chunk_items(ids):
+    """Fetch chunk items by id with parallel batch_get_item calls.
+
+    Returns:
+        list of chunk bytes in the order of ids, or None if any chunk is missing
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # The resource's client is thread-safe (the Table resource is not) and takes plain Python types
+    client = _dynamodb.meta.client
+    groups = [ids[i:i + BLOB_GET_BATCH] for i in range(0, len(ids), BLOB_GET_BATCH)]
+
+    def fetch(group):
+        found = {}
+        request = {TABLE_NAME: {
+            "Keys": [{"id": cid} for cid in group],
+            "ProjectionExpression": "id, #c",
+            "ExpressionAttributeNames": {"#c": "chunk"},
+        }}
+        for _ in range(5):
+            resp = client.batch_get_item(RequestItems=request)
+            for item in resp.get("Responses", {}).get(TABLE_NAME, []):
+                found[item["id"]] = bytes(item["chunk"])
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            time.sleep(0.05)
+        return found
+
+    chunks = {}
+    if len(groups) == 1:
+        chunks.update(fetch(groups[0]))
+    elif groups:
+        with ThreadPoolExecutor(max_workers=min(BLOB_READ_WORKERS, len(groups))) as pool:
+            for found in pool.map(fetch, groups):
+                chunks.update(found)
+    if len(chunks) != len(ids):
+        return None
+    return [chunks[cid] for cid in ids]
+
+
+def _load_blob(blob_id):
+    """Load a blob stored by _save_blob, reusing the process cache when still current.
+
+    The returned payload may be shared with other callers — treat it as read-only.
+
+    Returns:
+        (payload, manifest). payload is None for a legacy single-item record
+        (manifest is then the raw item); (None, None) if nothing is stored.
+    """
+    import gzip
+    cached = _blob_cache.get(blob_id)
+    if cached:
+        resp = _table.get_item(Key={"id": blob_id}, ProjectionExpression="blob_version")
+        current = (resp.get("Item") or {}).get("blob_version")
+        if current == cached["version"]:
+            return cached["payload"], cached["manifest"]
+        _blob_cache.pop(blob_id, None)
+        if not resp.get("Item"):
+            return None, None
+
+    for _ in range(2):
+        resp = _table.get_item(Key={"id": blob_id})
+        item = resp.get("Item")
+        if not item:
+            return None, None
+        manifest = _deserialize_item(item)
+        if not manifest.get("blob_version"):
+            return None, item
+        chunks = _read_blob_chunks(blob_id, manifest["blob_version"], int(manifest["chunk_count"]))
+        if chunks is not None:
+            payload = json.loads(gzip.decompress(b"".join(chunks)).decode("utf-8"))
+            _blob_cache[blob_id] = {"version": manifest["blob_version"], "payload": payload,
+                                    "manifest": manifest}
+            return payload, manifest
+        # A writer switched versions between our manifest and chunk reads — retry once
+        logger.warning(f"Blob {blob_id} v{manifest['blob_version']} changed during read, retrying")
+    raise RuntimeError(f"Blob {blob_id} could not be read consistently")
+
+
 # ── Parts Cache (stored as a special record in the same table) ────────
 
 PARTS_CACHE_ID = "PARTS_CACHE"
@@ -183,76 +424,58 @@ SITES_CACHE_ID = "SITES_CACHE"
 def save_parts_cache(parts):
     """Save parts list to DB cache."""
     now = datetime.utcnow().isoformat() + "Z"
-    item = _prepare_item({
-        "id": PARTS_CACHE_ID,
-        "status": "_cache",
-        "parts": parts,
-        "synced_at": now,
-        "created_at": now,
-        "updated_at": now,
-    })
-    _table.put_item(Item=item)
+    _save_blob(PARTS_CACHE_ID, parts, {"status": "_cache", "entity_type": "cache",
+                                       "count": len(parts), "synced_at": now})
     logger.info(f"Saved {len(parts)} parts to cache")
 
 
 def load_parts_cache():
     """Load parts list from DB cache. Returns {parts, synced_at} or None."""
-    resp = _table.get_item(Key={"id": PARTS_CACHE_ID})
-    item = resp.get("Item")
+    parts, item = _load_blob(PARTS_CACHE_ID)
     if not item:
         return None
     data = _deserialize_item(item)
-    return {"parts": data.get("parts", []), "synced_at": data.get("synced_at", "")}
+    if parts is None:
+        parts = data.get("parts", [])
+    return {"parts": parts, "synced_at": data.get("synced_at", "")}
 
 
 def save_customers_cache(customers):
     """Save customers list to DB cache."""
     now = datetime.utcnow().isoformat() + "Z"
-    item = _prepare_item({
-        "id": CUSTOMERS_CACHE_ID,
-        "status": "_cache",
-        "customers": customers,
-        "synced_at": now,
-        "created_at": now,
-        "updated_at": now,
-    })
-    _table.put_item(Item=item)
+    _save_blob(CUSTOMERS_CACHE_ID, customers,
+               {"status": "_cache", "entity_type": "cache", "count": len(customers), "synced_at": now})
     logger.info(f"Saved {len(customers)} customers to cache")
 
 
 def load_customers_cache():
     """Load customers list from DB cache. Returns {customers, synced_at} or None."""
-    resp = _table.get_item(Key={"id": CUSTOMERS_CACHE_ID})
-    item = resp.get("Item")
+    customers, item = _load_blob(CUSTOMERS_CACHE_ID)
     if not item:
         return None
     data = _deserialize_item(item)
-    return {"customers": data.get("customers", []), "synced_at": data.get("synced_at", "")}
+    if customers is None:
+        customers = data.get("customers", [])
+    return {"customers": customers, "synced_at": data.get("synced_at", "")}
 
 
 def save_sites_cache(sites):
     """Save sites list to DB cache."""
     now = datetime.utcnow().isoformat() + "Z"
-    item = _prepare_item({
-        "id": SITES_CACHE_ID,
-        "status": "_cache",
-        "sites": sites,
-        "synced_at": now,
-        "created_at": now,
-        "updated_at": now,
-    })
-    _table.put_item(Item=item)
+    _save_blob(SITES_CACHE_ID, sites, {"status": "_cache", "entity_type": "cache",
+                                       "count": len(sites), "synced_at": now})
     logger.info(f"Saved {len(sites)} sites to cache")
 
 
 def load_sites_cache():
     """Load sites list from DB cache. Returns {sites, synced_at} or None."""
-    resp = _table.get_item(Key={"id": SITES_CACHE_ID})
-    item = resp.get("Item")
+    sites, item = _load_blob(SITES_CACHE_ID)
     if not item:
         return None
     data = _deserialize_item(item)
-    return {"sites": data.get("sites", []), "synced_at": data.get("synced_at", "")}
+    if sites is None:
+        sites = data.get("sites", [])
+    return {"sites": sites, "synced_at": data.get("synced_at", "")}
 
 
 # ── HR Sheet Cache (stored as special records in the same table) ──────
@@ -262,34 +485,34 @@ def save_hr_sheet(sheet_name, rows, filters):
     """Save HR sheet data to DB cache."""
     now = datetime.utcnow().isoformat() + "Z"
     cache_id = f"HR_SHEET_{sheet_name}"
-    item = _prepare_item({
-        "id": cache_id,
-        "status": "_cache",
-        "rows": rows,
-        "filters": filters,
-        "synced_at": now,
-        "created_at": now,
-        "updated_at": now,
-    })
-    _table.put_item(Item=item)
+    _save_blob(cache_id, rows,
+               {"status": "_cache", "entity_type": "hr_sheet", "month": sheet_name,
+                "count": len(rows), "filters": filters, "synced_at": now})
     logger.info(f"Saved HR sheet '{sheet_name}' with {len(rows)} rows to cache")
 
 
 def load_hr_sheet(sheet_name):
     """Load HR sheet data from DB cache. Returns {rows, filters, synced_at} or None."""
     cache_id = f"HR_SHEET_{sheet_name}"
-    resp = _table.get_item(Key={"id": cache_id})
-    item = resp.get("Item")
+    rows, item = _load_blob(cache_id)
     if not item:
         return None
     data = _deserialize_item(item)
+    if rows is None:
+        rows = data.get("rows", [])
     return {
-        "rows": data.get("rows", []),
+        "rows": rows,
         "filters": data.get("filters", {}),
         "synced_at": data.get("synced_at", ""),
     }
 
 
+def list_hr_sheets():
+    """List the month names of all HR sheets saved in the DB."""
+    items = _query_entity_all("hr_sheet", "id, #m", {"#m": "month"})
+    return [item.get("month") or item["id"].replace("HR_SHEET_", "") for item in items]
+
+
 # ── Tasks (מטלות) ────────────────────────────────────────────
 
 
@@ -304,71 +527,64 @@ def save_task(description, month=""):
         "month": month,
         "created_at": now,
         "updated_at": now,
+        "entity_type": "task",
     })
     _table.put_item(Item=item)
     logger.info(f"Saved task {task_id}")
     return {"id": task_id}
 
 
-def list_tasks(status=None):
-    """List tasks, optionally filtered by status (open/done)."""
-    resp = _table.scan()
-    items = resp.get("Items", [])
-    tasks = []
-    for item in items:
-        if not item.get("id", "").startswith("TASK_"):
-            continue
-        t = _deserialize_item(item)
-        if status and t.get("status") != status:
-            continue
-        tasks.append(t)
-    tasks.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    return tasks
+def list_tasks(status=None, limit=100, cursor=None):
+    """List one page of tasks, newest first, optionally filtered by status (open/done).
+
+    Returns:
+        (list of task dicts, next_cursor or None)
+    """
+    status_filter = Attr("status").eq(status) if status else None
+    items, next_cursor = _paging.query_page(_table, "task", limit, cursor, status_filter)
+    return [_deserialize_item(item) for item in items], next_cursor
+
+
+def backfill_task_entity_type():
+    """One-off: tag tasks saved before entity_type-created_at-index existed."""
+    return _paging.backfill_entity_type(_table, "id", "task", Attr("id").begins_with("TASK_"))
 
 
 def save_customers_phone_cache(phone_map, name_map=None):
     """Save customers-by-phone (and optionally by-name) maps to DB."""
-    import gzip, base64
-    now = datetime.utcnow().isoformat() + "Z"
-    raw = json.dumps(phone_map, ensure_ascii=False)
-    compressed = gzip.compress(raw.encode("utf-8"))
-    encoded = base64.b64encode(compressed).decode("ascii")
-    item = {
-        "id": "CUSTOMERS_PHONE_CACHE",
-        "data_gz": encoded,
+    _save_blob("CUSTOMERS_PHONE_CACHE", {"data": phone_map, "name_map": name_map or {}}, {
+        "entity_type": "cache",
         "count": len(phone_map),
-        "updated_at": now,
-    }
-    if name_map is not None:
-        raw_n = json.dumps(name_map, ensure_ascii=False)
-        compressed_n = gzip.compress(raw_n.encode("utf-8"))
-        item["name_map_gz"] = base64.b64encode(compressed_n).decode("ascii")
-        item["name_count"] = len(name_map)
-    _table.put_item(Item=item)
+        "name_count": len(name_map or {}),
+    })
     logger.info(f"Saved customers cache: {len(phone_map)} phones, {len(name_map or {})} names")
 
 
 def get_customers_phone_cache():
     """Get customers cache (phone + name maps)."""
     import gzip, base64
-    resp = _table.get_item(Key={"id": "CUSTOMERS_PHONE_CACHE"})
-    item = resp.get("Item")
+    payload, item = _load_blob("CUSTOMERS_PHONE_CACHE")
     if not item:
         return None
-    data = {}
-    name_map = {}
-    encoded = item.get("data_gz")
-    if encoded:
-        try:
-            data = json.loads(gzip.decompress(base64.b64decode(encoded)).decode("utf-8"))
-        except Exception as e:
-            logger.error(f"Failed to decode customers phone cache: {e}")
-    encoded_n = item.get("name_map_gz")
-    if encoded_n:
-        try:
-            name_map = json.loads(gzip.decompress(base64.b64decode(encoded_n)).decode("utf-8"))
-        except Exception as e:
-            logger.error(f"Failed to decode customers name cache: {e}")
+    if payload is not None:
+        data = payload.get("data", {})
+        name_map = payload.get("name_map", {})
+    else:
+        # Legacy single-item record
+        data = {}
+        name_map = {}
+        encoded = item.get("data_gz")
+        if encoded:
+            try:
+                data = json.loads(gzip.decompress(base64.b64decode(encoded)).decode("utf-8"))
+            except Exception as e:
+                logger.error(f"Failed to decode customers phone cache: {e}")
+        encoded_n = item.get("name_map_gz")
+        if encoded_n:
+            try:
+                name_map = json.loads(gzip.decompress(base64.b64decode(encoded_n)).decode("utf-8"))
+            except Exception as e:
+                logger.error(f"Failed to decode customers name cache: {e}")
     return {
         "data": data,
         "name_map": name_map,
@@ -378,58 +594,261 @@ def get_customers_phone_cache():
     }
 
 
+# ── EV Charging Sessions ──────────────────────────────────────
+#
+# A month is stored as a manifest item (CHARGING_SESSIONS_<month>) plus, per site
+# (PARTNER), gzip-compressed columnar chunk items
+# ("CHARGING_SESSIONS_<month>#<version>#s<site no>#<n>"). The manifest holds the
+# site → chunks index and precomputed totals per site, per member (MEMBER NUMBER)
+# and per site+member, so reports read only the sites they need and totals need
+# no rows at all. Months saved before this are one item with the rows in data_gz.
+
+CHARGING_NO_SITE = "ללא אתר"
+CHARGING_KWH_FIELD = "CONSUMPTION (KWH)"
+CHARGING_PRICE_FIELD = "ENERGY PRICE (WITH TAXES)"
+
+
+def _charging_site(row):
+    """Site key of a session row — the same grouping the energy page uses."""
+    return (row.get("PARTNER") or CHARGING_NO_SITE).strip()
+
+
+def _charging_num(value):
+    try:
+        return float(value) if value not in ("", None) else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _charging_totals(rows):
+    """Per-site, per-member and per-site+member {count, kwh, energy, billed_energy} for session rows.
+
+    billed_energy sums only rows with a positive energy price — the rows the
+    energy page bills when it builds journal entries (refunds and zero rows are skipped).
+    """
+    def add(bucket, key, kwh, energy):
+        t = bucket.setdefault(key, {"count": 0, "kwh": 0.0, "energy": 0.0, "billed_energy": 0.0})
+        t["count"] += 1
+        t["kwh"] += kwh
+        t["energy"] += energy
+        if energy > 0:
+            t["billed_energy"] += energy
+
+    sites, members, site_members = {}, {}, {}
+    for row in rows:
+        site = _charging_site(row)
+        member = str(row.get("MEMBER NUMBER") or "")
+        kwh = _charging_num(row.get(CHARGING_KWH_FIELD))
+        energy = _charging_num(row.get(CHARGING_PRICE_FIELD))
+        add(sites, site, kwh, energy)
+        if member:
+            add(members, member, kwh, energy)
+            add(site_members.setdefault(site, {}), member, kwh, energy)
+    for bucket in [sites, members, *site_members.values()]:
+        for t in bucket.values():
+            t["kwh"] = round(t["kwh"], 4)
+            t["energy"] = round(t["energy"], 4)
+            t["billed_energy"] = round(t["billed_energy"], 4)
+    return {"sites": sites, "members": members, "site_members": site_members}
+
+
+def _encode_columnar(rows):
+    """Rows → {"columns": [...], "data": [...]}, one value list per column.
+
+    Columns with few distinct values are dictionary-encoded ({"dict", "codes"}).
+    Missing cells are stored as None and left out of the decoded row.
+    """
+    columns = []
+    seen = set()
+    for row in rows:
+        for k in row:
+            if k not in seen:
+                seen.add(k)
+                columns.append(k)
+    data = []
+    for col in columns:
+        values = [row.get(col) for row in rows]
+        # Keyed by (type, value): 0, 0.0 and False are equal in a dict but must decode as themselves
+        distinct = {}
+        try:
+            for v in values:
+                distinct.setdefault((type(v), v), (len(distinct), v))
+        except TypeError:  # unhashable cell values
+            distinct = None
+        if distinct is not None and len(distinct) * 2 < len(values):
+            data.append({"dict": [v for _, v in distinct.values()],
+                         "codes": [distinct[(type(v), v)][0] for v in values]})
+        else:
+            data.append(values)
+    return {"columns": columns, "data": data}
+
+
+def _decode_columnar(block):
+    columns = block.get("columns", [])
+    data = [[col["dict"][c] for c in col["codes"]] if isinstance(col, dict) else col
+            for col in block.get("data", [])]
+    count = len(data[0]) if data else 0
+    rows = []
+    for i in range(count):
+        rows.append({col: values[i] for col, values in zip(columns, data) if values[i] is not None})
+    return rows
+
+
+def _charging_chunk_id(month, version, site_no, n):
+    return f"CHARGING_SESSIONS_{month}#{version}#s{site_no:03d}#{n:04d}"
+
+
+def _charging_chunk_ids(month, version, site_index, sites=None):
+    """Chunk ids of the given sites (all sites if None), in site_index order."""
+    ids = []
+    for site, entry in site_index.items():
+        if sites is None or site in sites:
+            ids.extend(_charging_chunk_id(month, version, entry["n"], c) for c in range(entry["chunks"]))
+    return ids
+
+
 def save_charging_sessions(month, rows, file_name=""):
-    """Save EV charging sessions for a specific month. Compressed since the file can be large."""
-    import gzip, base64
+    """Save EV charging sessions for a month as per-site columnar chunks with precomputed totals."""
+    import gzip
     now = datetime.utcnow().isoformat() + "Z"
-    raw = json.dumps(rows, ensure_ascii=False)
-    compressed = gzip.compress(raw.encode("utf-8"))
-    encoded = base64.b64encode(compressed).decode("ascii")
-    _table.put_item(Item={
+    version = uuid.uuid4().hex[:12]
+
+    by_site = {}
+    for row in rows:
+        by_site.setdefault(_charging_site(row), []).append(row)
+
+    site_index = {}
+    stored = 0
+    with _table.batch_writer() as batch:
+        for site_no, (site, site_rows) in enumerate(by_site.items()):
+            raw = json.dumps(_encode_columnar(site_rows), ensure_ascii=False).encode("utf-8")
+            compressed = gzip.compress(raw)
+            stored += len(compressed)
+            chunks = [compressed[i:i + BLOB_CHUNK_BYTES]
+                      for i in range(0, len(compressed), BLOB_CHUNK_BYTES)]
+            for n, chunk in enumerate(chunks):
+                batch.put_item(Item={
+                    "id": _charging_chunk_id(month, version, site_no, n),
+                    "blob_of": f"CHARGING_SESSIONS_{month}",
+                    "chunk": chunk,
+                })
+            site_index[site] = {"n": site_no, "chunks": len(chunks), "count": len(site_rows)}
+
+    totals = json.dumps(_charging_totals(rows), ensure_ascii=False).encode("utf-8")
+    resp = _table.put_item(Item={
         "id": f"CHARGING_SESSIONS_{month}",
+        "entity_type": "charging_sessions",
         "month": month,
-        "data_gz": encoded,
+        "format": "columnar",
+        "blob_version": version,
+        "site_index": json.dumps(site_index, ensure_ascii=False),
+        "totals_gz": gzip.compress(totals),
         "count": len(rows),
         "file_name": file_name,
+        "created_at": now,
         "updated_at": now,
-    })
-    logger.info(f"Saved {len(rows)} charging sessions for {month} ({len(encoded)} bytes compressed)")
+    }, ReturnValues="ALL_OLD")
+
+    old = resp.get("Attributes") or {}
+    if old.get("blob_version") and old.get("site_index"):
+        old_ids = _charging_chunk_ids(month, old["blob_version"], json.loads(old["site_index"]))
+        with _table.batch_writer() as batch:
+            for cid in old_ids:
+                batch.delete_item(Key={"id": cid})
+    logger.info(f"Saved {len(rows)} charging sessions for {month} in {len(by_site)} sites "
+                f"({stored} bytes compressed)")
 
 
-def get_charging_sessions(month):
-    """Get charging sessions for a specific month."""
+def _decode_legacy_charging_rows(item):
     import gzip, base64
-    resp = _table.get_item(Key={"id": f"CHARGING_SESSIONS_{month}"})
-    item = resp.get("Item")
-    if not item:
-        return None
     encoded = item.get("data_gz")
-    rows = []
-    if encoded:
-        try:
-            compressed = base64.b64decode(encoded)
-            raw = gzip.decompress(compressed).decode("utf-8")
-            rows = json.loads(raw)
-        except Exception as e:
-            logger.error(f"Failed to decode charging sessions: {e}")
+    if not encoded:
+        return []
+    try:
+        return json.loads(gzip.decompress(base64.b64decode(encoded)).decode("utf-8"))
+    except Exception as e:
+        logger.error(f"Failed to decode charging sessions: {e}")
+        return []
+
+
+def get_charging_sessions(month, sites=None):
+    """Get charging sessions for a month.
+
+    Args:
+        sites: optional iterable of site names (PARTNER) — only their chunks are read
+
+    Returns:
+        dict {rows, count, file_name, updated_at, month, totals} or None
+    """
+    import gzip
+    wanted = set(sites) if sites is not None else None
+    for _ in range(2):
+        item = _table.get_item(Key={"id": f"CHARGING_SESSIONS_{month}"}).get("Item")
+        if not item:
+            return None
+        if not item.get("blob_version"):
+            rows = _decode_legacy_charging_rows(item)
+            totals = _charging_totals(rows)
+            if wanted is not None:
+                rows = [r for r in rows if _charging_site(r) in wanted]
+            break
+        site_index = json.loads(item["site_index"])
+        ids = _charging_chunk_ids(month, item["blob_version"], site_index, wanted)
+        chunks = _read_chunk_items(ids)
+        if chunks is None:
+            # A new upload replaced this version between our manifest and chunk reads — retry once
+            logger.warning(f"Charging sessions {month} changed during read, retrying")
+            continue
+        by_id = dict(zip(ids, chunks))
+        rows = []
+        for site, entry in site_index.items():
+            if wanted is not None and site not in wanted:
+                continue
+            site_ids = _charging_chunk_ids(month, item["blob_version"], {site: entry})
+            raw = gzip.decompress(b"".join(by_id[cid] for cid in site_ids))
+            rows.extend(_decode_columnar(json.loads(raw.decode("utf-8"))))
+        totals = json.loads(gzip.decompress(bytes(item["totals_gz"])).decode("utf-8"))
+        break
+    else:
+        raise RuntimeError(f"Charging sessions {month} could not be read consistently")
     return {
         "rows": rows,
         "count": int(item.get("count", 0)) if item.get("count") else 0,
         "file_name": item.get("file_name", ""),
         "updated_at": item.get("updated_at", ""),
         "month": item.get("month", month),
+        "totals": totals,
     }
 
 
+def get_charging_totals(month):
+    """Precomputed totals for a month without reading any rows.
+
+    Returns:
+        {"sites": {site: {count, kwh, energy, billed_energy}}, "members": {member: {...}},
+         "site_members": {site: {member: {...}}}} or None
+    """
+    import gzip
+    item = _table.get_item(
+        Key={"id": f"CHARGING_SESSIONS_{month}"},
+        ProjectionExpression="blob_version, totals_gz, data_gz",
+    ).get("Item")
+    if not item:
+        return None
+    if not item.get("totals_gz"):
+        return _charging_totals(_decode_legacy_charging_rows(item))
+    totals = json.loads(gzip.decompress(bytes(item["totals_gz"])).decode("utf-8"))
+    if any("billed_energy" not in t for t in totals.get("sites", {}).values()):
+        # Saved before billed_energy was precomputed — total the rows once more
+        sessions = get_charging_sessions(month)
+        totals = _charging_totals(sessions["rows"]) if sessions else totals
+    return totals
+
+
 def list_charging_months():
     """List all months that have saved charging sessions."""
-    resp = _table.scan(
-        FilterExpression="begins_with(id, :p)",
-        ExpressionAttributeValues={":p": "CHARGING_SESSIONS_"},
-        ProjectionExpression="id, #m, #c, file_name, updated_at",
-        ExpressionAttributeNames={"#m": "month", "#c": "count"},
-    )
-    items = resp.get("Items", [])
+    items = _query_entity_all("charging_sessions", "id, #m, #c, file_name, updated_at",
+                              {"#m": "month", "#c": "count"})
     months = []
     for item in items:
         months.append({
@@ -442,37 +861,91 @@ def list_charging_months():
     return months
 
 
+COMMITTEE_EMAIL_PREFIX = "COMMITTEE_EMAIL_"
+
+# Set once this process has folded the legacy single-map record into per-site items
+_committee_emails_migrated = False
+
+
+def _committee_email_id(site):
+    return f"{COMMITTEE_EMAIL_PREFIX}{site}"
+
+
+def _migrate_legacy_committee_emails():
+    """Split the legacy COMMITTEE_EMAILS map record into one item per site, then delete it.
+
+    Sites that already have their own item keep it (it is the newer edit).
+    """
+    global _committee_emails_migrated
+    if _committee_emails_migrated:
+        return
+    item = _table.get_item(Key={"id": "COMMITTEE_EMAILS"}).get("Item")
+    if item:
+        raw = item.get("emails", "{}")
+        try:
+            legacy = json.loads(raw) if isinstance(raw, str) else raw
+        except (json.JSONDecodeError, TypeError):
+            legacy = {}
+        now = datetime.utcnow().isoformat() + "Z"
+        for site, email in (legacy or {}).items():
+            if not email:
+                continue
+            try:
+                _table.put_item(
+                    Item={
+                        "id": _committee_email_id(site),
+                        "entity_type": "committee_email",
+                        "site": site,
+                        "email": email,
+                        "created_at": item.get("created_at") or now,
+                        "updated_at": now,
+                    },
+                    ConditionExpression=Attr("id").not_exists(),
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+        _table.delete_item(Key={"id": "COMMITTEE_EMAILS"})
+        logger.info(f"Migrated {len(legacy or {})} committee emails to per-site items")
+    _committee_emails_migrated = True
+
+
 def get_committee_emails():
-    """Get saved building-committee email addresses: {site name -> email string (may contain several, comma-separated)}."""
-    resp = _table.get_item(Key={"id": "COMMITTEE_EMAILS"})
-    item = resp.get("Item")
-    if not item:
-        return {}
-    raw = item.get("emails", "{}")
-    try:
-        return json.loads(raw) if isinstance(raw, str) else raw
-    except (json.JSONDecodeError, TypeError):
-        return {}
+    """Get saved building-committee email addresses: {site name -> email string (may contain several, comma-separated)}.
+
+    One item per site, read with a projected Query on the entity index.
+    """
+    _migrate_legacy_committee_emails()
+    items = _query_entity_all("committee_email", "#s, #e", {"#s": "site", "#e": "email"})
+    return {i["site"]: i.get("email", "") for i in items if i.get("site")}
 
 
 def save_committee_email(site, email):
     """Save (or clear, if email is empty) the email address(es) for one building committee site.
 
-    Merges into the existing map so concurrent edits to different sites don't overwrite each other.
+    Writes only that site's item, so concurrent edits to different sites don't race.
+
+    Returns:
+        dict: all saved emails after the edit
     """
+    _migrate_legacy_committee_emails()
     now = datetime.utcnow().isoformat() + "Z"
-    emails = get_committee_emails()
     if email:
-        emails[site] = email
+        _table.update_item(
+            Key={"id": _committee_email_id(site)},
+            UpdateExpression=(
+                "SET entity_type = :t, #s = :site, #e = :email, updated_at = :now, "
+                "created_at = if_not_exists(created_at, :now)"
+            ),
+            ExpressionAttributeNames={"#s": "site", "#e": "email"},
+            ExpressionAttributeValues={
+                ":t": "committee_email", ":site": site, ":email": email, ":now": now,
+            },
+        )
     else:
-        emails.pop(site, None)
-    _table.put_item(Item={
-        "id": "COMMITTEE_EMAILS",
-        "emails": json.dumps(emails, ensure_ascii=False),
-        "updated_at": now,
-    })
+        _table.delete_item(Key={"id": _committee_email_id(site)})
     logger.info(f"Saved committee email for site '{site}'")
-    return emails
+    return get_committee_emails()
 
 
 def get_committee_sends(month):
@@ -495,46 +968,64 @@ def mark_committee_sent(month, site, to, total):
     sends[site] = {"to": to, "sent_at": now, "total": total}
     _table.put_item(Item={
         "id": f"COMMITTEE_SENT_{month}",
+        "entity_type": "committee_sends",
         "month": month,
         "sends": json.dumps(sends, ensure_ascii=False),
+        "created_at": now,
         "updated_at": now,
     })
     logger.info(f"Marked committee '{site}' as sent for {month}")
     return sends
 
 
-def save_accounts_cache(accounts_map):
-    """Save accounts trial balance map to DB. Uses gzip compression to fit DynamoDB 400KB limit."""
-    import gzip, base64
+def mark_committee_sent_many(month, sent):
+    """Record several committee sends for a month with one read and one write.
+
+    Args:
+        sent: list of dicts {site, to, total}
+    """
+    if not sent:
+        return get_committee_sends(month)
     now = datetime.utcnow().isoformat() + "Z"
-    raw_json = json.dumps(accounts_map, ensure_ascii=False)
-    compressed = gzip.compress(raw_json.encode("utf-8"))
-    encoded = base64.b64encode(compressed).decode("ascii")
+    sends = get_committee_sends(month)
+    for s in sent:
+        sends[s["site"]] = {"to": s["to"], "sent_at": now, "total": s["total"]}
     _table.put_item(Item={
-        "id": "ACCOUNTS_CACHE",
-        "data_gz": encoded,
-        "count": len(accounts_map),
+        "id": f"COMMITTEE_SENT_{month}",
+        "entity_type": "committee_sends",
+        "month": month,
+        "sends": json.dumps(sends, ensure_ascii=False),
+        "created_at": now,
         "updated_at": now,
     })
-    logger.info(f"Saved accounts cache: {len(accounts_map)} accounts ({len(encoded)} bytes compressed)")
+    logger.info(f"Marked {len(sent)} committees as sent for {month}")
+    return sends
+
+
+def save_accounts_cache(accounts_map):
+    """Save accounts trial balance map to DB as a chunked blob (no 400KB item limit)."""
+    manifest = _save_blob("ACCOUNTS_CACHE", accounts_map, {"entity_type": "cache", "count": len(accounts_map)})
+    logger.info(f"Saved accounts cache: {len(accounts_map)} accounts "
+                f"({manifest['stored_bytes']} bytes compressed)")
 
 
 def get_accounts_cache():
     """Get cached accounts map. Returns dict with 'data' (decompressed) and 'updated_at', or None."""
     import gzip, base64
-    resp = _table.get_item(Key={"id": "ACCOUNTS_CACHE"})
-    item = resp.get("Item")
+    data, item = _load_blob("ACCOUNTS_CACHE")
     if not item:
         return None
-    encoded = item.get("data_gz")
-    data = {}
-    if encoded:
-        try:
-            compressed = base64.b64decode(encoded)
-            raw = gzip.decompress(compressed).decode("utf-8")
-            data = json.loads(raw)
-        except Exception as e:
-            logger.error(f"Failed to decode accounts cache: {e}")
+    if data is None:
+        # Legacy single-item record
+        data = {}
+        encoded = item.get("data_gz")
+        if encoded:
+            try:
+                compressed = base64.b64decode(encoded)
+                raw = gzip.decompress(compressed).decode("utf-8")
+                data = json.loads(raw)
+            except Exception as e:
+                logger.error(f"Failed to decode accounts cache: {e}")
     return {
         "data": data,
         "count": int(item.get("count", 0)) if item.get("count") else 0,
@@ -547,7 +1038,9 @@ def save_contractor_payments(sheet, data):
     now = datetime.utcnow().isoformat() + "Z"
     item = _prepare_item({
         "id": f"CP_{sheet}",
+        "entity_type": "contractor_payments",
         "data": data,
+        "created_at": now,
         "updated_at": now,
     })
     _table.put_item(Item=item)
@@ -0,0 +1,117 @@
+"""
+embedding_cache_db - DynamoDB storage for cached text embeddings.
+
+Table: urbangroup-embedding-cache-{stage}
+  PK: cache_key (String, sha256 of model + normalized text — see rag_retrieval)
+  TTL: expires_at (Number, epoch seconds)
+
+Vectors are stored as packed little-endian float32 (vector_bin, see
+embedding_codec) and returned as array('f'). This is the persistent tier behind
+rag_retrieval's in-process LRU, shared by all Lambda containers.
+
+expires_at is pushed back on reads too, at most once per TTL_REFRESH_SECONDS
+per item, so only vectors nobody has asked for in CACHE_TTL_SECONDS expire.
+"""
+
+import os
+import sys
+import time
+import logging
+import importlib.util
+from datetime import datetime
+
+logger = logging.getLogger("urbangroup.embedding_cache_db")
+
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb, embedding_codec) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+_codec = _load_shared("embedding_codec")
+
+TABLE_NAME = os.environ.get("EMBEDDING_CACHE_TABLE", "urbangroup-embedding-cache-prod")
+_table = _dynamodb.Table(TABLE_NAME)
+CACHE_TTL_SECONDS = 90 * 86400  # unused vectors expire after 90 days
+TTL_REFRESH_SECONDS = 7 * 86400  # a hit pushes expires_at back once it is this much older
+BATCH_GET_SIZE = 100  # keys per batch_get_item request (the DynamoDB maximum)
+
+
+def _touch(cache_key, expires_at):
+    """Push back expires_at of a vector just read, if it was last set over TTL_REFRESH_SECONDS ago."""
+    now = int(time.time())
+    if expires_at and int(expires_at) - now > CACHE_TTL_SECONDS - TTL_REFRESH_SECONDS:
+        return
+    try:
+        _table.update_item(
+            Key={"cache_key": cache_key},
+            UpdateExpression="SET expires_at = :exp",
+            ConditionExpression="attribute_exists(cache_key)",
+            ExpressionAttributeValues={":exp": now + CACHE_TTL_SECONDS},
+        )
+    except Exception as e:
+        logger.warning(f"Embedding cache TTL refresh failed for {cache_key}: {e}")
+
+
+def get_vector(cache_key):
+    """Cached embedding for a key.
+
+    Returns:
+        array('f'), or None if not cached
+    """
+    resp = _table.get_item(Key={"cache_key": cache_key}, ProjectionExpression="vector_bin, expires_at")
+    item = resp.get("Item")
+    if not item or "vector_bin" not in item:
+        return None
+    _touch(cache_key, item.get("expires_at"))
+    return _codec.unpack(item["vector_bin"])
+
+
+def get_vectors(cache_keys):
+    """Cached embeddings for many keys, read with batch_get_item (100 keys per request).
+
+    Returns:
+        dict cache_key -> array('f'), for the keys that are cached
+    """
+    client = _dynamodb.meta.client
+    keys = list(dict.fromkeys(cache_keys))  # BatchGetItem rejects duplicate keys
+    found = {}
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {TABLE_NAME: {
+            "Keys": [{"cache_key": key} for key in keys[start:start + BATCH_GET_SIZE]],
+            "ProjectionExpression": "cache_key, vector_bin, expires_at",
+        }}
+        for _ in range(5):
+            resp = client.batch_get_item(RequestItems=request)
+            for item in resp.get("Responses", {}).get(TABLE_NAME, []):
+                if "vector_bin" in item:
+                    found[item["cache_key"]] = item
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            time.sleep(0.05)
+    vectors = {}
+    for key, item in found.items():
+        _touch(key, item.get("expires_at"))
+        vectors[key] = _codec.unpack(item["vector_bin"])
+    return vectors
+
+
+def save_vector(cache_key, model, vector):
+    """Store an embedding under a key (overwrites, refreshing the TTL)."""
+    _table.put_item(Item={
+        "cache_key": cache_key,
+        "model": model,
+        "dims": len(vector),
+        "vector_bin": _codec.pack(vector),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "expires_at": int(time.time()) + CACHE_TTL_SECONDS,
+    })
@@ -0,0 +1,33 @@
+"""
+embedding_codec - Packed binary form of embedding vectors.
+
+Vectors are stored as little-endian float32 (or float16) bytes in a Binary
+attribute and decoded into array('f'). Used by knowledge_db (embedding_bin) and
+embedding_cache_db (vector_bin).
+"""
+
+import sys
+import struct
+from array import array
+
+
+def pack(vector, dtype="f32"):
+    """Pack a vector of floats as little-endian float32 ("f32") or float16 ("f16") bytes."""
+    if dtype == "f16":
+        return struct.pack(f"<{len(vector)}e", *vector)
+    packed = array("f", vector)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(raw, dtype="f32"):
+    """Decode bytes from pack() into array('f')."""
+    raw = bytes(raw)
+    if dtype == "f16":
+        return array("f", struct.unpack(f"<{len(raw) // 2}e", raw))
+    vector = array("f")
+    vector.frombytes(raw)
+    if sys.byteorder != "little":
+        vector.byteswap()
+    return vector
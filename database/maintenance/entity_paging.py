@@ -0,0 +1,115 @@
+"""
+entity_paging - Shared paging over the entity_type-created_at-index GSI.
+
+Every maintenance table tags its records with entity_type and keeps the
+entity_type-created_at-index GSI, so lists are read newest-first one page at a
+time. Page positions travel to the client as an opaque base64 cursor.
+
+Used by maintenance_db, troubleshoot_sessions_db, bot_scripts_db,
+bot_prompts_db, knowledge_db and delivery_notes_db.
+"""
+
+import json
+import base64
+import logging
+
+from boto3.dynamodb.conditions import Key, Attr
+
+logger = logging.getLogger("urbangroup.entity_paging")
+
+ENTITY_INDEX = "entity_type-created_at-index"
+FILTER_PAGE_SIZE = 200  # items read per query when a filter can leave pages short
+
+
+def query_page(table, entity_type, limit, cursor=None, filter_expression=None, key_name="id"):
+    """Query one newest-first page of an entity type from entity_type-created_at-index.
+
+    With a filter, each query reads FILTER_PAGE_SIZE items and the matches are
+    trimmed to `limit`; the cursor then points at the last item returned.
+
+    Args:
+        table: boto3 Table (or in-memory stand-in)
+        entity_type: entity_type value to list
+        limit: max items to return
+        cursor: next_cursor from the previous page (None = first page)
+        filter_expression: optional FilterExpression on the items
+        key_name: the table's partition key (to build a cursor from a trimmed page)
+
+    Returns:
+        (items, next_cursor) — next_cursor is None on the last page
+    """
+    kwargs = {
+        "IndexName": ENTITY_INDEX,
+        "KeyConditionExpression": Key("entity_type").eq(entity_type),
+        "ScanIndexForward": False,
+        "Limit": limit,
+    }
+    if filter_expression is not None:
+        kwargs["FilterExpression"] = filter_expression
+        kwargs["Limit"] = max(limit, FILTER_PAGE_SIZE)
+    start_key = decode_cursor(cursor)
+    items = []
+    while True:
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        resp = table.query(**kwargs)
+        page = resp.get("Items", [])
+        room = limit - len(items)
+        if len(page) > room:
+            items.extend(page[:room])
+            last = items[-1]
+            return items, encode_cursor({key_name: last[key_name], "entity_type": last["entity_type"],
+                                         "created_at": last["created_at"]})
+        items.extend(page)
+        start_key = resp.get("LastEvaluatedKey")
+        if not start_key or len(items) >= limit:
+            return items, encode_cursor(start_key)
+
+
+def encode_cursor(last_key):
+    """Opaque page cursor from a DynamoDB LastEvaluatedKey."""
+    if not last_key:
+        return None
+    raw = json.dumps(last_key, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def backfill_entity_type(table, key_name, entity_type, filter_expression=None):
+    """Tag items written before the entity index existed so they show up in listings.
+
+    Returns:
+        int: number of items updated
+    """
+    cond = Attr("entity_type").not_exists() & Attr("created_at").exists()
+    if filter_expression is not None:
+        cond = cond & filter_expression
+    scan_kwargs = {
+        "FilterExpression": cond,
+        "ProjectionExpression": "#pk",
+        "ExpressionAttributeNames": {"#pk": key_name},
+    }
+    updated = 0
+    while True:
+        resp = table.scan(**scan_kwargs)
+        for item in resp.get("Items", []):
+            table.update_item(
+                Key={key_name: item[key_name]},
+                UpdateExpression="SET entity_type = :t",
+                ExpressionAttributeValues={":t": entity_type},
+            )
+            updated += 1
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    logger.info(f"Backfilled entity_type={entity_type} on {updated} items in {table.name}")
+    return updated
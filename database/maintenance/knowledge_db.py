@@ -3,24 +3,55 @@ knowledge_db - DynamoDB storage for bot knowledge base items.
 
 Table: urbangroup-knowledge-{stage}
   PK: id (String, UUID)
+  GSI: entity_type-created_at-index (entity_type="knowledge" → created_at)
+
+Active items carry entity_type; soft-delete removes it, so the index only lists
+active items.
+
+Embeddings are stored as a packed little-endian binary attribute (embedding_bin,
+float32 by default or float16 via KNOWLEDGE_EMBEDDING_DTYPE=f16, see
+embedding_dtype) and decoded into array('f'). Items still holding the legacy JSON
+text `embedding` are rewritten in binary form when the embeddings cache refills.
+Each embedding records the model that produced it (embedding_model, unset on
+items embedded before the field existed = LEGACY_EMBEDDING_MODEL), so items with
+missing or outdated embeddings can be found and re-embedded in bulk
+(scan_embedding_backlog / save_embeddings).
 
 Stores knowledge items with OpenAI embeddings for RAG retrieval.
 Sources: manual entries, operator feedback on conversations, documents.
 """
 
 import os
+import sys
 import json
 import uuid
 import time
 import logging
+import importlib.util
+from array import array
 from datetime import datetime
 from decimal import Decimal
 
-import boto3
+from boto3.dynamodb.conditions import Attr
 
 logger = logging.getLogger("urbangroup.knowledge_db")
 
-_dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb, entity_paging, embedding_codec) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+_paging = _load_shared("entity_paging")
+_codec = _load_shared("embedding_codec")
 
 TABLE_NAME = os.environ.get("KNOWLEDGE_TABLE", "urbangroup-knowledge-prod")
 _table = _dynamodb.Table(TABLE_NAME)
@@ -29,6 +60,10 @@ _table = _dynamodb.Table(TABLE_NAME)
 _embeddings_cache = {"data": None, "fetched_at": 0}
 CACHE_TTL_SECONDS = 300  # 5 minutes
 
+EMBEDDING_DTYPE = os.environ.get("KNOWLEDGE_EMBEDDING_DTYPE", "f32")  # f32 | f16
+LAZY_MIGRATE_PER_LOAD = 100  # legacy JSON embeddings rewritten per cache refill
+LEGACY_EMBEDDING_MODEL = "text-embedding-3-small"  # model of items without embedding_model
+
 
 def save_item(data):
     """Save or update a knowledge item.
@@ -50,17 +85,56 @@ def save_item(data):
         data["created_at"] = now
     if "active" not in data:
         data["active"] = True
+    if data["active"]:
+        data["entity_type"] = "knowledge"
+    else:
+        data.pop("entity_type", None)
 
     item = _prepare_item(data)
     _table.put_item(Item=item)
 
     # Invalidate cache
     _embeddings_cache["data"] = None
+    _bump_index_version()
 
     logger.info(f"Knowledge item saved: {data['id']} ({data.get('title', '?')})")
     return {"id": data["id"]}
 
 
+def save_items(items):
+    """Save many knowledge items in batched writes (bulk import).
+
+    Args:
+        items: list of dicts, same fields as save_item()
+
+    Returns:
+        list of saved item ids, in input order
+    """
+    now = datetime.utcnow().isoformat() + "Z"
+    ids = []
+    # batch_writer sends 25-item BatchWriteItem calls and resends unprocessed items
+    with _table.batch_writer(overwrite_by_pkeys=["id"]) as batch:
+        for data in items:
+            if not data.get("id"):
+                data["id"] = str(uuid.uuid4())
+            data["updated_at"] = now
+            if not data.get("created_at"):
+                data["created_at"] = now
+            if "active" not in data:
+                data["active"] = True
+            if data["active"]:
+                data["entity_type"] = "knowledge"
+            else:
+                data.pop("entity_type", None)
+            batch.put_item(Item=_prepare_item(data))
+            ids.append(data["id"])
+
+    _embeddings_cache["data"] = None
+    _bump_index_version()
+    logger.info(f"Saved {len(ids)} knowledge items (batched)")
+    return ids
+
+
 def get_item(item_id):
     """Get a single knowledge item by ID.
 
@@ -72,29 +146,32 @@ def get_item(item_id):
     return _deserialize_item(item) if item else None
 
 
-def list_items(item_type=None):
-    """List all active knowledge items.
+def list_items(item_type=None, limit=100, cursor=None):
+    """List one page of active knowledge items, newest first.
 
     Args:
         item_type: Optional filter by type (manual, feedback, document)
+        limit: Max items to return
+        cursor: next_cursor from the previous page (None = first page)
 
     Returns:
-        list of item dicts (without embeddings for efficiency)
+        (list of item dicts without embeddings, next_cursor or None)
     """
-    resp = _table.scan()
-    items = resp.get("Items", [])
+    type_filter = Attr("type").eq(item_type) if item_type else None
+    items, next_cursor = _paging.query_page(_table, "knowledge", limit, cursor, type_filter)
     result = []
     for item in items:
         data = _deserialize_item(item)
-        if not data.get("active", True):
-            continue
-        if item_type and data.get("type") != item_type:
-            continue
         # Strip embedding from list results (too large)
         data.pop("embedding", None)
         result.append(data)
-    result.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    return result
+    return result, next_cursor
+
+
+def backfill_entity_type():
+    """One-off: tag active items saved before entity_type-created_at-index existed."""
+    return _paging.backfill_entity_type(_table, "id", "knowledge",
+                                 Attr("active").not_exists() | Attr("active").eq(True))
 
 
 def delete_item(item_id):
@@ -105,13 +182,14 @@ def delete_item(item_id):
     """
     _table.update_item(
         Key={"id": item_id},
-        UpdateExpression="SET active = :val, updated_at = :now",
+        UpdateExpression="SET active = :val, updated_at = :now REMOVE entity_type",
         ExpressionAttributeValues={
             ":val": False,
             ":now": datetime.utcnow().isoformat() + "Z",
         },
     )
     _embeddings_cache["data"] = None
+    _bump_index_version()
     logger.info(f"Knowledge item deactivated: {item_id}")
 
 
@@ -119,50 +197,191 @@ def get_all_active_with_embeddings(use_cache=True):
     """Get all active items with their embeddings for similarity search.
 
     Returns:
-        list of dicts with id, title, content, embedding, tags
+        list of dicts with id, title, content, embedding (array of floats), tags
     """
     if use_cache and _embeddings_cache["data"] is not None:
         if (time.time() - _embeddings_cache["fetched_at"]) < CACHE_TTL_SECONDS:
             return _embeddings_cache["data"]
 
-    resp = _table.scan()
-    items = resp.get("Items", [])
-    result = []
-    for item in items:
-        data = _deserialize_item(item)
-        if not data.get("active", True):
-            continue
-        if not data.get("embedding"):
-            continue
-        result.append({
-            "id": data["id"],
-            "title": data.get("title", ""),
-            "content": data.get("content", ""),
-            "embedding": data["embedding"],
-            "tags": data.get("tags", []),
-            "type": data.get("type", "manual"),
-        })
-
+    result = [item for item in get_all_active() if item.get("embedding")]
     _embeddings_cache["data"] = result
     _embeddings_cache["fetched_at"] = time.time()
     logger.info(f"Loaded {len(result)} knowledge items with embeddings")
     return result
 
 
+def get_all_active():
+    """Scan all active items, with or without an embedding (uncached).
+
+    Returns:
+        list of dicts with id, title, content, tags, type and, when the item
+        has one, embedding (array of floats)
+    """
+    result = []
+    legacy = []
+    scan_kwargs = {}
+    while True:
+        resp = _table.scan(**scan_kwargs)
+        for item in resp.get("Items", []):
+            if item["id"] == INDEX_VERSION_ID:
+                continue
+            data = _deserialize_item(item)
+            if not data.get("active", True):
+                continue
+            entry = {
+                "id": data["id"],
+                "title": data.get("title", ""),
+                "content": data.get("content", ""),
+                "tags": data.get("tags", []),
+                "type": data.get("type", "manual"),
+            }
+            if data.get("embedding"):
+                entry["embedding"] = data["embedding"]
+                if "embedding_bin" not in item:
+                    legacy.append(data)
+            result.append(entry)
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    if legacy:
+        _migrate_legacy_embeddings(legacy[:LAZY_MIGRATE_PER_LOAD])
+    return result
+
+
+def _migrate_legacy_embeddings(items):
+    """Rewrite JSON-text embeddings as packed binary (lazy migration)."""
+    migrated = 0
+    for data in items:
+        packed, dtype = _pack_embedding(data["embedding"])
+        try:
+            _table.update_item(
+                Key={"id": data["id"]},
+                UpdateExpression="SET embedding_bin = :b, embedding_dtype = :d REMOVE embedding",
+                ConditionExpression="attribute_exists(embedding)",
+                ExpressionAttributeValues={":b": packed, ":d": dtype},
+            )
+            migrated += 1
+        except Exception as e:
+            logger.warning(f"Embedding migration skipped for {data['id']}: {e}")
+    logger.info(f"Migrated {migrated} legacy JSON embeddings to {EMBEDDING_DTYPE}")
+
+
+def _pack_embedding(vector, dtype=None):
+    """Pack a vector of floats as little-endian float32/float16 bytes.
+
+    Returns:
+        (bytes, dtype)
+    """
+    dtype = "f16" if (dtype or EMBEDDING_DTYPE) == "f16" else "f32"
+    return _codec.pack(vector, dtype), dtype
+
+
+def _unpack_embedding(raw, dtype):
+    """Decode bytes from _pack_embedding into array('f')."""
+    return _codec.unpack(raw, dtype)
+
+
 def invalidate_cache():
     """Clear the embeddings cache."""
     _embeddings_cache["data"] = None
 
 
+# ── Embedding backfill ───────────────────────────────────────
+
+def scan_embedding_backlog(model, start_key=None, page_size=200):
+    """Scan one page for active items whose embedding is missing or not from `model`.
+
+    Args:
+        model: the current embedding model
+        start_key: last_key from the previous page (None = start of the table)
+        page_size: items read per scan call (before filtering)
+
+    Returns:
+        (list of item dicts without embeddings, last_key or None when the scan is done)
+    """
+    missing = Attr("embedding_bin").not_exists() & Attr("embedding").not_exists()
+    outdated = Attr("embedding_model").exists() & Attr("embedding_model").ne(model)
+    if model != LEGACY_EMBEDDING_MODEL:
+        outdated = outdated | Attr("embedding_model").not_exists()
+    scan_kwargs = {
+        "FilterExpression": Attr("entity_type").eq("knowledge") & Attr("content").exists() & (missing | outdated),
+        "Limit": page_size,
+    }
+    if start_key:
+        scan_kwargs["ExclusiveStartKey"] = start_key
+    resp = _table.scan(**scan_kwargs)
+    items = []
+    for item in resp.get("Items", []):
+        data = _deserialize_item(item)
+        data.pop("embedding", None)
+        items.append(data)
+    return items, resp.get("LastEvaluatedKey")
+
+
+def save_embeddings(items, model):
+    """Write back re-embedded items from scan_embedding_backlog in batched writes.
+
+    Items are written whole (BatchWriteItem has no partial updates), so run the
+    backfill when the knowledge base is not being edited. updated_at is kept:
+    re-embedding does not change the item.
+
+    Args:
+        items: item dicts with a new `embedding`
+        model: the model that produced the embeddings
+    """
+    now = datetime.utcnow().isoformat() + "Z"
+    with _table.batch_writer(overwrite_by_pkeys=["id"]) as batch:
+        for data in items:
+            data["embedding_model"] = model
+            data["embedded_at"] = now
+            batch.put_item(Item=_prepare_item(data))
+    _embeddings_cache["data"] = None
+    _bump_index_version()
+    logger.info(f"Saved {len(items)} re-embedded knowledge items ({model})")
+
+
+# ── Index version ────────────────────────────────────────────
+#
+# A counter item bumped once per write call (save_item, save_items, delete_item).
+# Search indexes built from this table (rag_retrieval's ANN index) record the
+# version they reflect and compare it to tell whether they are current.
+
+INDEX_VERSION_ID = "KNOWLEDGE_INDEX_VERSION"
+
+
+def _bump_index_version():
+    """Increment the knowledge index version. Returns the new version."""
+    resp = _table.update_item(
+        Key={"id": INDEX_VERSION_ID},
+        UpdateExpression="ADD #v :one SET updated_at = :now",
+        ExpressionAttributeNames={"#v": "version"},
+        ExpressionAttributeValues={":one": 1, ":now": datetime.utcnow().isoformat() + "Z"},
+        ReturnValues="ALL_NEW",
+    )
+    return int(resp["Attributes"]["version"])
+
+
+def get_index_version():
+    """Current knowledge index version (0 if nothing was written since it was introduced)."""
+    resp = _table.get_item(
+        Key={"id": INDEX_VERSION_ID},
+        ProjectionExpression="#v",
+        ExpressionAttributeNames={"#v": "version"},
+        ConsistentRead=True,
+    )
+    return int((resp.get("Item") or {}).get("version", 0))
+
+
 def _prepare_item(data):
     """Convert Python types to DynamoDB-safe format."""
     item = {}
     for k, v in data.items():
         if isinstance(v, bool):
             item[k] = v
-        elif isinstance(v, list) and k == "embedding":
-            # Store embedding as JSON string (list of floats)
-            item[k] = json.dumps(v)
+        elif k == "embedding" and isinstance(v, (list, array)):
+            # Packed binary; replaces the legacy JSON text form
+            item["embedding_bin"], item["embedding_dtype"] = _pack_embedding(v)
         elif isinstance(v, (dict, list)):
             item[k] = json.dumps(v, ensure_ascii=False)
         elif isinstance(v, float):
@@ -179,7 +398,11 @@ def _deserialize_item(item):
     _JSON_FIELDS = ("tags",)
     data = {}
     for k, v in item.items():
-        if k == "embedding" and isinstance(v, str):
+        if k == "embedding_bin":
+            data["embedding"] = _unpack_embedding(v, item.get("embedding_dtype", "f32"))
+        elif k == "embedding_dtype":
+            continue
+        elif k == "embedding" and isinstance(v, str):
             try:
                 data[k] = json.loads(v)
             except (json.JSONDecodeError, TypeError):
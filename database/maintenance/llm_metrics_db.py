@@ -0,0 +1,90 @@
+"""
+llm_metrics_db - DynamoDB storage for hourly LLM call aggregates.
+
+Table: urbangroup-llm-metrics-{stage}
+  PK: site (String, call site, e.g. "MLLM1000.chat")
+  SK: hour (String, UTC "YYYY-MM-DDTHH")
+  TTL: expires_at (Number, epoch seconds)
+
+Each item holds counters that every Lambda container adds to atomically (ADD):
+calls, errors, latency_ms, prompt_tokens, completion_tokens, cached_tokens, and a latency
+histogram as lat_00..lat_NN (counts per llm_metrics.LATENCY_BUCKETS_MS bucket),
+so percentiles can be estimated across containers.
+"""
+
+import os
+import sys
+import time
+import logging
+import importlib.util
+from datetime import datetime
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Attr
+
+logger = logging.getLogger("urbangroup.llm_metrics_db")
+
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+
+TABLE_NAME = os.environ.get("LLM_METRICS_TABLE", "urbangroup-llm-metrics-prod")
+_table = _dynamodb.Table(TABLE_NAME)
+RETENTION_SECONDS = 30 * 86400  # hourly items expire after 30 days
+
+
+def add_counters(site, hour, model, counters):
+    """Atomically add counters to a site's hourly item.
+
+    Args:
+        site: call site name
+        hour: UTC hour, "YYYY-MM-DDTHH"
+        model: model name (last one seen is kept)
+        counters: dict attribute → int to add (zero values are skipped)
+    """
+    adds = {k: v for k, v in counters.items() if v}
+    if not adds:
+        return
+    names = {f"#c{i}": k for i, k in enumerate(adds)}
+    values = {f":c{i}": int(v) for i, v in enumerate(adds.values())}
+    values.update({
+        ":m": model or "",
+        ":now": datetime.utcnow().isoformat() + "Z",
+        ":exp": int(time.time()) + RETENTION_SECONDS,
+    })
+    _table.update_item(
+        Key={"site": site, "hour": hour},
+        UpdateExpression=("ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(adds)))
+                          + " SET model = :m, updated_at = :now, expires_at = if_not_exists(expires_at, :exp)"),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+    )
+
+
+def get_since(hour):
+    """All hourly items from `hour` (inclusive) on.
+
+    Returns:
+        list of dicts with site, hour, model and int counters
+    """
+    scan_kwargs = {"FilterExpression": Attr("hour").gte(hour)}
+    items = []
+    while True:
+        resp = _table.scan(**scan_kwargs)
+        for item in resp.get("Items", []):
+            items.append({k: int(v) if isinstance(v, Decimal) else v for k, v in item.items()})
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    return items
@@ -4,24 +4,40 @@ maintenance_db - DynamoDB storage for the maintenance module.
 Two tables:
   1. Messages table (urbangroup-messages-{stage})
      - All incoming WhatsApp messages (text, image, audio, etc.)
-     - PK: id (UUID), GSI: status-created_at-index
+     - PK: id (UUID), GSI: status-created_at-index, entity_type-created_at-index
 
   2. Service Calls table (urbangroup-service-calls-{stage})
      - Service calls identified by LLM analysis
-     - PK: id (UUID), GSI: status-created_at-index, phone-created_at-index
+     - PK: id (UUID), GSI: status-created_at-index, phone-created_at-index,
+       created_month-created_at-index (created_month = "YYYY-MM" bucket, for "latest N")
 """
 
 import os
+import sys
 import uuid
 import logging
+import importlib.util
 from datetime import datetime
 
-import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Key, Attr
 
 logger = logging.getLogger("urbangroup.maintenance_db")
 
-_dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb, entity_paging) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+_paging = _load_shared("entity_paging")
 
 # ── Messages Table ───────────────────────────────────────────
 
@@ -43,6 +59,35 @@ def save_message(phone, name, text, msg_type="text", message_id="", parsed_data=
     Returns:
         dict with saved item id
     """
+    item = _build_message_item(phone, name, text, msg_type, message_id, parsed_data)
+    _messages_table.put_item(Item=item)
+    logger.info(f"Saved message {item['id']} from {phone}")
+    return {"id": item["id"]}
+
+
+def save_messages(messages):
+    """Save many incoming messages in batched writes (bursts, imports).
+
+    Args:
+        messages: list of dicts with save_message() arguments
+                  (phone, name, text, msg_type, message_id, parsed_data)
+
+    Returns:
+        list of saved item ids, in input order
+    """
+    items = [_build_message_item(m.get("phone", ""), m.get("name", ""), m.get("text", ""),
+                                 m.get("msg_type", "text"), m.get("message_id", ""),
+                                 m.get("parsed_data"))
+             for m in messages]
+    # batch_writer sends 25-item BatchWriteItem calls and resends unprocessed items
+    with _messages_table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    logger.info(f"Saved {len(items)} messages (batched)")
+    return [item["id"] for item in items]
+
+
+def _build_message_item(phone, name, text, msg_type, message_id, parsed_data):
     now = datetime.utcnow().isoformat() + "Z"
     item_id = str(uuid.uuid4())
 
@@ -55,39 +100,44 @@ def save_message(phone, name, text, msg_type="text", message_id="", parsed_data=
         "message_id": message_id,
         "status": "new",
         "created_at": now,
+        "entity_type": "message",
     }
 
     if parsed_data:
         item["parsed_data"] = parsed_data
-
-    _messages_table.put_item(Item=item)
-    logger.info(f"Saved message {item_id} from {phone}")
-    return {"id": item_id}
+    return item
 
 
-def get_messages(status=None, limit=50):
-    """Retrieve messages, optionally filtered by status.
+def get_messages(status=None, limit=50, cursor=None):
+    """Retrieve one page of messages, newest first, optionally filtered by status.
 
     Args:
         status: Filter by status (new, processing, completed, failed). None = all.
         limit: Max items to return.
+        cursor: next_cursor from the previous page (None = first page)
 
     Returns:
-        list of message dicts, sorted by created_at descending
+        (list of message dicts, next_cursor or None)
     """
     if status:
-        resp = _messages_table.query(
-            IndexName="status-created_at-index",
-            KeyConditionExpression=Key("status").eq(status),
-            ScanIndexForward=False,
-            Limit=limit,
-        )
-    else:
-        resp = _messages_table.scan(Limit=limit)
+        kwargs = {
+            "IndexName": "status-created_at-index",
+            "KeyConditionExpression": Key("status").eq(status),
+            "ScanIndexForward": False,
+            "Limit": limit,
+        }
+        start_key = _paging.decode_cursor(cursor)
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        resp = _messages_table.query(**kwargs)
+        return resp.get("Items", []), _paging.encode_cursor(resp.get("LastEvaluatedKey"))
+
+    return _paging.query_page(_messages_table, "message", limit, cursor)
 
-    items = resp.get("Items", [])
-    items.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    return items
+
+def backfill_message_entity_type():
+    """One-off: tag messages saved before entity_type-created_at-index existed."""
+    return _paging.backfill_entity_type(_messages_table, "id", "message")
 
 
 def update_message_status(item_id, new_status):
@@ -114,6 +164,58 @@ def update_message_status(item_id, new_status):
     return resp.get("Attributes", {})
 
 
+def update_message_statuses(item_ids, new_status):
+    """Set the same status on many messages with concurrent update_item calls.
+
+    Returns:
+        dict: {"updated": [ids], "failed": {id: error}}
+    """
+    now = datetime.utcnow().isoformat() + "Z"
+    updates = [{
+        "Key": {"id": item_id},
+        "UpdateExpression": "SET #s = :status, updated_at = :now",
+        "ExpressionAttributeNames": {"#s": "status"},
+        "ExpressionAttributeValues": {":status": new_status, ":now": now},
+    } for item_id in item_ids]
+    failed = _update_items_parallel(MESSAGES_TABLE_NAME, updates)
+    failed = {u["Key"]["id"]: err for u, err in failed}
+    updated = [i for i in item_ids if i not in failed]
+    logger.info(f"Updated {len(updated)} messages to {new_status} ({len(failed)} failed)")
+    return {"updated": updated, "failed": failed}
+
+
+UPDATE_FANOUT_WORKERS = 8
+
+
+def _update_items_parallel(table_name, updates, max_workers=UPDATE_FANOUT_WORKERS):
+    """Run update_item calls concurrently, for per-item updates BatchWriteItem can't express.
+
+    Args:
+        table_name: DynamoDB table name
+        updates: list of update_item kwargs (Key, UpdateExpression, ...) with Python values
+
+    Returns:
+        list of (update, error message) for the calls that failed
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # The resource's client is thread-safe (Table resources are not) and takes Python values
+    client = _dynamodb.meta.client
+
+    def run(update):
+        try:
+            client.update_item(TableName=table_name, **update)
+            return None
+        except Exception as e:
+            return str(e)
+
+    if not updates:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(updates))) as pool:
+        errors = list(pool.map(run, updates))
+    return [(u, err) for u, err in zip(updates, errors) if err]
+
+
 # ── Service Calls Table ──────────────────────────────────────
 
 SERVICE_CALLS_TABLE_NAME = os.environ.get("SERVICE_CALLS_TABLE", "urbangroup-service-calls-prod")
@@ -173,6 +275,7 @@ def save_service_call(phone, name, issue_type, description, urgency,
         "source_type": source_type,
         "status": "new",
         "created_at": now,
+        "created_month": _month_bucket(now),
         # Priority ERP fields
         "custname": custname or "99999",
         "cdes": cdes or name or "",
@@ -220,24 +323,77 @@ def get_service_calls(status=None, phone=None, limit=50):
             Limit=limit,
         )
     else:
-        # Scan has no guaranteed order, so fetch more than needed then trim.
-        # Paginate to collect enough items for a reliable sort.
-        items = []
-        scan_kwargs = {}
-        while len(items) < limit * 4:
-            resp = _service_calls_table.scan(Limit=500, **scan_kwargs)
-            items.extend(resp.get("Items", []))
-            if "LastEvaluatedKey" not in resp:
-                break
-            scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
-        items.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        return items[:limit]
+        return get_latest_service_calls(limit)
 
     items = resp.get("Items", [])
     items.sort(key=lambda x: x.get("created_at", ""), reverse=True)
     return items
 
 
+SERVICE_CALL_BUCKET_LOOKBACK = 36  # months to walk back before giving up
+
+
+def get_latest_service_calls(limit=50):
+    """Newest service calls across all statuses, walking monthly buckets backwards.
+
+    Each bucket is one Query on created_month-created_at-index, so the cost depends
+    on `limit`, not on how many historical calls exist.
+    """
+    items = []
+    bucket = _month_bucket(datetime.utcnow().isoformat())
+    for _ in range(SERVICE_CALL_BUCKET_LOOKBACK):
+        kwargs = {
+            "IndexName": "created_month-created_at-index",
+            "KeyConditionExpression": Key("created_month").eq(bucket),
+            "ScanIndexForward": False,
+        }
+        while len(items) < limit:
+            resp = _service_calls_table.query(Limit=limit - len(items), **kwargs)
+            items.extend(resp.get("Items", []))
+            if "LastEvaluatedKey" not in resp:
+                break
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+        if len(items) >= limit:
+            break
+        bucket = _previous_month_bucket(bucket)
+    return items
+
+
+def _month_bucket(created_at):
+    """Month bucket of an ISO timestamp: 2026-03-14T09:30:00Z → 2026-03."""
+    return created_at[:7]
+
+
+def _previous_month_bucket(bucket):
+    year, month = int(bucket[:4]), int(bucket[5:7])
+    if month == 1:
+        return f"{year - 1}-12"
+    return f"{year}-{month - 1:02d}"
+
+
+def backfill_service_call_buckets():
+    """One-off: set created_month on service calls saved before the bucket index existed."""
+    scan_kwargs = {
+        "FilterExpression": Attr("created_month").not_exists() & Attr("created_at").exists(),
+        "ProjectionExpression": "id, created_at",
+    }
+    updated = 0
+    while True:
+        resp = _service_calls_table.scan(**scan_kwargs)
+        for item in resp.get("Items", []):
+            _service_calls_table.update_item(
+                Key={"id": item["id"]},
+                UpdateExpression="SET created_month = :b",
+                ExpressionAttributeValues={":b": _month_bucket(item["created_at"])},
+            )
+            updated += 1
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    logger.info(f"Backfilled created_month on {updated} service calls")
+    return updated
+
+
 def update_service_call_status(item_id, new_status):
     """Update the status of a service call.
 
@@ -0,0 +1,789 @@
+"""
+memory_dynamodb - in-memory stand-in for the DynamoDB table API used by the *_db modules.
+
+Selected with DYNAMODB_BACKEND=memory. Every *_db module gets its resource from
+resource_for_env(), which then returns this stand-in instead of boto3's, so the
+data layer runs offline — for local development and for the benchmarks in
+database/benchmarks/.
+
+Covers the subset the modules use:
+  Table: get_item, put_item, update_item, delete_item, query (table + GSIs),
+         scan (filters, Limit, 1 MB pages, ExclusiveStartKey), batch_writer
+  resource.meta.client: batch_get_item, update_item
+  ConditionExpression / FilterExpression / KeyConditionExpression as boto3
+  condition objects or expression strings, ProjectionExpression, ReturnValues,
+  ReturnConsumedCapacity.
+
+Values go through boto3's TypeSerializer/TypeDeserializer, so types behave as
+they do against AWS (numbers come back as Decimal, floats are rejected, bytes
+come back as Binary). GSIs are derived from the index name
+("<hash>-<range>-index"). Indexes are sparse, as in DynamoDB.
+
+Every call is counted per table with estimated RCU/WCU (see stats()), so
+benchmarks can report DynamoDB operations per request.
+"""
+
+import os
+import re
+import copy
+import math
+import json
+import logging
+import threading
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger("urbangroup.memory_dynamodb")
+
+# Primary keys by table-name fragment (tables not listed use "id")
+KEY_SCHEMAS = {
+    "troubleshoot-sessions": ("phone", None),
+    "troubleshoot-logs": ("session_id", "log_key"),
+    "bot-scripts": ("script_id", None),
+    "bot-prompts": ("prompt_id", None),
+    "embedding-cache": ("cache_key", None),
+    "llm-metrics": ("site", "hour"),
+}
+
+PAGE_BYTES = 1024 * 1024  # query/scan page size limit, as in DynamoDB
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+_lock = threading.RLock()
+_resource = None
+
+
+def resource():
+    """Shared stand-in resource (one per process, so all modules see the same tables)."""
+    global _resource
+    with _lock:
+        if _resource is None:
+            _resource = MemoryResource()
+        return _resource
+
+
+def resource_for_env():
+    """DynamoDB resource for the *_db modules: boto3's, or this stand-in when DYNAMODB_BACKEND=memory."""
+    if os.environ.get("DYNAMODB_BACKEND", "").lower() != "memory":
+        import boto3
+        return boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+    logger.info("Using in-memory DynamoDB backend")
+    return resource()
+
+
+def stats(reset=False):
+    """Per-table operation counts and estimated capacity since the last reset.
+
+    Returns:
+        {table_name: {"ops": {op: count}, "rcu": float, "wcu": float}}
+    """
+    res = resource()
+    with _lock:
+        out = {name: copy.deepcopy(t._stats) for name, t in res._tables.items() if t._stats["ops"]}
+        if reset:
+            for t in res._tables.values():
+                t._reset_stats()
+    return out
+
+
+def reset():
+    """Drop all tables and data."""
+    global _resource
+    with _lock:
+        _resource = None
+
+
+def register_table(name, hash_key, range_key=None):
+    """Declare the primary key of a table not covered by KEY_SCHEMAS."""
+    return resource().Table(name, key_schema=(hash_key, range_key))
+
+
+def _conditional_failed(operation):
+    return ClientError({"Error": {"Code": "ConditionalCheckFailedException",
+                                  "Message": "The conditional request failed"}}, operation)
+
+
+def _validation_error(operation, message):
+    return ClientError({"Error": {"Code": "ValidationException", "Message": message}}, operation)
+
+
+# ── Values ───────────────────────────────────────────────────
+
+def _to_store(item):
+    """Python item → normalized stored copy (DynamoDB type rules applied)."""
+    return {k: _deserializer.deserialize(_serializer.serialize(v)) for k, v in item.items()}
+
+
+def _item_size(item):
+    """Approximate stored size in bytes (names + values)."""
+    size = 0
+    for k, v in item.items():
+        size += len(k.encode("utf-8"))
+        if isinstance(v, (bytes, bytearray)) or hasattr(v, "value"):
+            size += len(bytes(v))
+        elif isinstance(v, str):
+            size += len(v.encode("utf-8"))
+        elif isinstance(v, (Decimal, int, bool)) or v is None:
+            size += 8
+        else:
+            size += len(json.dumps(v, default=str).encode("utf-8"))
+    return size
+
+
+def _cmp_key(v):
+    """Sort key for string / number / binary attribute values."""
+    if isinstance(v, (Decimal, int)):
+        return (0, v, "")
+    if hasattr(v, "value"):
+        return (1, 0, bytes(v))
+    return (2, 0, str(v))
+
+
+# ── Expressions ──────────────────────────────────────────────
+
+_TOKEN_RE = re.compile(r"\s*(<>|<=|>=|=|<|>|\(|\)|,|[#:]?[A-Za-z_][A-Za-z0-9_.\-]*)")
+
+
+def _tokenize(expr):
+    tokens, pos = [], 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _TOKEN_RE.match(expr, pos)
+        if not m:
+            raise ValueError(f"Cannot parse expression near: {expr[pos:]!r}")
+        tokens.append(m.group(1))
+        pos = m.end()
+    return tokens
+
+
+class _Expr:
+    """Evaluator for a string condition expression over one item."""
+
+    def __init__(self, expr, names, values):
+        self.tokens = _tokenize(expr)
+        self.names = names or {}
+        self.values = values or {}
+        self.pos = 0
+
+    def evaluate(self, item):
+        self.pos = 0
+        self.item = item
+        result = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected token {self.tokens[self.pos]!r}")
+        return result
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self, expected=None):
+        tok = self._peek()
+        if expected and (tok or "").upper() != expected:
+            raise ValueError(f"Expected {expected}, got {tok!r}")
+        self.pos += 1
+        return tok
+
+    def _or(self):
+        left = self._and()
+        while (self._peek() or "").upper() == "OR":
+            self._take()
+            right = self._and()
+            left = left or right
+        return left
+
+    def _and(self):
+        left = self._not()
+        while (self._peek() or "").upper() == "AND":
+            self._take()
+            right = self._not()
+            left = left and right
+        return left
+
+    def _not(self):
+        if (self._peek() or "").upper() == "NOT":
+            self._take()
+            return not self._not()
+        return self._primary()
+
+    def _primary(self):
+        tok = self._peek()
+        if tok == "(":
+            self._take()
+            result = self._or()
+            self._take(")")
+            return result
+        fn = (tok or "").lower()
+        if fn in ("attribute_exists", "attribute_not_exists", "begins_with", "contains"):
+            self._take()
+            self._take("(")
+            args = [self._operand_ref()]
+            while self._peek() == ",":
+                self._take()
+                args.append(self._operand_ref())
+            self._take(")")
+            return _apply_function(fn, args)
+        left = self._operand()
+        op = self._take()
+        if op.upper() == "BETWEEN":
+            low = self._operand()
+            self._take("AND")
+            high = self._operand()
+            return _compare("between", left, (low, high))
+        right = self._operand()
+        return _compare(op, left, right)
+
+    def _resolve_path(self, tok):
+        return ".".join(self.names.get(p, p) for p in tok.split("."))
+
+    def _operand_ref(self):
+        """Operand for functions: (exists, value)."""
+        tok = self._take()
+        if tok.startswith(":"):
+            return (True, self.values[tok])
+        return _get_path(self.item, self._resolve_path(tok))
+
+    def _operand(self):
+        return self._operand_ref()
+
+
+_MISSING = (False, None)
+
+
+def _get_path(item, path):
+    cur = item
+    for part in path.split("."):
+        if isinstance(cur, dict) and part in cur:
+            cur = cur[part]
+        else:
+            return _MISSING
+    return (True, cur)
+
+
+def _apply_function(fn, args):
+    exists, value = args[0]
+    if fn == "attribute_exists":
+        return exists
+    if fn == "attribute_not_exists":
+        return not exists
+    if not exists:
+        return False
+    other = args[1][1]
+    if fn == "begins_with":
+        if hasattr(value, "value"):
+            return bytes(value).startswith(bytes(other))
+        return isinstance(value, str) and value.startswith(other)
+    if fn == "contains":
+        try:
+            return other in value
+        except TypeError:
+            return False
+    raise ValueError(f"Unsupported function {fn}")
+
+
+def _compare(op, left, right):
+    l_exists, lv = left
+    if not l_exists:
+        return False
+    if op == "between":
+        low, high = right[0][1], right[1][1]
+        return _cmp_key(low) <= _cmp_key(lv) <= _cmp_key(high)
+    r_exists, rv = right
+    if not r_exists:
+        return False
+    if op == "=":
+        return lv == rv
+    if op == "<>":
+        return lv != rv
+    try:
+        a, b = _cmp_key(lv), _cmp_key(rv)
+    except TypeError:
+        return False
+    if a[0] != b[0]:
+        return False
+    return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+
+
+def _eval_condition(cond, item, names=None, values=None):
+    """Evaluate a boto3 condition object or an expression string against an item."""
+    if cond is None:
+        return True
+    if isinstance(cond, str):
+        return _Expr(cond, names, values).evaluate(item)
+    kind = type(cond).__name__
+    vals = cond._values
+    if kind == "And":
+        return _eval_condition(vals[0], item) and _eval_condition(vals[1], item)
+    if kind == "Or":
+        return _eval_condition(vals[0], item) or _eval_condition(vals[1], item)
+    if kind == "Not":
+        return not _eval_condition(vals[0], item)
+    attr = _get_path(item, vals[0].name)
+    if kind == "AttributeExists":
+        return attr[0]
+    if kind == "AttributeNotExists":
+        return not attr[0]
+    if kind == "BeginsWith":
+        return _apply_function("begins_with", [attr, (True, vals[1])])
+    if kind == "Contains":
+        return _apply_function("contains", [attr, (True, vals[1])])
+    if kind == "Between":
+        return _compare("between", attr, ((True, vals[1]), (True, vals[2])))
+    if kind == "In":
+        return attr[0] and attr[1] in vals[1]
+    ops = {"Equals": "=", "NotEquals": "<>", "LessThan": "<", "LessThanEquals": "<=",
+           "GreaterThan": ">", "GreaterThanEquals": ">="}
+    if kind in ops:
+        return _compare(ops[kind], attr, (True, vals[1]))
+    raise ValueError(f"Unsupported condition {kind}")
+
+
+def _key_condition_parts(cond, names=None, values=None):
+    """Split a key condition into {attribute: predicate(value)}."""
+    if isinstance(cond, str):
+        parts = re.split(r"\s+AND\s+", cond.strip(), flags=re.IGNORECASE)
+        preds = {}
+        for part in parts:
+            m = re.match(r"begins_with\(\s*([#\w]+)\s*,\s*(:\w+)\s*\)", part, re.IGNORECASE)
+            if m:
+                attr = (names or {}).get(m.group(1), m.group(1))
+                preds[attr] = ("begins_with", values[m.group(2)])
+                continue
+            m = re.match(r"([#\w]+)\s+BETWEEN\s+(:\w+)", part, re.IGNORECASE)
+            if m:
+                raise ValueError("BETWEEN key conditions must be passed as Key(...).between()")
+            m = re.match(r"([#\w]+)\s*(=|<=|>=|<|>)\s*(:\w+)", part)
+            if not m:
+                raise ValueError(f"Unsupported key condition: {part}")
+            attr = (names or {}).get(m.group(1), m.group(1))
+            preds[attr] = (m.group(2), values[m.group(3)])
+        return preds
+    kind = type(cond).__name__
+    if kind == "And":
+        out = _key_condition_parts(cond._values[0])
+        out.update(_key_condition_parts(cond._values[1]))
+        return out
+    vals = cond._values
+    name = vals[0].name
+    if kind == "Between":
+        return {name: ("between", (vals[1], vals[2]))}
+    ops = {"Equals": "=", "LessThan": "<", "LessThanEquals": "<=", "GreaterThan": ">",
+           "GreaterThanEquals": ">=", "BeginsWith": "begins_with"}
+    return {name: (ops[kind], vals[1])}
+
+
+def _key_pred_matches(pred, value):
+    op, arg = pred
+    if op == "begins_with":
+        return _apply_function("begins_with", [(True, value), (True, arg)])
+    if op == "between":
+        return _compare("between", (True, value), ((True, arg[0]), (True, arg[1])))
+    return _compare(op, (True, value), (True, arg))
+
+
+def _project(item, projection, names):
+    if not projection:
+        return copy.deepcopy(item)
+    out = {}
+    for raw in projection.split(","):
+        path = ".".join((names or {}).get(p, p) for p in raw.strip().split("."))
+        top = path.split(".")[0]
+        if top in item:
+            out[top] = copy.deepcopy(item[top])
+    return out
+
+
+def _split_update_clauses(expr):
+    clauses = {}
+    pattern = re.compile(r"\b(SET|REMOVE|ADD|DELETE)\b", re.IGNORECASE)
+    pieces = pattern.split(expr)
+    for i in range(1, len(pieces), 2):
+        clauses[pieces[i].upper()] = pieces[i + 1].strip()
+    return clauses
+
+
+def _split_top_level(text):
+    parts, depth, cur = [], 0, ""
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append(cur.strip())
+            cur = ""
+        else:
+            cur += ch
+    if cur.strip():
+        parts.append(cur.strip())
+    return parts
+
+
+def _apply_update(item, expr, names, values):
+    names = names or {}
+    values = values or {}
+
+    def path(tok):
+        return names.get(tok.strip(), tok.strip())
+
+    def operand(tok):
+        tok = tok.strip()
+        m = re.match(r"if_not_exists\(\s*([#\w]+)\s*,\s*(.+)\)$", tok)
+        if m:
+            name = path(m.group(1))
+            return item[name] if name in item else operand(m.group(2))
+        m = re.match(r"list_append\(\s*(.+?)\s*,\s*(.+)\)$", tok)
+        if m:
+            return list(operand(m.group(1))) + list(operand(m.group(2)))
+        if tok.startswith(":"):
+            return values[tok]
+        return item.get(path(tok))
+
+    clauses = _split_update_clauses(expr)
+    for assignment in _split_top_level(clauses.get("SET", "")):
+        target, value = assignment.split("=", 1)
+        value = value.strip()
+        m = re.match(r"(.+?)\s*([+-])\s*(.+)$", value)
+        if m and not value.startswith(("if_not_exists", "list_append")):
+            left, right = operand(m.group(1)), operand(m.group(3))
+            item[path(target)] = left + right if m.group(2) == "+" else left - right
+        else:
+            item[path(target)] = operand(value)
+    for name in _split_top_level(clauses.get("REMOVE", "")):
+        item.pop(path(name), None)
+    for action in _split_top_level(clauses.get("ADD", "")):
+        name, value = action.split()
+        name, value = path(name), values[value]
+        if isinstance(value, set):
+            item[name] = set(item.get(name, set())) | value
+        else:
+            item[name] = item.get(name, 0) + value
+    for action in _split_top_level(clauses.get("DELETE", "")):
+        name, value = action.split()
+        name = path(name)
+        remaining = set(item.get(name, set())) - values[value]
+        if remaining:
+            item[name] = remaining
+        else:
+            item.pop(name, None)
+    return _to_store(item)
+
+
+# ── Tables ───────────────────────────────────────────────────
+
+class MemoryTable:
+    """In-memory table with the boto3 Table methods the *_db modules call."""
+
+    def __init__(self, name, key_schema=None):
+        self.name = self.table_name = name
+        if key_schema is None:
+            key_schema = next((ks for frag, ks in KEY_SCHEMAS.items() if frag in name), ("id", None))
+        self.hash_key, self.range_key = key_schema
+        self._items = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {"ops": {}, "rcu": 0.0, "wcu": 0.0}
+
+    def _count(self, op, rcu=0.0, wcu=0.0):
+        ops = self._stats["ops"]
+        ops[op] = ops.get(op, 0) + 1
+        self._stats["rcu"] += rcu
+        self._stats["wcu"] += wcu
+
+    def _pk(self, key):
+        try:
+            pk = (key[self.hash_key],)
+            if self.range_key:
+                pk += (key[self.range_key],)
+        except KeyError as e:
+            raise _validation_error("GetItem", f"Missing key attribute {e} for table {self.name}")
+        return pk
+
+    def _key_of(self, item):
+        key = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            key[self.range_key] = item[self.range_key]
+        return key
+
+    @staticmethod
+    def _wcu(*items):
+        return max(math.ceil(max((_item_size(i) for i in items if i), default=1) / 1024), 1)
+
+    # ── single-item ops ──
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None,
+                 ConsistentRead=False, **_):
+        with _lock:
+            item = self._items.get(self._pk(Key))
+            size = _item_size(item) if item else 1
+            self._count("GetItem", rcu=math.ceil(size / 4096) * (1 if ConsistentRead else 0.5))
+            if item is None:
+                return {}
+            return {"Item": _project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues="NONE", **_):
+        with _lock:
+            new = _to_store(Item)
+            pk = self._pk(new)
+            old = self._items.get(pk)
+            self._count("PutItem", wcu=self._wcu(new, old))
+            if ConditionExpression is not None and not _eval_condition(
+                    ConditionExpression, old or {}, ExpressionAttributeNames, ExpressionAttributeValues):
+                raise _conditional_failed("PutItem")
+            self._items[pk] = new
+            if ReturnValues == "ALL_OLD" and old:
+                return {"Attributes": copy.deepcopy(old)}
+            return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ReturnValues="NONE", **_):
+        with _lock:
+            pk = self._pk(Key)
+            old = self._items.get(pk)
+            if ConditionExpression is not None and not _eval_condition(
+                    ConditionExpression, old or {}, ExpressionAttributeNames, ExpressionAttributeValues):
+                self._count("UpdateItem", wcu=self._wcu(old))
+                raise _conditional_failed("UpdateItem")
+            base = copy.deepcopy(old) if old else _to_store(Key)
+            new = _apply_update(base, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self._count("UpdateItem", wcu=self._wcu(new, old))
+            self._items[pk] = new
+            if ReturnValues == "ALL_NEW":
+                return {"Attributes": copy.deepcopy(new)}
+            if ReturnValues == "ALL_OLD" and old:
+                return {"Attributes": copy.deepcopy(old)}
+            return {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues="NONE", **_):
+        with _lock:
+            pk = self._pk(Key)
+            old = self._items.get(pk)
+            self._count("DeleteItem", wcu=self._wcu(old))
+            if ConditionExpression is not None and not _eval_condition(
+                    ConditionExpression, old or {}, ExpressionAttributeNames, ExpressionAttributeValues):
+                raise _conditional_failed("DeleteItem")
+            self._items.pop(pk, None)
+            if ReturnValues == "ALL_OLD" and old:
+                return {"Attributes": copy.deepcopy(old)}
+            return {}
+
+    # ── query / scan ──
+
+    def _index_keys(self, index_name):
+        if not index_name:
+            return self.hash_key, self.range_key
+        m = re.match(r"^([A-Za-z0-9_]+)-([A-Za-z0-9_]+)-index$", index_name)
+        if not m:
+            raise _validation_error("Query", f"Unknown index {index_name} (expected <hash>-<range>-index)")
+        return m.group(1), m.group(2)
+
+    def _page(self, op, ordered, start_pos, Limit, FilterExpression, names, values,
+              projection, last_key_fn, return_capacity):
+        out, evaluated_bytes, evaluated = [], 0, 0
+        pos, stopped = start_pos, False
+        while pos < len(ordered):
+            item = ordered[pos]
+            evaluated += 1
+            evaluated_bytes += _item_size(item)
+            if FilterExpression is None or _eval_condition(FilterExpression, item, names, values):
+                out.append(_project(item, projection, names))
+            pos += 1
+            if (Limit and evaluated >= Limit) or evaluated_bytes >= PAGE_BYTES:
+                stopped = True
+                break
+        rcu = max(math.ceil(evaluated_bytes / 4096), 1) * 0.5
+        self._count(op, rcu=rcu)
+        resp = {"Items": out, "Count": len(out), "ScannedCount": evaluated}
+        if stopped:
+            # Like DynamoDB, a page cut by Limit returns a key even when nothing is left
+            resp["LastEvaluatedKey"] = last_key_fn(ordered[pos - 1])
+        if return_capacity and return_capacity != "NONE":
+            resp["ConsumedCapacity"] = {"TableName": self.name, "CapacityUnits": rcu}
+        return resp
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None,
+              ScanIndexForward=True, Limit=None, ExclusiveStartKey=None,
+              ProjectionExpression=None, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, ReturnConsumedCapacity=None, **_):
+        with _lock:
+            hash_attr, range_attr = self._index_keys(IndexName)
+            preds = _key_condition_parts(KeyConditionExpression, ExpressionAttributeNames,
+                                         ExpressionAttributeValues)
+            if hash_attr not in preds or preds[hash_attr][0] != "=":
+                raise _validation_error("Query", f"Query needs an equality condition on {hash_attr}")
+            matches = []
+            for item in self._items.values():
+                if hash_attr not in item or (range_attr and range_attr not in item):
+                    continue  # sparse index
+                if not all(attr in item and _key_pred_matches(p, item[attr]) for attr, p in preds.items()):
+                    continue
+                matches.append(item)
+
+            def order(item):
+                rng = _cmp_key(item[range_attr]) if range_attr else (0, 0, "")
+                return (rng, tuple(_cmp_key(v) for v in self._pk(item)))
+
+            matches.sort(key=order, reverse=not ScanIndexForward)
+            start = 0
+            if ExclusiveStartKey:
+                start_order = order(ExclusiveStartKey)
+                if ScanIndexForward:
+                    start = next((i for i, it in enumerate(matches) if order(it) > start_order), len(matches))
+                else:
+                    start = next((i for i, it in enumerate(matches) if order(it) < start_order), len(matches))
+
+            def last_key(item):
+                key = self._key_of(item)
+                key[hash_attr] = item[hash_attr]
+                if range_attr:
+                    key[range_attr] = item[range_attr]
+                return copy.deepcopy(key)
+
+            return self._page("Query", matches, start, Limit, FilterExpression, ExpressionAttributeNames,
+                              ExpressionAttributeValues, ProjectionExpression, last_key,
+                              ReturnConsumedCapacity)
+
+    def scan(self, FilterExpression=None, Limit=None, ExclusiveStartKey=None,
+             ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, ReturnConsumedCapacity=None, IndexName=None, **_):
+        with _lock:
+            items = list(self._items.values())
+            if IndexName:
+                hash_attr, range_attr = self._index_keys(IndexName)
+                items = [i for i in items if hash_attr in i and range_attr in i]
+
+            def order(item):
+                return tuple(_cmp_key(v) for v in self._pk(item))
+
+            items.sort(key=order)
+            start = 0
+            if ExclusiveStartKey:
+                start_order = order(ExclusiveStartKey)
+                start = next((i for i, it in enumerate(items) if order(it) > start_order), len(items))
+            return self._page("Scan", items, start, Limit, FilterExpression, ExpressionAttributeNames,
+                              ExpressionAttributeValues, ProjectionExpression,
+                              lambda item: copy.deepcopy(self._key_of(item)), ReturnConsumedCapacity)
+
+    # ── batches ──
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self, overwrite_by_pkeys)
+
+
+class _BatchWriter:
+    """Buffers puts/deletes and flushes them as 25-item BatchWriteItem calls."""
+
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self._table = table
+        self._dedupe = overwrite_by_pkeys
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._flush(final=True)
+
+    def put_item(self, Item):
+        self._add(("put", Item))
+
+    def delete_item(self, Key):
+        self._add(("delete", Key))
+
+    def _add(self, request):
+        if self._dedupe:
+            key = tuple(request[1].get(k) for k in self._dedupe)
+            self._buffer = [r for r in self._buffer
+                            if tuple(r[1].get(k) for k in self._dedupe) != key]
+        self._buffer.append(request)
+        if len(self._buffer) >= 25:
+            self._flush()
+
+    def _flush(self, final=False):
+        table = self._table
+        while self._buffer:
+            batch, self._buffer = self._buffer[:25], self._buffer[25:]
+            keys = [table._pk(_to_store(r[1])) for r in batch]
+            if len(set(keys)) != len(keys):
+                raise _validation_error("BatchWriteItem", "Provided list of item keys contains duplicates")
+            with _lock:
+                wcu = 0
+                for kind, payload in batch:
+                    if kind == "put":
+                        new = _to_store(payload)
+                        wcu += table._wcu(new)
+                        table._items[table._pk(new)] = new
+                    else:
+                        old = table._items.pop(table._pk(payload), None)
+                        wcu += table._wcu(old)
+                table._count("BatchWriteItem", wcu=wcu)
+            if not final and len(self._buffer) < 25:
+                break
+
+
+class _MemoryClient:
+    """The resource.meta.client subset used with high-level (Python) values."""
+
+    def __init__(self, res):
+        self._res = res
+
+    def batch_get_item(self, RequestItems, **_):
+        responses = {}
+        for table_name, spec in RequestItems.items():
+            table = self._res.Table(table_name)
+            if len(spec["Keys"]) > 100:
+                raise _validation_error("BatchGetItem", "Too many items requested for the BatchGetItem call")
+            found, size = [], 0
+            with _lock:
+                for key in spec["Keys"]:
+                    item = table._items.get(table._pk(key))
+                    if item is not None:
+                        size += _item_size(item)
+                        found.append(_project(item, spec.get("ProjectionExpression"),
+                                              spec.get("ExpressionAttributeNames")))
+                table._count("BatchGetItem", rcu=max(math.ceil(size / 4096), 1) * 0.5)
+            responses[table_name] = found
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def update_item(self, TableName, **kwargs):
+        return self._res.Table(TableName).update_item(**kwargs)
+
+    def put_item(self, TableName, **kwargs):
+        return self._res.Table(TableName).put_item(**kwargs)
+
+    def get_item(self, TableName, **kwargs):
+        return self._res.Table(TableName).get_item(**kwargs)
+
+    def delete_item(self, TableName, **kwargs):
+        return self._res.Table(TableName).delete_item(**kwargs)
+
+    def query(self, TableName, **kwargs):
+        return self._res.Table(TableName).query(**kwargs)
+
+    def scan(self, TableName, **kwargs):
+        return self._res.Table(TableName).scan(**kwargs)
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class MemoryResource:
+    """Stand-in for boto3.resource("dynamodb")."""
+
+    def __init__(self):
+        self._tables = {}
+        self.meta = _Meta(_MemoryClient(self))
+
+    def Table(self, name, key_schema=None):
+        with _lock:
+            table = self._tables.get(name)
+            if table is None:
+                table = self._tables[name] = MemoryTable(name, key_schema)
+            return table
@@ -3,34 +3,105 @@ troubleshoot_sessions_db - DynamoDB storage for troubleshooting conversation ses
 
 Table: urbangroup-troubleshoot-sessions-{stage}
   PK: phone (String)
+  GSI: entity_type-created_at-index (entity_type="session" → created_at)
   TTL: expires_at (Number, epoch seconds)
+
+Every write bumps a numeric `version` attribute. Conditional saves use it as an
+optimistic lock so two messages racing on the same phone can't overwrite each other.
+
+Table: urbangroup-troubleshoot-logs-{stage}
+  PK: session_id (String), SK: log_key (String, "<first event ts>#<suffix>")
+  TTL: expires_at (Number, epoch seconds)
+
+The session item holds only current state. Diagnostic events queued in
+session["session_log"] are written on save as one append-only, gzip-compressed
+event item per save, and loaded on demand with get_session_log().
 """
 
 import os
+import sys
 import json
+import uuid
+import gzip
+import base64
 import logging
+import importlib.util
 import time
 from datetime import datetime
 from decimal import Decimal
 
-import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 
 logger = logging.getLogger("urbangroup.troubleshoot_sessions_db")
 
-_dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+
+def _load_shared(name):
+    """Load a sibling shared module (memory_dynamodb, entity_paging) once per process."""
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+_dynamodb = _load_shared("memory_dynamodb").resource_for_env()
+_paging = _load_shared("entity_paging")
 
 TABLE_NAME = os.environ.get("TROUBLESHOOT_SESSIONS_TABLE", "urbangroup-troubleshoot-sessions-prod")
 _table = _dynamodb.Table(TABLE_NAME)
 
+LOGS_TABLE_NAME = os.environ.get("TROUBLESHOOT_LOGS_TABLE", "urbangroup-troubleshoot-logs-prod")
+_logs_table = _dynamodb.Table(LOGS_TABLE_NAME)
+LOG_TTL_SECONDS = 7 * 86400  # keep diagnostics for a week after the last write
+
 # Fields that contain nested JSON objects/arrays
 _JSON_FIELDS = ("llm_result", "parsed_data", "skipped_steps", "session_log")
 
 
-def save_session(session_data):
-    """Save a new troubleshooting session. Overwrites any existing session for this phone."""
-    item = _prepare_item(session_data)
-    _table.put_item(Item=item)
-    logger.info(f"Session saved for {session_data['phone']}, step={session_data['step']}")
+def save_session(session_data, conditional=False):
+    """Save a troubleshooting session in a single put.
+
+    Args:
+        session_data: Full session dict. Its `version` is bumped in place on success.
+        conditional: When False the put overwrites any existing session for this phone
+            (new session). When True it only succeeds if the stored item still has the
+            version this session was read with.
+
+    Returns:
+        bool: True if written, False if another writer updated the session first.
+    """
+    current = int(session_data.get("version") or 0)
+    new_events = session_data.get("session_log") or []
+    log_count = int(session_data.get("log_count") or 0) + len(new_events)
+    state = {k: v for k, v in session_data.items() if k != "session_log"}
+    item = _prepare_item({**state, "version": current + 1, "log_count": log_count,
+                          "entity_type": "session"})
+    kwargs = {}
+    if conditional:
+        if current:
+            kwargs["ConditionExpression"] = "version = :v"
+            kwargs["ExpressionAttributeValues"] = {":v": current}
+        else:
+            kwargs["ConditionExpression"] = "attribute_not_exists(version)"
+    try:
+        _table.put_item(Item=item, **kwargs)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            logger.warning(f"Session version conflict for {session_data['phone']} (v{current})")
+            return False
+        raise
+    session_data["version"] = current + 1
+    if new_events:
+        _append_log_events(session_data.get("session_id") or session_data["phone"], new_events)
+        session_data["session_log"] = []
+        session_data["log_count"] = log_count
+    logger.info(f"Session saved for {session_data['phone']}, step={session_data.get('step')}, "
+                f"v{current + 1}")
+    return True
 
 
 def get_session(phone):
@@ -43,20 +114,19 @@ def get_session(phone):
 
 
 def update_session(phone, session_data):
-    """Update session data (step, collected fields, etc.)."""
-    item = _prepare_item(session_data)
-    _table.put_item(Item=item)
-    logger.info(f"Session updated for {phone}, step={session_data.get('step')}")
+    """Update session data (step, collected fields, etc.). Conditional on `version`."""
+    return save_session(session_data, conditional=True)
 
 
 def update_session_step(phone, new_step):
     """Quick update just the step field."""
     _table.update_item(
         Key={"phone": phone},
-        UpdateExpression="SET step = :s, updated_at = :now",
+        UpdateExpression="SET step = :s, updated_at = :now ADD version :one",
         ExpressionAttributeValues={
             ":s": new_step,
             ":now": datetime.utcnow().isoformat() + "Z",
+            ":one": 1,
         },
     )
 
@@ -67,13 +137,90 @@ def delete_session(phone):
     logger.info(f"Session deleted for {phone}")
 
 
-def list_sessions(limit=50):
-    """List recent sessions (scan). Returns list sorted by created_at descending."""
-    resp = _table.scan()
-    items = resp.get("Items", [])
-    sessions = [_deserialize_item(item) for item in items]
-    sessions.sort(key=lambda s: s.get("created_at", ""), reverse=True)
-    return sessions[:limit]
+def delete_sessions(phones):
+    """Delete many sessions in batched writes (cleanup). Their event logs expire via TTL.
+
+    Returns:
+        int: number of sessions deleted
+    """
+    phones = list(dict.fromkeys(phones))  # BatchWriteItem rejects duplicate keys
+    with _table.batch_writer() as batch:
+        for phone in phones:
+            batch.delete_item(Key={"phone": phone})
+    logger.info(f"Deleted {len(phones)} sessions (batched)")
+    return len(phones)
+
+
+def list_sessions(limit=50, cursor=None):
+    """List one page of sessions, newest first.
+
+    Logs are not included — use get_session_log() for a single session.
+
+    Returns:
+        (list of session dicts, next_cursor or None)
+    """
+    items, next_cursor = _paging.query_page(_table, "session", limit, cursor, key_name="phone")
+    sessions = []
+    for item in items:
+        data = _deserialize_item(item)
+        legacy_log = data.pop("session_log", None)
+        if legacy_log and not data.get("log_count"):
+            data["log_count"] = len(legacy_log)
+        sessions.append(data)
+    return sessions, next_cursor
+
+
+def backfill_session_entity_type():
+    """One-off: tag sessions saved before entity_type-created_at-index existed."""
+    return _paging.backfill_entity_type(_table, "phone", "session")
+
+
+def get_session_log(phone):
+    """Load the full event log of the current session for a phone, oldest first.
+
+    Includes events still embedded in sessions written before logs moved to
+    their own table.
+    """
+    resp = _table.get_item(
+        Key={"phone": phone},
+        ProjectionExpression="phone, session_id, session_log",
+    )
+    item = resp.get("Item")
+    if not item:
+        return []
+    data = _deserialize_item(item)
+    events = data.get("session_log") if isinstance(data.get("session_log"), list) else []
+
+    query_kwargs = {
+        "KeyConditionExpression": Key("session_id").eq(data.get("session_id") or phone),
+        "ScanIndexForward": True,
+    }
+    while True:
+        resp = _logs_table.query(**query_kwargs)
+        for log_item in resp.get("Items", []):
+            try:
+                events.extend(json.loads(gzip.decompress(base64.b64decode(log_item["events_gz"]))))
+            except Exception as e:
+                logger.error(f"Failed to decode log item {log_item.get('log_key')}: {e}")
+        if "LastEvaluatedKey" not in resp:
+            break
+        query_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    return events
+
+
+def _append_log_events(session_id, events):
+    """Write a batch of log events as one compressed, append-only item."""
+    raw = json.dumps(events, ensure_ascii=False)
+    try:
+        _logs_table.put_item(Item={
+            "session_id": session_id,
+            "log_key": f"{events[0].get('ts', '')}#{uuid.uuid4().hex[:8]}",
+            "events_gz": base64.b64encode(gzip.compress(raw.encode("utf-8"))).decode("ascii"),
+            "count": len(events),
+            "expires_at": int(time.time()) + LOG_TTL_SECONDS,
+        })
+    except Exception as e:
+        logger.error(f"Failed to write {len(events)} log events for session {session_id}: {e}")
 
 
 def extend_session_ttl(phone, days=7):
@@ -81,8 +228,8 @@ def extend_session_ttl(phone, days=7):
     new_ttl = int(time.time()) + days * 86400
     _table.update_item(
         Key={"phone": phone},
-        UpdateExpression="SET expires_at = :ttl",
-        ExpressionAttributeValues={":ttl": new_ttl},
+        UpdateExpression="SET expires_at = :ttl ADD version :one",
+        ExpressionAttributeValues={":ttl": new_ttl, ":one": 1},
     )
 
 
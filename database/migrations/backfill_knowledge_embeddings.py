@@ -0,0 +1,145 @@
+"""
+backfill_knowledge_embeddings - embed knowledge items whose embedding is missing or outdated.
+
+Items saved while the embeddings API was failing have no embedding and are never
+retried; after EMBEDDING_MODEL changes in rag_retrieval, every item embedded by
+the previous model is outdated. This job scans the knowledge table page by page
+(knowledge_db.scan_embedding_backlog), sends the content to the embeddings API
+in multi-input batches on a bounded pool of workers
+(rag_retrieval.generate_embeddings), and writes each page back with batched
+writes, stamping embedding_model.
+
+After each page the scan position and counters go to a checkpoint file; with
+--resume the job continues from there. Items whose batch failed stay in the
+backlog and are picked up by the next run.
+
+Usage:
+    python database/migrations/backfill_knowledge_embeddings.py [--dry-run] [--resume]
+        [--batch 64] [--workers 4] [--page-size 200] [--checkpoint PATH]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CHECKPOINT = os.path.join(tempfile.gettempdir(), "knowledge_embeddings_checkpoint.json")
+RETRIES = 3  # attempts per batch; waits 2, 4 s between them (rate limits)
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+db = _load("knowledge_db", PROJECT_ROOT / "database" / "maintenance" / "knowledge_db.py")
+rag = _load("rag_retrieval", PROJECT_ROOT / "agents" / "LLM" / "maintenance" / "rag_retrieval.py")
+
+
+def _json_default(v):
+    if isinstance(v, Decimal):
+        return int(v) if v == int(v) else float(v)
+    return str(v)
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_checkpoint(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, default=_json_default)
+    os.replace(tmp, path)
+
+
+def embed_batch(items):
+    """Embed one batch, retrying when the whole batch failed. Returns vectors aligned with items."""
+    texts = [item["content"] for item in items]
+    for attempt in range(RETRIES):
+        vectors = rag.generate_embeddings(texts)
+        if any(v is not None for v in vectors) or attempt == RETRIES - 1:
+            return vectors
+        time.sleep(2 ** (attempt + 1))
+    return vectors
+
+
+def run(args):
+    state = read_checkpoint(args.checkpoint) if args.resume else None
+    if state and state.get("model") != rag.EMBEDDING_MODEL:
+        print(f"Checkpoint is for {state.get('model')}, starting over for {rag.EMBEDDING_MODEL}")
+        state = None
+    if not state:
+        state = {"model": rag.EMBEDDING_MODEL, "start_key": None, "pages": 0,
+                 "found": 0, "embedded": 0, "failed": 0}
+    elif not state.get("start_key"):
+        print("Checkpoint says the previous run finished — nothing to resume")
+        return
+
+    print(f"{'Dry run: ' if args.dry_run else ''}embedding knowledge items in {db.TABLE_NAME} "
+          f"with {rag.EMBEDDING_MODEL} (batch {args.batch}, {args.workers} workers)")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        while True:
+            items, last_key = db.scan_embedding_backlog(rag.EMBEDDING_MODEL, state["start_key"], args.page_size)
+            state["pages"] += 1
+            state["found"] += len(items)
+
+            if items and not args.dry_run:
+                batches = [items[i:i + args.batch] for i in range(0, len(items), args.batch)]
+                done = []
+                for batch, vectors in zip(batches, pool.map(embed_batch, batches)):
+                    for item, vector in zip(batch, vectors):
+                        if vector is None:
+                            state["failed"] += 1
+                            continue
+                        item["embedding"] = vector
+                        done.append(item)
+                if done:
+                    db.save_embeddings(done, rag.EMBEDDING_MODEL)
+                state["embedded"] += len(done)
+
+            state["start_key"] = last_key
+            if not args.dry_run:
+                write_checkpoint(args.checkpoint, state)
+            elapsed = time.perf_counter() - t0
+            print(f"  page {state['pages']:>5}: found {state['found']:>6}  embedded {state['embedded']:>6}  "
+                  f"failed {state['failed']:>4}  {elapsed:7.1f} s")
+            if not last_key:
+                break
+
+    verb = "Would embed" if args.dry_run else "Embedded"
+    count = state["found"] if args.dry_run else state["embedded"]
+    print(f"\n{verb} {count} items; {state['failed']} failed (left for the next run)")
+    stats = rag.get_embedding_cache_stats()
+    print(f"Embedding cache: {stats['memory_hits'] + stats['store_hits']} hits, "
+          f"{stats['misses']} texts sent in {stats['api_calls']} API calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="count the backlog, embed and write nothing")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint file")
+    parser.add_argument("--batch", type=int, default=rag.EMBEDDING_BATCH_SIZE, help="texts per API request")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent API requests")
+    parser.add_argument("--page-size", type=int, default=200, help="items read per scan call")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
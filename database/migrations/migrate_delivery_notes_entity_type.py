@@ -0,0 +1,126 @@
+"""
+migrate_delivery_notes_entity_type - tag delivery-notes table records with entity_type.
+
+Records written before entity typing have no entity_type, so they are missing
+from entity_type-created_at-index and the listings that query it. This script
+scans the table once, derives each record's type from its id
+(delivery_notes_db._entity_type_for_id), sets entity_type, and fills created_at
+where it is missing (the index sort key). HR sheet records also get `month`.
+
+It prints the read capacity of each listing with the old scan + begins_with
+pattern and with the new index Query, before and after migrating.
+
+Usage:
+    python database/migrations/migrate_delivery_notes_entity_type.py [--dry-run] [--no-compare]
+"""
+
+import sys
+import argparse
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+from boto3.dynamodb.conditions import Key
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_spec = importlib.util.spec_from_file_location(
+    "delivery_notes_db", PROJECT_ROOT / "database" / "maintenance" / "delivery_notes_db.py")
+db = importlib.util.module_from_spec(_spec)
+sys.modules["delivery_notes_db"] = db
+_spec.loader.exec_module(db)
+
+# listing → (legacy id prefix, entity type)
+LISTINGS = {
+    "list_tasks": ("TASK_", "task"),
+    "list_hr_sheets": ("HR_SHEET_", "hr_sheet"),
+    "list_charging_months": ("CHARGING_SESSIONS_", "charging_sessions"),
+}
+
+
+def _paged_rcu(call, **kwargs):
+    """Run a scan/query over all pages; return (items, consumed RCU)."""
+    kwargs["ReturnConsumedCapacity"] = "TOTAL"
+    items, rcu = 0, 0.0
+    while True:
+        resp = call(**kwargs)
+        items += len(resp.get("Items", []))
+        rcu += resp.get("ConsumedCapacity", {}).get("CapacityUnits", 0)
+        if "LastEvaluatedKey" not in resp:
+            return items, rcu
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def compare_rcu(label):
+    print(f"\n{label}")
+    print(f"  {'listing':<22} {'scan items':>10} {'scan RCU':>9} {'query items':>11} {'query RCU':>10}")
+    for name, (prefix, entity_type) in LISTINGS.items():
+        scan_items, scan_rcu = _paged_rcu(
+            db._table.scan,
+            FilterExpression="begins_with(id, :p)",
+            ExpressionAttributeValues={":p": prefix},
+            ProjectionExpression="id",
+        )
+        query_items, query_rcu = _paged_rcu(
+            db._table.query,
+            IndexName=db.ENTITY_INDEX,
+            KeyConditionExpression=Key("entity_type").eq(entity_type),
+            ProjectionExpression="id",
+        )
+        print(f"  {name:<22} {scan_items:>10} {scan_rcu:>9.1f} {query_items:>11} {query_rcu:>10.1f}")
+
+
+def migrate(dry_run):
+    scan_kwargs = {
+        "ProjectionExpression": "id, entity_type, created_at, updated_at, #m",
+        "ExpressionAttributeNames": {"#m": "month"},
+    }
+    counts = {}
+    now = datetime.utcnow().isoformat() + "Z"
+    while True:
+        resp = db._table.scan(**scan_kwargs)
+        for item in resp.get("Items", []):
+            if item.get("entity_type"):
+                continue
+            entity_type = db._entity_type_for_id(item["id"])
+            if not entity_type:
+                continue
+            sets = {"entity_type": entity_type}
+            if not item.get("created_at"):
+                sets["created_at"] = item.get("updated_at") or now
+            if entity_type == "hr_sheet" and not item.get("month"):
+                sets["month"] = item["id"].replace("HR_SHEET_", "")
+            counts[entity_type] = counts.get(entity_type, 0) + 1
+            if dry_run:
+                continue
+            names = {f"#a{i}": k for i, k in enumerate(sets)}
+            db._table.update_item(
+                Key={"id": item["id"]},
+                UpdateExpression="SET " + ", ".join(f"#a{i} = :v{i}" for i in range(len(sets))),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues={f":v{i}": v for i, v in enumerate(sets.values())},
+            )
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    verb = "Would tag" if dry_run else "Tagged"
+    print(f"\n{verb} {sum(counts.values())} records in {db.TABLE_NAME}")
+    for entity_type, n in sorted(counts.items()):
+        print(f"  {entity_type:<20} {n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change, write nothing")
+    parser.add_argument("--no-compare", action="store_true", help="skip the RCU comparison")
+    args = parser.parse_args()
+
+    if not args.no_compare:
+        compare_rcu("Before migration")
+    migrate(args.dry_run)
+    if not args.no_compare and not args.dry_run:
+        compare_rcu("After migration")
+
+
+if __name__ == "__main__":
+    main()
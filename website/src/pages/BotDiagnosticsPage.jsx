@@ -12,6 +12,7 @@ const EVENT_META = {
   skip_if_triggered:   { icon: '⏭️', label: 'דילוג אוטומטי' },
   action_executed:     { icon: '⚡', label: 'פעולה בוצעה' },
   llm_route:           { icon: '🧠', label: 'החלטת AI' },
+  rule_route:          { icon: '📐', label: 'החלטה לפי כלל' },
   instructions_auto:   { icon: '📝', label: 'הוראות אוטומטיות' },
   switch_script:       { icon: '🔀', label: 'מעבר לתסריט' },
   session_done:        { icon: '✅', label: 'סיום שיחה' },
@@ -35,6 +36,7 @@ function eventDescription(entry) {
       return `${entry.action_type} (${entry.field}=${entry.value}) — ${ok ? '✓ הצלחה' : '✕ כישלון'} → ${entry.target}`
     }
     case 'llm_route':
+    case 'rule_route':
       return `"${entry.chosen_exit_title}" → ${entry.target}`
     case 'instructions_auto':
       return `→ ${entry.target}`
@@ -64,7 +66,21 @@ function formatDateTime(isoStr) {
 // ── Session timeline ───────────────────────────────────────────
 
 function SessionTimeline({ session }) {
-  const log = session.session_log || []
+  const [log, setLog] = useState(null)
+
+  // Logs live in their own table — load them only for the selected session
+  useEffect(() => {
+    let cancelled = false
+    fetch(`/api/bot-sessions/${encodeURIComponent(session.phone)}/log`)
+      .then(res => res.json())
+      .then(data => { if (!cancelled) setLog(data.ok ? data.session_log : []) })
+      .catch(() => { if (!cancelled) setLog([]) })
+    return () => { cancelled = true }
+  }, [session.phone, session.session_id, session.updated_at])
+
+  if (log === null) {
+    return <div className="bd-loading">טוען...</div>
+  }
   if (log.length === 0) {
     return <div className="bd-empty-log">אין לוג פעילות לשיחה זו</div>
   }
@@ -97,7 +113,7 @@ function SessionTimeline({ session }) {
 function SessionCard({ session, selected, onClick }) {
   const isDone = session.status === 'done'
   const name = session.customer_name || session.name || session.phone
-  const steps = (session.session_log || []).length
+  const steps = session.log_count || 0
   return (
     <div
       className={`bd-session-card${selected ? ' bd-session-card-selected' : ''}`}